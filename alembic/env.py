@@ -1,13 +1,13 @@
 import asyncio
 from logging.config import fileConfig
 
-from sqlalchemy import pool
+from sqlalchemy import pool, text
 from sqlalchemy.engine import Connection
 from sqlalchemy.ext.asyncio import async_engine_from_config
 
 from alembic import context
 from api.config import settings
-from api.models import Base
+from api.models import OFFER_HISTORY_PARTITION, Base
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -15,7 +15,10 @@ config = context.config
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
-if config.config_file_name is not None:
+# (skipped when migrating in-process, it would reset the application's loggers)
+if config.config_file_name is not None and config.attributes.get(
+    "configure_logger", True
+):
     fileConfig(config.config_file_name)
 
 # add your model's MetaData object here
@@ -29,6 +32,16 @@ target_metadata = Base.metadata
 # my_important_option = config.get_main_option("my_important_option")
 # ... etc.
 
+
+def include_name(name: str | None, type_: str, parent_names: dict) -> bool:
+    # ? offer_history partitions are managed at runtime, not by migrations
+    return not (
+        type_ == "table"
+        and name is not None
+        and OFFER_HISTORY_PARTITION.fullmatch(name)
+    )
+
+
 config.set_main_option(
     "sqlalchemy.url",
     settings.postgres_url.render_as_string(hide_password=False),
@@ -51,6 +64,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_name=include_name,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -60,9 +74,16 @@ def run_migrations_offline() -> None:
 
 
 def do_run_migrations(connection: Connection) -> None:
-    context.configure(connection=connection, target_metadata=target_metadata)
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_name=include_name,
+    )
 
     with context.begin_transaction():
+        # concurrent upgrades (replicas, one-shot jobs) wait here until the first
+        # one commits, then find the schema at head; released with the transaction
+        context.execute(text("SELECT pg_advisory_xact_lock(hashtext('alembic'))"))
         context.run_migrations()
 
 
@@ -0,0 +1,52 @@
+"""Add offer summary materialized view
+
+Revision ID: 3d8e5f2a7c61
+Revises: 9c3f4a1e2b7d
+Create Date: 2026-10-18 19:04:12.318246
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3d8e5f2a7c61"
+down_revision: Union[str, None] = "9c3f4a1e2b7d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE MATERIALIZED VIEW offer_summary AS
+        SELECT
+            product_id,
+            jsonb_agg(
+                jsonb_build_object(
+                    'id', id,
+                    'price', price,
+                    'items_in_stock', items_in_stock
+                )
+                ORDER BY price, id
+            ) AS offers,
+            min(price) AS min_price,
+            max(price) AS max_price,
+            sum(items_in_stock) AS total_stock
+        FROM offer
+        GROUP BY product_id
+        WITH DATA
+        """
+    )
+    # ? REFRESH ... CONCURRENTLY requires a unique index without a WHERE clause
+    op.create_index(
+        "ix_offer_summary_product_id",
+        "offer_summary",
+        ["product_id"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW offer_summary")
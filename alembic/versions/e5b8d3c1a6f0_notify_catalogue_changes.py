@@ -0,0 +1,45 @@
+"""Notify catalogue changes
+
+Revision ID: e5b8d3c1a6f0
+Revises: c7e2a9f4b815
+Create Date: 2026-10-18 22:03:19.745021
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e5b8d3c1a6f0"
+down_revision: Union[str, None] = "c7e2a9f4b815"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # ? the channel api.invalidation listens on, one notification per statement
+    op.execute(
+        """
+        CREATE FUNCTION notify_catalogue() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM pg_notify('catalogue', '');
+            RETURN NULL;
+        END
+        $$
+        """
+    )
+    # ? offers_fingerprint updates are left out, the catalogue does not show it
+    op.execute(
+        """
+        CREATE TRIGGER product_notify_catalogue
+        AFTER INSERT OR DELETE OR UPDATE OF name, description ON product
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_catalogue()
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER product_notify_catalogue ON product")
+    op.execute("DROP FUNCTION notify_catalogue()")
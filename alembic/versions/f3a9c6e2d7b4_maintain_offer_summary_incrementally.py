@@ -0,0 +1,65 @@
+"""Maintain offer summary incrementally
+
+Revision ID: f3a9c6e2d7b4
+Revises: e5b8d3c1a6f0
+Create Date: 2026-10-18 23:11:42.508317
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f3a9c6e2d7b4"
+down_revision: Union[str, None] = "e5b8d3c1a6f0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_summary = """
+    SELECT
+        product_id,
+        jsonb_agg(
+            jsonb_build_object(
+                'id', id,
+                'price', price,
+                'items_in_stock', items_in_stock
+            )
+            ORDER BY price, id
+        ) AS offers,
+        min(price) AS min_price,
+        max(price) AS max_price,
+        sum(items_in_stock) AS total_stock
+    FROM offer
+    GROUP BY product_id
+"""
+
+
+def upgrade() -> None:
+    # ? a table instead of a materialized view, so only changed products are rewritten
+    op.execute("DROP MATERIALIZED VIEW offer_summary")
+    op.create_table(
+        "offer_summary",
+        sa.Column("product_id", sa.UUID(), nullable=False),
+        sa.Column("offers", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column("min_price", sa.INTEGER(), nullable=False),
+        sa.Column("max_price", sa.INTEGER(), nullable=False),
+        sa.Column("total_stock", sa.BIGINT(), nullable=False),
+        sa.ForeignKeyConstraint(["product_id"], ["product.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("product_id"),
+    )
+    op.execute(f"INSERT INTO offer_summary {_summary}")
+
+
+def downgrade() -> None:
+    op.drop_table("offer_summary")
+    op.execute(f"CREATE MATERIALIZED VIEW offer_summary AS {_summary} WITH DATA")
+    op.create_index(
+        "ix_offer_summary_product_id",
+        "offer_summary",
+        ["product_id"],
+        unique=True,
+    )
@@ -0,0 +1,117 @@
+from asyncio import Lock
+from hashlib import blake2b
+from time import monotonic
+from typing import Awaitable, Callable, Hashable, NamedTuple
+
+from api.config import Seconds, settings
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    headers: dict[str, str]
+    created_at: float
+
+    @property
+    def etag(self) -> str:
+        return self.headers["ETag"]
+
+
+class _KeyLock(Lock):
+    """A lock counting the coroutines holding or waiting for it."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.users = 0
+
+
+class ResponseCache:
+    """
+    Keeps serialized response bodies in process memory until they expire or
+    the cache is invalidated. Concurrent misses of the same key are rebuilt by
+    one coroutine while the others wait for it, misses of different keys do
+    not wait for each other, and a body built before an invalidation is never stored after it. Once
+    `max_entries` is reached the oldest entry is evicted.
+    """
+
+    def __init__(self, ttl: Seconds, max_entries: int) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: dict[Hashable, CachedResponse] = {}
+        self._generation = 0
+        self._locks: dict[Hashable, _KeyLock] = {}
+
+    def get(self, key: Hashable) -> CachedResponse | None:
+        entry = self._entries.get(key)
+
+        if entry is None or monotonic() - entry.created_at > self.ttl:
+            return None
+
+        return entry
+
+    async def get_or_build(
+        self,
+        key: Hashable,
+        build: Callable[[], Awaitable[tuple[bytes, dict[str, str]]]],
+    ) -> CachedResponse:
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = _KeyLock()
+        lock.users += 1
+
+        try:
+            async with lock:
+                return await self._build(key, build)
+        finally:
+            lock.users -= 1
+            if not lock.users:
+                del self._locks[key]
+
+    async def _build(
+        self,
+        key: Hashable,
+        build: Callable[[], Awaitable[tuple[bytes, dict[str, str]]]],
+    ) -> CachedResponse:
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+
+        generation = self._generation
+        body, headers = await build()
+        entry = CachedResponse(
+            body=body,
+            headers={
+                **headers,
+                "ETag": f'"{blake2b(body, digest_size=16).hexdigest()}"',
+            },
+            created_at=monotonic(),
+        )
+
+        if generation == self._generation:
+            self._entries.pop(key, None)
+            if len(self._entries) >= self.max_entries:
+                del self._entries[next(iter(self._entries))]
+            self._entries[key] = entry
+
+        return entry
+
+    def invalidate(self) -> None:
+        self._generation += 1
+        self._entries.clear()
+
+
+def etag_matches(etag: str, if_none_match: str | None) -> bool:
+    if if_none_match is None:
+        return False
+
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+catalogue_cache = ResponseCache(
+    ttl=settings.catalogue_cache_ttl,
+    max_entries=settings.catalogue_cache_max_entries,
+)
@@ -1,26 +1,67 @@
-from pathlib import Path
-from typing import AsyncGenerator
+import re
+from time import perf_counter, time
+from typing import Any, AsyncGenerator
 
 import httpx
 from fastapi import HTTPException
-from httpx import AsyncClient, Auth, HTTPStatusError, Request, RequestError, Response
+from httpx import (
+    AsyncClient,
+    AsyncHTTPTransport,
+    Auth,
+    Limits,
+    Request,
+    Response,
+    Timeout,
+)
 from loguru import logger
 
 from api.config import settings
-
-access_token_file = Path(".token")
-access_token_file.touch()
+from api.fake_upstream import FakeUpstream
+from api.metrics import upstream_pool_wait, upstream_request_duration
+from api.resilience import CircuitBreaker, RateLimiter, ResilientTransport
+from api.token_store import (
+    MemoryTokenStore,
+    StoredToken,
+    TokenStore,
+    create_token_store,
+)
 
 
 class BearerAuth(Auth):
-    def __init__(self, base_url: str, refresh_token: str) -> None:
+    # ? the /auth response is parsed inside the flow, and the body of a 401 must be
+    # read so its connection goes back to the pool before the request is resent
+    requires_response_body = True
+
+    def __init__(
+        self,
+        base_url: str,
+        refresh_token: str,
+        token_ttl: float | None = None,
+        refresh_margin: float = 0.0,
+        store: TokenStore | None = None,
+    ) -> None:
         self.base_url = base_url
         self.refresh_token = refresh_token
-        self.access_token = ""
-
-        # ? using a file because environment variables are not persistent between processes
-        if settings.environment == "development":
-            self.access_token = access_token_file.read_text()
+        self.token_ttl = token_ttl
+        self.refresh_margin = refresh_margin
+        self.store = store if store is not None else MemoryTokenStore()
+        # ? last token this process used, replaced (never mutated) on every refresh
+        self.token: StoredToken | None = None
+
+    def _expiring(self, token: StoredToken) -> bool:
+        return (
+            token.expires_at is not None
+            and time() >= token.expires_at - self.refresh_margin
+        )
+
+    def _usable(self, stored: StoredToken, seen: StoredToken | None) -> bool:
+        """Whether the stored token replaces `seen` without calling /auth."""
+
+        return (
+            bool(stored.access_token)
+            and not self._expiring(stored)
+            and (seen is None or stored.version != seen.version)
+        )
 
     async def async_auth_flow(
         self,
@@ -28,70 +69,180 @@ class BearerAuth(Auth):
     ) -> AsyncGenerator[Request, Response]:
         """
         Interceps request/response flow and sets the Bearer access token.
-        If the response is 401 UNAUTHORIZED it will fetch a new access token
-        using the refresh token.
+        The token is refreshed ahead of its expiry (when its lifetime is known)
+        and whenever the response is 401 UNAUTHORIZED.
+        Refreshes are single-flight across processes: the refreshing process
+        holds the store lock, the others wait on it and then pick up the token
+        it stored instead of calling /auth themselves.
+        The /auth request is yielded from the flow, so it is sent by the same
+        pooled client as the request being authenticated.
         """
 
-        request.headers["Bearer"] = self.access_token
+        seen = self.token
+
+        if seen is None or self._expiring(seen):
+            async with self.store.lock():
+                if self.token is seen:
+                    stored = await self.store.load()
+
+                    if self._usable(stored, seen):
+                        self.token = stored
+                    else:
+                        response = yield self._build_auth_request()
+                        self.token = await self._store_access_token(response, stored)
+
+        seen = self.token
+        request.headers["Bearer"] = seen.access_token
         response = yield request
 
         if response.status_code == httpx.codes.UNAUTHORIZED:
             # If the server issues a 401 UNAUTHORIZED response, then issue a request to
-            # refresh the access token, and resend the request.
-            logger.info("Refreshing access token...")
-            self.access_token = await self.fetch_access_token()
-
-            if settings.environment == "development":
-                access_token_file.write_text(self.access_token)
-
-            request.headers["Bearer"] = self.access_token
+            # refresh the access token (unless another request already did), and resend
+            async with self.store.lock():
+                if self.token is seen:
+                    stored = await self.store.load()
+
+                    if self._usable(stored, seen):
+                        self.token = stored
+                    else:
+                        logger.info("Refreshing access token...")
+                        response = yield self._build_auth_request()
+                        self.token = await self._store_access_token(response, stored)
+
+            request.headers["Bearer"] = self.token.access_token
             yield request
 
+    def _build_auth_request(self) -> Request:
+        return Request(
+            "POST",
+            f"{self.base_url}/auth",
+            headers={"Bearer": self.refresh_token},
+        )
+
+    async def _store_access_token(
+        self,
+        response: Response,
+        stored: StoredToken,
+    ) -> StoredToken:
         if response.status_code == httpx.codes.BAD_REQUEST:
             # tried to fetch a new access token while a valid access token still exists
-            # possible fix: save last access token in the database or a file
             logger.error("cannot obtain an access token when valid one still exists")
             raise HTTPException(
                 status_code=502,
                 detail="Cannot obtain a new access token. Please try again later.",
             )
 
-    async def fetch_access_token(self) -> str:
-        try:
-            # independant of the client object
-            async with AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/auth",
-                    headers={"Bearer": self.refresh_token},
-                )
-            response.raise_for_status()
-        except RequestError as e:
-            logger.error(f"An error occurred while requesting {e.request.url!r}.")
-            raise HTTPException(
-                status_code=503,
-                detail="Service temporarily unavailable. Please try again later.",
-            ) from e
-        except HTTPStatusError as e:
+        if response.is_error:
             logger.error(
-                f"Error response {e.response.status_code} while requesting {e.request.url!r}.",
+                f"Error response {response.status_code} while requesting {response.request.url!r}.",
             )
             raise HTTPException(
-                status_code=e.response.status_code,
-                detail=f"Error response {e.response.status_code} while requesting {e.request.url!r}.",
-            ) from e
+                status_code=response.status_code,
+                detail=f"Error response {response.status_code} while requesting {response.request.url!r}.",
+            )
 
         access_token = response.json().get("access_token")
 
         if access_token is None:
-            raise HTTPException
+            raise HTTPException(
+                status_code=502,
+                detail="Cannot obtain a new access token. Please try again later.",
+            )
 
-        return access_token
+        token = StoredToken(
+            access_token=access_token,
+            version=stored.version + 1,
+            expires_at=time() + self.token_ttl if self.token_ttl is not None else None,
+        )
+
+        if not await self.store.save(token, expected_version=stored.version):
+            # ? only possible when the store lock was bypassed, the new token is
+            # still the freshest one upstream knows about
+            logger.warning("access token was replaced while refreshing it")
+
+        return token
+
+
+_uuid_pattern = re.compile(
+    r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", re.IGNORECASE
+)
+# ? first connection-level event of a request, the pool has handed it a connection
+_connection_events = (
+    "connection.connect_tcp.started",
+    "http11.send_request_headers.started",
+    "http2.send_request_headers.started",
+)
+
+
+def _endpoint(request: Request) -> str:
+    """Request path with ids replaced, so it can be used as a metric label."""
+
+    return _uuid_pattern.sub("{id}", request.url.path)
+
+
+async def _observe_request(request: Request) -> None:
+    """Starts timing the request and traces how long it waits for a connection."""
+
+    endpoint = _endpoint(request)
+    started = perf_counter()
+    waiting = True
+
+    async def trace(event: str, info: dict[str, Any]) -> None:
+        nonlocal waiting
+
+        if waiting and event in _connection_events:
+            waiting = False
+            upstream_pool_wait.labels(endpoint).observe(perf_counter() - started)
+
+    request.extensions["trace"] = trace
+    request.extensions["started"] = started
+
+
+async def _observe_response(response: Response) -> None:
+    request = response.request
+    upstream_request_duration.labels(
+        request.method, _endpoint(request), response.status_code
+    ).observe(perf_counter() - request.extensions["started"])
 
 
 client = AsyncClient(
     auth=BearerAuth(
         base_url=settings.applifting_api_base_url,
         refresh_token=settings.applifting_api_refresh_token,
+        token_ttl=settings.applifting_api_token_ttl,
+        refresh_margin=settings.applifting_api_token_refresh_margin,
+        store=create_token_store(settings),
     ),
     base_url=settings.applifting_api_base_url,
+    transport=ResilientTransport(
+        FakeUpstream.from_settings(settings).transport()
+        if settings.upstream_fake
+        else AsyncHTTPTransport(
+            http2=settings.upstream_http2,
+            limits=Limits(
+                max_connections=settings.upstream_max_connections,
+                max_keepalive_connections=settings.upstream_max_keepalive_connections,
+                keepalive_expiry=settings.upstream_keepalive_expiry,
+            ),
+        ),
+        breaker=CircuitBreaker(
+            failure_threshold=settings.upstream_circuit_failure_threshold,
+            reset_timeout=settings.upstream_circuit_reset_timeout,
+        ),
+        limiter=RateLimiter(
+            max_rate=settings.upstream_rate_limit,
+            min_rate=settings.upstream_rate_limit_min,
+            burst=settings.upstream_rate_limit_burst,
+        ),
+        max_retries=settings.upstream_max_retries,
+        backoff=settings.upstream_retry_backoff,
+        backoff_max=settings.upstream_retry_backoff_max,
+    ),
+    timeout=Timeout(
+        connect=settings.upstream_connect_timeout,
+        read=settings.upstream_read_timeout,
+        write=settings.upstream_write_timeout,
+        pool=settings.upstream_pool_timeout,
+    ),
+    event_hooks={"request": [_observe_request], "response": [_observe_response]},
 )
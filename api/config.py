@@ -1,4 +1,6 @@
-from typing import NewType
+from importlib.util import find_spec
+from pathlib import Path
+from typing import Literal, NewType
 
 import sqlalchemy
 from dotenv import find_dotenv
@@ -16,6 +18,31 @@ class Settings(BaseSettings):
     project_name: str = "applifting-api"
     api_prefix: str = "/api/v1"
     refetch_interval: Seconds = Seconds(60.0)
+    refetch_min_interval: Seconds = Seconds(15.0)
+    refetch_max_interval: Seconds = Seconds(900.0)
+    refetch_read_half_life: Seconds = Seconds(3600.0)
+    read_flush_interval: Seconds = Seconds(10.0)
+    refetch_hot_reads: float = 10.0
+    refetch_volatility_alpha: float = 0.3
+    replica_ttl: Seconds = Seconds(180.0)
+    refresh_enabled: bool = True
+    migrate_on_startup: bool = False
+    worker_health_host: str = "0.0.0.0"
+    worker_health_port: int = 8001
+    worker_shutdown_timeout: Seconds = Seconds(30.0)
+    refetch_concurrency: int = 16
+    refetch_host_concurrency: int = 8
+    refetch_cycle_timeout: Seconds = Seconds(300.0)
+    offer_sync_batch_size: int = 100
+    catalogue_cache_ttl: Seconds = Seconds(60.0)
+    catalogue_cache_max_entries: int = 256
+    catalogue_listen_retry_interval: Seconds = Seconds(5.0)
+    page_default_limit: int = 100
+    page_max_limit: int = 1000
+    export_batch_size: int = 1000
+    batch_max_size: int = 1000
+    register_concurrency: int = 16
+    register_max_attempts: int = 3
 
     cors_allowed_origins: list[str] = ["*"]
     cors_allowed_credentials: bool = True
@@ -24,12 +51,59 @@ class Settings(BaseSettings):
 
     applifting_api_base_url: str
     applifting_api_refresh_token: str
+    applifting_api_token_ttl: Seconds | None = None
+    applifting_api_token_refresh_margin: Seconds = Seconds(30.0)
+    # ? HTTP/2 needs the h2 package (httpx[http2]), so only default to it when installed
+    upstream_http2: bool = find_spec("h2") is not None
+    upstream_max_connections: int = 32
+    upstream_max_keepalive_connections: int = 16
+    upstream_keepalive_expiry: Seconds = Seconds(30.0)
+    upstream_connect_timeout: Seconds = Seconds(5.0)
+    upstream_read_timeout: Seconds = Seconds(15.0)
+    upstream_write_timeout: Seconds = Seconds(5.0)
+    upstream_pool_timeout: Seconds = Seconds(10.0)
+    upstream_rate_limit: float = 50.0
+    upstream_rate_limit_min: float = 1.0
+    upstream_rate_limit_burst: int = 20
+    upstream_max_retries: int = 3
+    upstream_retry_backoff: Seconds = Seconds(0.5)
+    upstream_retry_backoff_max: Seconds = Seconds(10.0)
+    upstream_circuit_failure_threshold: int = 5
+    upstream_circuit_reset_timeout: Seconds = Seconds(30.0)
+    # ? serve upstream from api.fake_upstream instead, for tests and benchmarks
+    upstream_fake: bool = False
+    upstream_fake_latency: Seconds = Seconds(0.0)
+    upstream_fake_jitter: Seconds = Seconds(0.0)
+    upstream_fake_error_rate: float = 0.0
+    upstream_fake_token_ttl: Seconds | None = None
+    upstream_fake_churn: float = 0.5
+    upstream_fake_seed: int | None = None
+    offer_history_partitions_ahead: int = 2
+    offer_history_raw_retention: Seconds = Seconds(90 * 24 * 3600.0)
+    offer_history_retention: Seconds = Seconds(2 * 365 * 24 * 3600.0)
+    offer_history_maintenance_interval: Seconds = Seconds(3600.0)
+    log_level: str = "INFO"
+    log_format: Literal["json", "text"] = "json"
+    log_queue_size: int = 10_000
+    log_batch_size: int = 500
+    log_rate_limit: float = 50.0
+    log_rate_limit_burst: int = 200
+    token_store: Literal["memory", "file", "postgres"] = "memory"
+    token_store_path: Path = Path(".token")
 
     postgres_host: str
     postgres_port: int
     postgres_user: str
     postgres_password: str
     postgres_database: str
+    postgres_pool_size: int = 10
+    postgres_max_overflow: int = 20
+    postgres_pool_timeout: Seconds = Seconds(30.0)
+    postgres_pool_recycle: Seconds = Seconds(1800.0)
+    postgres_pool_pre_ping: bool = True
+    postgres_echo: bool | None = None
+    worker_postgres_pool_size: int = 4
+    worker_postgres_max_overflow: int = 4
 
     @computed_field
     @property
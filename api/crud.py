@@ -1,25 +1,73 @@
 from __future__ import annotations
 
-from typing import Iterable
+from datetime import datetime, timedelta, timezone
+from typing import Any, Sequence
 from uuid import UUID
 
+import orjson
 from dependency_injector.wiring import Provide, inject
 from fastapi import HTTPException
 from loguru import logger
-from sqlalchemy import delete, select
+from sqlalchemy import (
+    Boolean,
+    all_,
+    any_,
+    ColumnElement,
+    Row,
+    Select,
+    Uuid,
+    bindparam,
+    cast,
+    column,
+    delete,
+    func,
+    literal,
+    literal_column,
+    or_,
+    select,
+    true,
+    tuple_,
+    union_all,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import (
+    ARRAY,
+    INTEGER,
+    TEXT,
+    TIMESTAMP,
+    VARCHAR,
+    aggregate_order_by,
+    insert,
+)
 from sqlalchemy.exc import (
     DatabaseError,
     IntegrityError,
     SQLAlchemyError,
 )
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
-from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
 
+from api.cache import catalogue_cache
+from api.config import settings
 from api.dependencies import Container
-from api.models import OfferORM, ProductORM
-from api.schemas.offer import Offer
-from api.schemas.product import ProductCreateIn, ProductUpdateIn
+from api.invalidation import CATALOGUE_CHANNEL
+from api.models import (
+    OfferHistoryDailyORM,
+    OfferHistoryORM,
+    OfferORM,
+    OfferSummaryORM,
+    ProductORM,
+    ProductReadORM,
+    ReplicaORM,
+)
+from api.pagination import decode_cursor, encode_cursor
+from api.schemas.offer import Offer, OfferHistoryQuery, OfferSyncResult
+from api.schemas.product import (
+    ProductBatchUpdateIn,
+    ProductCreateIn,
+    ProductQuery,
+    ProductUpdateIn,
+)
 
 
 @inject
@@ -31,6 +79,7 @@ async def create_product(
         created_product = ProductORM(**product.model_dump())
         session.add(created_product)
         await session.commit()
+        catalogue_cache.invalidate()
         await session.refresh(created_product)
         return created_product
     except IntegrityError as e:
@@ -54,34 +103,323 @@ async def create_product(
         ) from e
 
 
+@inject
+async def create_products(
+    products: list[ProductCreateIn],
+    session: AsyncSession = Provide[Container.session],
+) -> set[UUID]:
+    """
+    Inserts a batch of products with one multi-row statement.
+    Returns the ids that were created; the others already existed.
+    """
+
+    if not products:
+        return set()
+
+    table = ProductORM.__table__
+    statement = (
+        insert(table)
+        .values([product.model_dump() for product in products])
+        .on_conflict_do_nothing(index_elements=[table.c.id])
+        .returning(table.c.id)
+    )
+
+    try:
+        created = set((await session.scalars(statement)).all())
+        await session.commit()
+    except SQLAlchemyError as e:
+        logger.error(f"Database error while creating products: {e}")
+        await session.rollback()
+        raise HTTPException(
+            status_code=500, detail="Error occurred while creating the products"
+        ) from e
+
+    if created:
+        catalogue_cache.invalidate()
+
+    return created
+
+
+_product_columns = (
+    ProductORM.id,
+    ProductORM.name,
+    ProductORM.description,
+    ProductORM.created_at,
+    ProductORM.updated_at,
+)
+_offer_columns = (OfferORM.id, OfferORM.price, OfferORM.items_in_stock)
+
+
+def _keyset_page(
+    statement: Select[tuple[Any, ...]], query: ProductQuery
+) -> Select[tuple[Any, ...]]:
+    """
+    Restricts a products statement to one page ordered by the `(created_at, id)`
+    keyset, plus one extra row that tells whether there is a next page.
+    """
+
+    if query.cursor is not None:
+        created_at, id = decode_cursor(query.cursor)
+        statement = statement.where(
+            tuple_(ProductORM.created_at, ProductORM.id) > tuple_(created_at, id)
+        )
+
+    if query.name_prefix is not None:
+        statement = statement.where(
+            ProductORM.name.startswith(query.name_prefix, autoescape=True)
+        )
+
+    return statement.order_by(ProductORM.created_at, ProductORM.id).limit(
+        query.limit + 1
+    )
+
+
+def _select_products(query: ProductQuery) -> Select[tuple[Any, ...]]:
+    statement = select(*_product_columns)
+
+    offer_filters = []
+    if query.price_min is not None:
+        offer_filters.append(OfferORM.price >= query.price_min)
+    if query.price_max is not None:
+        offer_filters.append(OfferORM.price <= query.price_max)
+    if query.in_stock:
+        offer_filters.append(OfferORM.items_in_stock > 0)
+
+    if offer_filters:
+        statement = statement.where(
+            select(OfferORM.id)
+            .where(OfferORM.product_id == ProductORM.id, *offer_filters)
+            .exists()
+        )
+
+    return _keyset_page(statement, query)
+
+
+def _select_catalogue(query: ProductQuery) -> Select[tuple[Any, ...]]:
+    summary = OfferSummaryORM
+    statement = select(
+        *_product_columns,
+        func.coalesce(cast(summary.offers, TEXT), "[]").label("offers"),
+    ).outerjoin(summary, summary.product_id == ProductORM.id)
+
+    offers = (
+        func.jsonb_to_recordset(summary.offers)
+        .table_valued(column("price", INTEGER), column("items_in_stock", INTEGER))
+        .render_derived(with_types=True)
+    )
+
+    # ? each filter alone is answered by the summary's aggregates, combined they
+    # ? must hold for the same offer, which only the offers themselves can tell
+    offer_filters = []
+    if query.price_min is not None:
+        statement = statement.where(summary.max_price >= query.price_min)
+        offer_filters.append(offers.c.price >= query.price_min)
+    if query.price_max is not None:
+        statement = statement.where(summary.min_price <= query.price_max)
+        offer_filters.append(offers.c.price <= query.price_max)
+    if query.in_stock:
+        statement = statement.where(summary.total_stock > 0)
+        offer_filters.append(offers.c.items_in_stock > 0)
+
+    if len(offer_filters) > 1:
+        statement = statement.where(
+            select(offers.c.price).where(*offer_filters).exists()
+        )
+
+    return _keyset_page(statement, query)
+
+
+def _page(
+    products: list[dict[str, Any]], query: ProductQuery
+) -> tuple[list[dict[str, Any]], str | None]:
+    if len(products) <= query.limit:
+        return products, None
+
+    products = products[: query.limit]
+    return products, encode_cursor(products[-1]["created_at"], products[-1]["id"])
+
+
 @inject
 async def read_products(
+    query: ProductQuery,
     session: AsyncSession = Provide[Container.session],
-) -> Iterable[ProductORM]:
-    statement = select(ProductORM)
-    scalars = await session.scalars(statement=statement)
-    return scalars.all()
+) -> tuple[list[dict[str, Any]], str | None]:
+    """
+    Reads one page of products as plain dicts (no ORM or Pydantic objects),
+    ready to be encoded with `api.responses.dumps`.
+    """
+
+    result = await session.execute(_select_products(query))
+    return _page([dict(row) for row in result.mappings()], query)
 
 
 @inject
 async def read_products_with_offers(
+    query: ProductQuery,
     session: AsyncSession = Provide[Container.session],
-) -> Iterable[ProductORM]:
-    statement = select(ProductORM).options(selectinload(ProductORM.offers))
-    scalars = await session.scalars(statement=statement)
+) -> tuple[list[dict[str, Any]], str | None]:
+    """
+    Reads one page of products joined with the `offer_summary` read model in
+    one query. Offers come as JSON text and are embedded in the response as is.
+    Products are read live, their offers as of the last offer refresh cycle.
+    """
 
-    return scalars.all()
+    result = await session.execute(_select_catalogue(query))
+    products, next_cursor = _page([dict(row) for row in result.mappings()], query)
+
+    for product in products:
+        product["offers"] = orjson.Fragment(product["offers"])
+
+    return products, next_cursor
+
+
+@inject
+async def stream_products_with_offers(
+    session: AsyncSession = Provide[Container.session],
+) -> AsyncResult[tuple[UUID, str, str, datetime, datetime, UUID, int, int]]:
+    """
+    Streams every product joined with its offers through a server-side cursor,
+    ordered so that all rows of one product are adjacent.
+    """
+
+    statement = (
+        select(
+            *_product_columns,
+            *(column.label(f"offer_{column.key}") for column in _offer_columns),
+        )
+        .outerjoin(OfferORM, OfferORM.product_id == ProductORM.id)
+        .order_by(ProductORM.created_at, ProductORM.id)
+        .execution_options(yield_per=settings.export_batch_size)
+    )
+    return await session.stream(statement)
+
+
+@inject
+async def read_offer_fingerprints(
+    session: AsyncSession = Provide[Container.session],
+) -> Sequence[Row[tuple[UUID, str | None]]]:
+    statement = select(ProductORM.id, ProductORM.offers_fingerprint)
+    result = await session.execute(statement)
+    return result.all()
+
+
+def _decayed_reads(half_life: float) -> ColumnElement[float]:
+    # ? read_at is a naive TIMESTAMP, compared with the database's local time
+    age = func.extract("epoch", func.localtimestamp() - ProductReadORM.read_at)
+    return ProductReadORM.reads * func.power(0.5, age / half_life)
+
+
+@inject
+async def read_product_reads(
+    half_life: float,
+    session: AsyncSession = Provide[Container.session],
+) -> Sequence[Row[tuple[UUID, float]]]:
+    """Reads the read counts of all products, decayed to now."""
+
+    statement = select(ProductReadORM.product_id, _decayed_reads(half_life))
+    result = await session.execute(statement)
+    return result.all()
+
+
+@inject
+async def record_product_reads(
+    reads: dict[UUID, int],
+    half_life: float,
+    session: AsyncSession = Provide[Container.session],
+) -> None:
+    """
+    Adds reads counted by one process to the read counts shared by all of
+    them with one upsert, decaying the stored counts to now first.
+    Reads of products that no longer exist are dropped. A failed write is
+    logged and its reads are lost, they only steer the refresh schedule.
+    """
+
+    if not reads:
+        return
+
+    # ? sorted, so concurrent upserts lock the rows in the same order
+    product_ids = sorted(reads)
+    batch = (
+        func.unnest(
+            bindparam("product_ids", product_ids, ARRAY(Uuid)),
+            bindparam(
+                "reads",
+                [reads[product_id] for product_id in product_ids],
+                ARRAY(INTEGER),
+            ),
+        )
+        .table_valued("product_id", "reads")
+        .render_derived(name="batch")
+    )
+    upsert = insert(ProductReadORM.__table__).from_select(
+        ["product_id", "reads", "read_at"],
+        select(batch.c.product_id, batch.c.reads, func.localtimestamp()).join(
+            ProductORM, ProductORM.id == batch.c.product_id
+        ),
+    )
+    statement = upsert.on_conflict_do_update(
+        index_elements=[ProductReadORM.product_id],
+        set_={
+            "reads": _decayed_reads(half_life) + upsert.excluded.reads,
+            "read_at": upsert.excluded.read_at,
+        },
+    )
+
+    try:
+        await session.execute(statement)
+        await session.commit()
+    except SQLAlchemyError as e:
+        logger.error(f"Database error while recording product reads: {e}")
+        await session.rollback()
+
+
+@inject
+async def heartbeat_replica(
+    replica_id: str,
+    ttl: float,
+    session: AsyncSession = Provide[Container.session],
+) -> list[str]:
+    """
+    Marks the replica alive, forgets replicas silent for more than `ttl`
+    seconds and returns the ids of the live ones (this one included).
+    """
+
+    statement = (
+        insert(ReplicaORM)
+        .values(id=replica_id, heartbeat_at=func.now())
+        .on_conflict_do_update(
+            index_elements=[ReplicaORM.id], set_={"heartbeat_at": func.now()}
+        )
+    )
+    await session.execute(statement)
+    await session.execute(
+        delete(ReplicaORM).where(
+            ReplicaORM.heartbeat_at < func.now() - timedelta(seconds=ttl)
+        )
+    )
+    replicas = await session.scalars(select(ReplicaORM.id).order_by(ReplicaORM.id))
+    await session.commit()
+    return list(replicas)
+
+
+@inject
+async def remove_replica(
+    replica_id: str,
+    session: AsyncSession = Provide[Container.session],
+) -> None:
+    await session.execute(delete(ReplicaORM).where(ReplicaORM.id == replica_id))
+    await session.commit()
 
 
 @inject
 async def read_product(
     product_id: UUID,
     session: AsyncSession = Provide[Container.session],
-) -> ProductORM | None:
+) -> dict[str, Any] | None:
     try:
-        statement = select(ProductORM).where(ProductORM.id == product_id)
-        scalars = await session.scalars(statement)
-        product = scalars.one_or_none()
+        statement = select(*_product_columns).where(ProductORM.id == product_id)
+        row = (await session.execute(statement)).mappings().one_or_none()
+        product = None if row is None else dict(row)
     except SQLAlchemyError as e:
         logger.error(f"Database error while reading product {product_id}: {e}")
         raise HTTPException(
@@ -96,24 +434,19 @@ async def update_product(
     product_id: UUID,
     product: ProductUpdateIn,
     session: AsyncSession = Provide[Container.session],
-) -> ProductORM:
+) -> dict[str, Any] | None:
+    """Updates a product in one round trip, returns None if it does not exist."""
+
+    statement = (
+        update(ProductORM.__table__)
+        .where(ProductORM.__table__.c.id == product_id)
+        .values(name=product.name, description=product.description)
+        .returning(*_product_columns)
+    )
+
     try:
-        updated_product = await session.merge(
-            ProductORM(
-                id=product_id,
-                name=product.name,
-                description=product.description,
-            ),
-        )
+        row = (await session.execute(statement)).mappings().one_or_none()
         await session.commit()
-        await session.refresh(updated_product)
-    except StaleDataError as e:
-        logger.error(f"Concurrent update detected for product {product_id}: {e}")
-        await session.rollback()
-        raise HTTPException(
-            status_code=409,
-            detail="Product was modified by another request. Please try again",
-        ) from e
     except IntegrityError as e:
         logger.error(f"Integrity error while updating product {product_id}: {e}")
         await session.rollback()
@@ -126,73 +459,484 @@ async def update_product(
         raise HTTPException(
             status_code=500, detail="Error occurred while updating the product"
         ) from e
-    else:
-        return updated_product
+
+    if row is None:
+        return None
+
+    catalogue_cache.invalidate()
+    return dict(row)
+
+
+@inject
+async def update_products(
+    products: list[ProductBatchUpdateIn],
+    session: AsyncSession = Provide[Container.session],
+) -> set[UUID]:
+    """
+    Updates a batch of products with one UPDATE ... FROM (VALUES ...) statement.
+    Returns the ids that were updated; the others do not exist.
+    """
+
+    if not products:
+        return set()
+
+    table = ProductORM.__table__
+    batch = values(
+        column("id", Uuid),
+        column("name", VARCHAR),
+        column("description", TEXT),
+        name="batch",
+    ).data([(product.id, product.name, product.description) for product in products])
+    statement = (
+        update(table)
+        .where(table.c.id == batch.c.id)
+        .values(name=batch.c.name, description=batch.c.description)
+        .returning(table.c.id)
+    )
+
+    try:
+        updated = set((await session.scalars(statement)).all())
+        await session.commit()
+    except SQLAlchemyError as e:
+        logger.error(f"Database error while updating products: {e}")
+        await session.rollback()
+        raise HTTPException(
+            status_code=500, detail="Error occurred while updating the products"
+        ) from e
+
+    if updated:
+        catalogue_cache.invalidate()
+
+    return updated
 
 
 @inject
 async def delete_product(
-    product: ProductORM,
+    product_id: UUID,
     session: AsyncSession = Provide[Container.session],
-) -> ProductORM:
+) -> UUID | None:
+    """
+    Deletes a product (its offers cascade) in one round trip,
+    returns None if it does not exist.
+    """
+
+    statement = (
+        delete(ProductORM.__table__)
+        .where(ProductORM.__table__.c.id == product_id)
+        .returning(ProductORM.__table__.c.id)
+    )
+
     try:
-        await session.delete(product)
+        deleted = (await session.scalars(statement)).one_or_none()
         await session.commit()
     except IntegrityError as e:
-        logger.error(f"Integrity error while deleting product {product.id}: {e}")
+        logger.error(f"Integrity error while deleting product {product_id}: {e}")
         await session.rollback()
         raise HTTPException(
             status_code=409, detail="Cannot delete product due to existing references"
         ) from e
     except SQLAlchemyError as e:
-        logger.error(f"Database error while deleting product {product.id}: {e}")
+        logger.error(f"Database error while deleting product {product_id}: {e}")
         await session.rollback()
         raise HTTPException(
             status_code=500, detail="Error occurred while deleting the product"
         ) from e
-    else:
-        return product
+
+    if deleted is not None:
+        catalogue_cache.invalidate()
+
+    return deleted
+
+
+@inject
+async def delete_products(
+    product_ids: list[UUID],
+    session: AsyncSession = Provide[Container.session],
+) -> set[UUID]:
+    """
+    Deletes a batch of products (their offers cascade) with one statement.
+    Returns the ids that were deleted; the others do not exist.
+    """
+
+    if not product_ids:
+        return set()
+
+    try:
+        statement = (
+            delete(ProductORM.__table__)
+            .where(ProductORM.__table__.c.id.in_(product_ids))
+            .returning(ProductORM.__table__.c.id)
+        )
+        deleted = set((await session.scalars(statement)).all())
+        await session.commit()
+    except SQLAlchemyError as e:
+        logger.error(f"Database error while deleting products: {e}")
+        await session.rollback()
+        raise HTTPException(
+            status_code=500, detail="Error occurred while deleting the products"
+        ) from e
+
+    if deleted:
+        catalogue_cache.invalidate()
+
+    return deleted
 
 
 @inject
 async def read_offers(
     product_id: UUID,
     session: AsyncSession = Provide[Container.session],
-) -> Iterable[OfferORM]:
-    statement = select(OfferORM).where(OfferORM.product_id == product_id)
-    scalars = await session.scalars(statement)
-    return scalars.all()
+) -> list[dict[str, Any]] | None:
+    """
+    Reads offers of a product, returns None if the product does not exist.
+    Both are answered by one LEFT JOIN from the product row.
+    """
+
+    statement = (
+        select(*_offer_columns)
+        .select_from(ProductORM)
+        .outerjoin(OfferORM, OfferORM.product_id == ProductORM.id)
+        .where(ProductORM.id == product_id)
+    )
+    rows = (await session.execute(statement)).mappings().all()
+
+    if not rows:
+        return None
+
+    return [dict(row) for row in rows if row["id"] is not None]
+
+
+def _database_time(value: datetime) -> datetime:
+    # ? observed_at is a naive TIMESTAMP in the database's time zone, UTC by default
+    if value.tzinfo is None:
+        return value
+
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
 
 
 @inject
-async def replace_offers(
+async def read_offer_history(
     product_id: UUID,
-    offers: list[Offer],
+    query: OfferHistoryQuery,
     session: AsyncSession = Provide[Container.session],
-) -> Iterable[OfferORM]:
-    try:
-        statement = delete(OfferORM).where(OfferORM.product_id == product_id)
-        await session.execute(statement)
+) -> list[dict[str, Any]] | None:
+    """
+    Reads the offer history of a product from `since` until `until`, oldest
+    first: the observations and, for days whose observations were rolled
+    up, one row per offer and day. Returns None if the product does not exist,
+    answered by the same statement, LEFT JOINed from the product row.
+    Both tables are read by their primary key, which starts with the product
+    and the time, and only the partitions of the range are scanned.
+    """
+
+    history, daily = OfferHistoryORM, OfferHistoryDailyORM
+
+    observations = select(
+        history.offer_id,
+        history.observed_at,
+        history.price,
+        history.items_in_stock,
+        history.price.label("min_price"),
+        history.price.label("max_price"),
+        literal("observation").label("resolution"),
+    ).where(history.product_id == product_id)
+    days = select(
+        daily.offer_id,
+        cast(daily.day, TIMESTAMP).label("observed_at"),
+        daily.price,
+        daily.items_in_stock,
+        daily.min_price,
+        daily.max_price,
+        literal("day").label("resolution"),
+    ).where(daily.product_id == product_id)
+
+    # ? compared as timestamps, a day is stamped with its midnight
+    if query.since is not None:
+        since = _database_time(query.since)
+        observations = observations.where(history.observed_at >= since)
+        days = days.where(daily.day >= bindparam("since_day", since, TIMESTAMP))
+
+    if query.until is not None:
+        until = _database_time(query.until)
+        observations = observations.where(history.observed_at < until)
+        days = days.where(daily.day < bindparam("until_day", until, TIMESTAMP))
+
+    entries = union_all(days, observations).subquery()
+    page = (
+        select(entries)
+        .order_by(entries.c.observed_at, entries.c.offer_id)
+        .limit(query.limit)
+        .subquery("page")
+    )
+    statement = (
+        select(page)
+        .select_from(ProductORM)
+        .outerjoin(page, true())
+        .where(ProductORM.id == product_id)
+        .order_by(page.c.observed_at, page.c.offer_id)
+    )
+    rows = (await session.execute(statement)).mappings().all()
+
+    if not rows:
+        return None
 
-        new_offers = [
-            OfferORM(
-                **offer.model_dump(exclude={"id"}),
-                id=offer.id if isinstance(offer.id, UUID) else UUID(offer.id),
-                product_id=product_id,
+    return [dict(row) for row in rows if row["offer_id"] is not None]
+
+
+async def _sync_offer_summary(
+    session: AsyncSession, product_ids: list[UUID] | None = None
+) -> None:
+    """
+    Rebuilds the `offer_summary` rows of the given products (of all of them
+    when None) from their offers: upserts the products that have offers and
+    deletes the rows of the ones left without any. Dropping the cached
+    catalogue is left to the caller, see `notify_catalogue`.
+    """
+
+    offer, summary = OfferORM.__table__, OfferSummaryORM.__table__
+
+    offers = select(
+        offer.c.product_id,
+        func.jsonb_agg(
+            aggregate_order_by(
+                func.jsonb_build_object(
+                    "id",
+                    offer.c.id,
+                    "price",
+                    offer.c.price,
+                    "items_in_stock",
+                    offer.c.items_in_stock,
+                ),
+                offer.c.price,
+                offer.c.id,
             )
-            for offer in offers
-            if offer.items_in_stock > 0
-        ]
-        session.add_all(new_offers)
-    except IntegrityError as e:
-        logger.error(
-            f"Integrity error while replacing offers for product {product_id}: {e}"
+        ),
+        func.min(offer.c.price),
+        func.max(offer.c.price),
+        func.sum(offer.c.items_in_stock),
+    ).group_by(offer.c.product_id)
+    emptied = delete(summary).where(
+        ~select(offer.c.id).where(offer.c.product_id == summary.c.product_id).exists()
+    )
+
+    if product_ids is not None:
+        offers = offers.where(offer.c.product_id.in_(product_ids))
+        emptied = emptied.where(summary.c.product_id.in_(product_ids))
+
+    upsert = insert(summary).from_select(
+        ["product_id", "offers", "min_price", "max_price", "total_stock"], offers
+    )
+    await session.execute(
+        upsert.on_conflict_do_update(
+            index_elements=[summary.c.product_id],
+            set_={
+                "offers": upsert.excluded.offers,
+                "min_price": upsert.excluded.min_price,
+                "max_price": upsert.excluded.max_price,
+                "total_stock": upsert.excluded.total_stock,
+            },
         )
+    )
+    await session.execute(emptied)
+
+
+@inject
+async def notify_catalogue(
+    session: AsyncSession = Provide[Container.session],
+) -> None:
+    """
+    Drops the cached catalogue pages in this process and, notified on commit,
+    in all others. For changes to the offer summary, which the `product`
+    trigger does not see.
+    A failed notification is logged and leaves the other processes' caches
+    to expire on their TTL.
+    """
+
+    try:
+        await session.execute(select(func.pg_notify(CATALOGUE_CHANNEL, "")))
+        await session.commit()
+    except SQLAlchemyError as e:
+        logger.error(f"Database error while notifying catalogue changes: {e}")
         await session.rollback()
+
+    catalogue_cache.invalidate()
+
+
+@inject
+async def refresh_catalogue(
+    session: AsyncSession = Provide[Container.session],
+) -> None:
+    """
+    Rebuilds the whole `offer_summary` read model the catalogue is served
+    from, then drops the cached catalogue pages in this process and, notified
+    on commit, in all others. Only needed after offers were written past
+    `replace_offers` (e.g. bulk loads), which keeps the summary of the products
+    it writes up to date itself.
+    A failed rebuild is logged and leaves the summary stale until the next one.
+    """
+
+    try:
+        await _sync_offer_summary(session)
+        await session.execute(select(func.pg_notify(CATALOGUE_CHANNEL, "")))
+        await session.commit()
     except SQLAlchemyError as e:
-        logger.error(
-            f"Database error while replacing offers for product {product_id}: {e}"
+        logger.error(f"Database error while rebuilding the offer summary: {e}")
+        await session.rollback()
+
+    catalogue_cache.invalidate()
+
+
+@inject
+async def replace_offers(
+    offers: dict[UUID, list[Offer]],
+    fingerprints: dict[UUID, str] | None = None,
+    session: AsyncSession = Provide[Container.session],
+) -> OfferSyncResult | None:
+    """
+    Replaces offers of a batch of products with two set-based statements:
+    an INSERT ... ON CONFLICT upsert of the current offers, which leaves
+    unchanged offers alone, and one DELETE of the offers that are no longer
+    listed (or are out of stock).
+    Offers that are new or whose price or stock changed, and the removed ones
+    (with no stock), are appended to the offer history beforehand.
+    The products' offer fingerprints and, if any offer changed, their rows of
+    the `offer_summary` read model are written in the same transaction.
+    The cached catalogue is left to the caller to drop once all its batches
+    are written, see `notify_catalogue`.
+    """
+
+    rows: dict[UUID, dict[str, object]] = {}
+    for product_id, product_offers in offers.items():
+        for offer in product_offers:
+            if offer.items_in_stock > 0:
+                rows[offer.id] = {
+                    "id": offer.id,
+                    "price": offer.price,
+                    "items_in_stock": offer.items_in_stock,
+                    "product_id": product_id,
+                }
+
+    table = OfferORM.__table__
+    history = OfferHistoryORM.__table__
+    history_columns = ["offer_id", "product_id", "price", "items_in_stock"]
+    result = OfferSyncResult()
+
+    try:
+        if rows:
+            # ? one array per column, the parameter count does not grow with the batch
+            current = (
+                func.unnest(
+                    bindparam("ids", [row["id"] for row in rows.values()], ARRAY(Uuid)),
+                    bindparam(
+                        "product_ids",
+                        [row["product_id"] for row in rows.values()],
+                        ARRAY(Uuid),
+                    ),
+                    bindparam(
+                        "prices",
+                        [row["price"] for row in rows.values()],
+                        ARRAY(INTEGER),
+                    ),
+                    bindparam(
+                        "stocks",
+                        [row["items_in_stock"] for row in rows.values()],
+                        ARRAY(INTEGER),
+                    ),
+                )
+                .table_valued("id", "product_id", "price", "items_in_stock")
+                .render_derived(name="current")
+            )
+            changed = (
+                select(
+                    current.c.id,
+                    current.c.product_id,
+                    current.c.price,
+                    current.c.items_in_stock,
+                )
+                .outerjoin(table, table.c.id == current.c.id)
+                .where(
+                    or_(
+                        table.c.id.is_(None),
+                        table.c.price != current.c.price,
+                        table.c.items_in_stock != current.c.items_in_stock,
+                    )
+                )
+            )
+            await session.execute(insert(history).from_select(history_columns, changed))
+
+            upsert = insert(table)
+            statement = upsert.on_conflict_do_update(
+                index_elements=[table.c.id],
+                set_={
+                    "price": upsert.excluded.price,
+                    "items_in_stock": upsert.excluded.items_in_stock,
+                    "product_id": upsert.excluded.product_id,
+                    "fetched_at": func.now(),
+                },
+                # ? unchanged offers are neither rewritten nor returned
+                where=or_(
+                    table.c.price != upsert.excluded.price,
+                    table.c.items_in_stock != upsert.excluded.items_in_stock,
+                    table.c.product_id != upsert.excluded.product_id,
+                ),
+            ).returning(
+                # ? xmax is only zero for rows that did not exist before the upsert
+                literal_column("xmax = 0", type_=Boolean)
+            )
+            inserted = (await session.scalars(statement, list(rows.values()))).all()
+            result.inserted = sum(inserted)
+            result.updated = len(inserted) - result.inserted
+
+        removed = (
+            delete(table)
+            # ? arrays again, not one parameter per product and offer
+            .where(
+                table.c.product_id
+                == any_(bindparam("product_ids", list(offers), ARRAY(Uuid))),
+                table.c.id != all_(bindparam("ids", list(rows), ARRAY(Uuid))),
+            )
+            .returning(table.c.id, table.c.product_id, table.c.price)
+            .cte("removed")
+        )
+        statement = insert(history).from_select(
+            history_columns,
+            select(
+                removed.c.id,
+                removed.c.product_id,
+                removed.c.price,
+                literal(0, INTEGER),
+            ),
         )
+        result.removed = (await session.execute(statement)).rowcount
+
+        if fingerprints:
+            product = ProductORM.__table__
+            statement = (
+                update(product)
+                .where(product.c.id == bindparam("product_id"))
+                # ? assigning updated_at to itself keeps onupdate from bumping it
+                .values(
+                    offers_fingerprint=bindparam("fingerprint"),
+                    updated_at=product.c.updated_at,
+                )
+            )
+            await session.execute(
+                statement,
+                [
+                    {"product_id": product_id, "fingerprint": fingerprint}
+                    for product_id, fingerprint in fingerprints.items()
+                ],
+            )
+
+        if result.inserted or result.updated or result.removed:
+            await _sync_offer_summary(session, list(offers))
+
+        await session.commit()
+    except IntegrityError as e:
+        logger.error(f"Integrity error while replacing offers: {e}")
+        await session.rollback()
+    except SQLAlchemyError as e:
+        logger.error(f"Database error while replacing offers: {e}")
         await session.rollback()
     else:
-        return new_offers
+        return result
@@ -1,5 +1,115 @@
-from sqlalchemy.ext.asyncio import create_async_engine
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Any, AsyncGenerator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, ExecutionContext
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 
 from api.config import settings
+from api.metrics import db_pool_connections, db_query_duration
+
+_statement_kinds = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+
+
+def _query_started(
+    conn: Connection,
+    cursor: Any,
+    statement: str,
+    parameters: Any,
+    context: ExecutionContext,
+    executemany: bool,
+) -> None:
+    conn.info["query_started"] = perf_counter()
+
+
+def _query_finished(
+    conn: Connection,
+    cursor: Any,
+    statement: str,
+    parameters: Any,
+    context: ExecutionContext,
+    executemany: bool,
+) -> None:
+    started = conn.info.pop("query_started", None)
+    if started is None:
+        return
+
+    kind = statement.lstrip()[:6].upper()
+    db_query_duration.labels(kind if kind in _statement_kinds else "OTHER").observe(
+        perf_counter() - started
+    )
+
+
+def _create_engine(pool_size: int, max_overflow: int) -> AsyncEngine:
+    engine = create_async_engine(
+        settings.postgres_url,
+        # ? statements are logged through the sqlalchemy.engine logger instead,
+        # ? see log.configure_logging, echo would add its own stdout handler
+        echo=False,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.postgres_pool_timeout,
+        pool_recycle=settings.postgres_pool_recycle,
+        pool_pre_ping=settings.postgres_pool_pre_ping,
+    )
+    event.listen(engine.sync_engine, "before_cursor_execute", _query_started)
+    event.listen(engine.sync_engine, "after_cursor_execute", _query_finished)
+
+    return engine
+
+
+engine = _create_engine(settings.postgres_pool_size, settings.postgres_max_overflow)
+session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+# ? read at scrape time, so they follow the engine replaced by resize_pool
+db_pool_connections.labels("size").set_function(lambda: engine.pool.size())
+db_pool_connections.labels("checked_out").set_function(lambda: engine.pool.checkedout())
+db_pool_connections.labels("idle").set_function(lambda: engine.pool.checkedin())
+
+
+def resize_pool(pool_size: int, max_overflow: int) -> None:
+    """
+    Replaces the engine with one using a differently sized connection pool.
+    Meant to be called on startup, before any connection is checked out.
+    """
+
+    global engine
+
+    engine = _create_engine(pool_size, max_overflow)
+    session_factory.configure(bind=engine)
+
+
+_current_session: ContextVar[AsyncSession | None] = ContextVar(
+    "current_session", default=None
+)
+
+
+@asynccontextmanager
+async def session_scope() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Opens a new session and makes it the one `Container.session` resolves to
+    for the current task until the scope is exited.
+    """
+
+    async with session_factory() as session:
+        token = _current_session.set(session)
+        try:
+            yield session
+        finally:
+            _current_session.reset(token)
+
+
+def current_session() -> AsyncSession:
+    session = _current_session.get()
+
+    if session is None:
+        raise RuntimeError("No database session in scope, use session_scope()")
 
-engine = create_async_engine(settings.postgres_url, echo=True)
+    return session
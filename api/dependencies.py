@@ -1,34 +1,20 @@
-from typing import Any, AsyncGenerator
-from uuid import UUID
-
 from dependency_injector.containers import DeclarativeContainer
-from dependency_injector.providers import Object, Resource
-from fastapi import HTTPException
+from dependency_injector.providers import Callable, Object
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from api.client import client
 from api.config import settings
 
 
-async def _session() -> AsyncGenerator[AsyncSession, Any]:
-    from api.database import engine
-
-    async with AsyncSession(engine) as session:
-        yield session
-
-
-async def product_exists(product_id: UUID) -> None:
-    from api.crud import read_product
-
-    product = await read_product(product_id=product_id)
+def _session() -> AsyncSession:
+    from api.database import current_session
 
-    if product is None:
-        raise HTTPException(status_code=404, detail="Product not found")
+    return current_session()
 
 
 class Container(DeclarativeContainer):
     settings = Object(settings)
-    session = Resource(_session)
+    session = Callable(_session)
     client = Object(client)
 
 
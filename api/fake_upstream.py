@@ -0,0 +1,162 @@
+"""
+In-process stand-in for the Applifting offers service.
+
+Serves `POST /auth`, `POST /products/register` and
+`GET /products/{id}/offers` through an httpx `MockTransport`, so the
+registration, refresh and auth flows run unchanged (retries, rate limiting
+and circuit breaking included) without the network. Latency, error rate,
+access token expiry and how often offers change are configurable, and every
+random choice is drawn from one seeded generator so runs are repeatable.
+Used in place of the real service when `UPSTREAM_FAKE` is set.
+"""
+
+import asyncio
+import json
+import random
+import re
+from dataclasses import dataclass
+from time import monotonic
+from typing import Any
+from uuid import UUID
+
+import httpx
+
+from api.config import Settings
+
+_offers_path = re.compile(r"/products/(?P<product_id>[^/]+)/offers")
+
+
+@dataclass
+class FakeUpstreamStats:
+    requests: int = 0
+    auth_calls: int = 0
+    auth_rejected: int = 0
+    registered: int = 0
+    errors: int = 0
+    unauthorized: int = 0
+
+
+class FakeUpstream:
+    """
+    Answers each request after `latency` seconds (plus up to `jitter` more).
+    A share of `error_rate` requests fail with 503, access tokens are
+    rejected with 401 once they are `token_ttl` seconds old, and on every
+    fetch a product's offers are replaced with probability `churn`.
+    Like upstream, `/auth` answers 400 while an issued token is still valid.
+    """
+
+    def __init__(
+        self,
+        refresh_token: str,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        token_ttl: float | None = None,
+        churn: float = 0.5,
+        offers_per_product: int = 5,
+        seed: int | None = None,
+    ) -> None:
+        self.refresh_token = refresh_token
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.token_ttl = token_ttl
+        self.churn = churn
+        self.offers_per_product = offers_per_product
+        self.stats = FakeUpstreamStats()
+        self._random = random.Random(seed)
+        self._tokens: dict[str, float] = {}
+        self._offers: dict[UUID, list[dict[str, Any]]] = {}
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "FakeUpstream":
+        return cls(
+            refresh_token=settings.applifting_api_refresh_token,
+            latency=settings.upstream_fake_latency,
+            jitter=settings.upstream_fake_jitter,
+            error_rate=settings.upstream_fake_error_rate,
+            token_ttl=settings.upstream_fake_token_ttl,
+            churn=settings.upstream_fake_churn,
+            seed=settings.upstream_fake_seed,
+        )
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handler)
+
+    def expire_tokens(self) -> None:
+        """Rejects every access token issued so far, as if they all expired."""
+
+        self._tokens.clear()
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.stats.requests += 1
+        await asyncio.sleep(self.latency + self._random.uniform(0, self.jitter))
+
+        if self._random.random() < self.error_rate:
+            self.stats.errors += 1
+            return httpx.Response(503, json={"detail": "Service unavailable"})
+
+        # ? the base URL may carry a prefix, e.g. /api/v1
+        path = request.url.path
+
+        if path.endswith("/auth"):
+            return self._auth(request)
+
+        if not self._authorized(request):
+            self.stats.unauthorized += 1
+            return httpx.Response(401, json={"detail": "Access token expired"})
+
+        if path.endswith("/products/register"):
+            self.stats.registered += 1
+            product = json.loads(request.content)
+            return httpx.Response(201, json={"id": product.get("id")})
+
+        match = _offers_path.search(path)
+        if match is not None:
+            try:
+                product_id = UUID(match["product_id"])
+            except ValueError:
+                return httpx.Response(404, json={"detail": "Product not found"})
+
+            return httpx.Response(200, json=self._product_offers(product_id))
+
+        return httpx.Response(404, json={"detail": "Not found"})
+
+    def _auth(self, request: httpx.Request) -> httpx.Response:
+        self.stats.auth_calls += 1
+
+        if request.headers.get("Bearer") != self.refresh_token:
+            return httpx.Response(401, json={"detail": "Invalid refresh token"})
+
+        if any(self._valid(issued_at) for issued_at in self._tokens.values()):
+            self.stats.auth_rejected += 1
+            return httpx.Response(
+                400, json={"detail": "Valid access token still exists"}
+            )
+
+        access_token = f"{self._random.getrandbits(128):032x}"
+        self._tokens[access_token] = monotonic()
+        return httpx.Response(201, json={"access_token": access_token})
+
+    def _valid(self, issued_at: float) -> bool:
+        return self.token_ttl is None or monotonic() - issued_at < self.token_ttl
+
+    def _authorized(self, request: httpx.Request) -> bool:
+        issued_at = self._tokens.get(request.headers.get("Bearer", ""))
+
+        return issued_at is not None and self._valid(issued_at)
+
+    def _product_offers(self, product_id: UUID) -> list[dict[str, Any]]:
+        offers = self._offers.get(product_id)
+
+        if offers is None or self._random.random() < self.churn:
+            offers = self._offers[product_id] = [
+                {
+                    "id": str(UUID(int=self._random.getrandbits(128), version=4)),
+                    "price": self._random.randint(1, 1000),
+                    "items_in_stock": self._random.randint(0, 50),
+                }
+                for _ in range(self._random.randint(0, self.offers_per_product))
+            ]
+
+        return offers
@@ -0,0 +1,223 @@
+"""
+Partitions, rollup and retention of the offer history.
+
+`offer_history` is partitioned by month of `observed_at`. The partitions are
+created ahead of time here, so the default partition only ever catches
+observations of months that were missed. Months older than
+`offer_history_raw_retention` are rolled up into `offer_history_daily` (one
+row per offer and day, with the day's last price and stock and its price
+range), then their partitions are dropped whole. Daily rows older than
+`offer_history_retention` are deleted.
+
+Every step is idempotent and takes the same advisory lock, so all replicas
+can run `maintain_offer_history` on their own schedule.
+"""
+
+from datetime import date, datetime, timedelta
+
+from dependency_injector.wiring import Provide, inject
+from loguru import logger
+from sqlalchemy import ColumnElement, cast, func, select, text
+from sqlalchemy.dialects.postgresql import DATE, aggregate_order_by, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.config import Settings
+from api.dependencies import Container
+from api.models import OFFER_HISTORY_PARTITION, OfferHistoryDailyORM, OfferHistoryORM
+
+_history = OfferHistoryORM.__table__
+_daily = OfferHistoryDailyORM.__table__
+_default_partition = "offer_history_default"
+
+
+def _month(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _next_month(month: date) -> date:
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def _partition_name(month: date) -> str:
+    return f"offer_history_{month:%Y_%m}"
+
+
+async def _lock(session: AsyncSession) -> None:
+    # ? released with the transaction, serializes the replicas maintaining history
+    await session.execute(
+        select(func.pg_advisory_xact_lock(func.hashtext(_history.name)))
+    )
+
+
+async def _partitions(session: AsyncSession) -> set[str]:
+    statement = text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = CAST(:parent AS regclass)"
+    )
+    names = await session.scalars(statement, {"parent": _history.name})
+    return set(names.all())
+
+
+@inject
+async def ensure_partitions(
+    now: datetime,
+    session: AsyncSession = Provide[Container.session],
+    settings: Settings = Provide[Container.settings],
+) -> list[str]:
+    """
+    Creates the partitions of the current month and of the next
+    `offer_history_partitions_ahead` months that do not exist yet.
+    Observations of those months the default partition caught are moved in.
+    """
+
+    await _lock(session)
+    existing = await _partitions(session)
+    created = []
+
+    month = _month(now.date())
+    for _ in range(settings.offer_history_partitions_ahead + 1):
+        name, upper = _partition_name(month), _next_month(month)
+
+        if name not in existing:
+            # ? a partition cannot be created over rows of the default partition
+            bounds = f"observed_at >= '{month}' AND observed_at < '{upper}'"
+            await session.execute(
+                text(
+                    "CREATE TEMPORARY TABLE offer_history_moved ON COMMIT DROP AS "
+                    f"SELECT * FROM {_default_partition} WHERE {bounds}"
+                )
+            )
+            await session.execute(
+                text(f"DELETE FROM {_default_partition} WHERE {bounds}")
+            )
+            await session.execute(
+                text(
+                    f"CREATE TABLE {name} PARTITION OF {_history.name} "
+                    f"FOR VALUES FROM ('{month}') TO ('{upper}')"
+                )
+            )
+            await session.execute(
+                text(f"INSERT INTO {_history.name} SELECT * FROM offer_history_moved")
+            )
+            await session.execute(text("DROP TABLE offer_history_moved"))
+            created.append(name)
+
+        month = upper
+
+    await session.commit()
+    return created
+
+
+@inject
+async def rollup_history(
+    now: datetime,
+    session: AsyncSession = Provide[Container.session],
+    settings: Settings = Provide[Container.settings],
+) -> list[str]:
+    """
+    Rolls the months older than `offer_history_raw_retention` up into
+    `offer_history_daily`, then drops their partitions (and deletes what the
+    default partition held of them). Returns the dropped partitions.
+    """
+
+    cutoff = _month(
+        (now - timedelta(seconds=settings.offer_history_raw_retention)).date()
+    )
+    day = cast(_history.c.observed_at, DATE)
+
+    def last(column: ColumnElement[int]) -> ColumnElement[int]:
+        # ? the value of the day's last observation
+        return func.array_agg(
+            aggregate_order_by(column, _history.c.observed_at.desc())
+        )[1]
+
+    statement = insert(_daily).from_select(
+        [
+            "product_id",
+            "day",
+            "offer_id",
+            "price",
+            "items_in_stock",
+            "min_price",
+            "max_price",
+            "observations",
+        ],
+        select(
+            _history.c.product_id,
+            day,
+            _history.c.offer_id,
+            last(_history.c.price),
+            last(_history.c.items_in_stock),
+            func.min(_history.c.price),
+            func.max(_history.c.price),
+            func.count(),
+        )
+        .where(_history.c.observed_at < cutoff)
+        .group_by(_history.c.product_id, day, _history.c.offer_id),
+    )
+
+    await _lock(session)
+    # ? idempotent, a rollup interrupted before the drop is simply redone
+    await session.execute(statement.on_conflict_do_nothing())
+    await session.commit()
+
+    await _lock(session)
+    dropped = []
+    for name in sorted(await _partitions(session)):
+        match = OFFER_HISTORY_PARTITION.fullmatch(name)
+        if match is None or name == _default_partition:
+            continue
+
+        year, month = map(int, match[1].split("_"))
+        if _next_month(date(year, month, 1)) <= cutoff:
+            await session.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+
+    await session.execute(
+        text(f"DELETE FROM {_default_partition} WHERE observed_at < :cutoff"),
+        {"cutoff": cutoff},
+    )
+    await session.commit()
+    return dropped
+
+
+@inject
+async def expire_history(
+    now: datetime,
+    session: AsyncSession = Provide[Container.session],
+    settings: Settings = Provide[Container.settings],
+) -> int:
+    """Deletes the daily rollups older than `offer_history_retention`."""
+
+    cutoff = (now - timedelta(seconds=settings.offer_history_retention)).date()
+
+    await _lock(session)
+    result = await session.execute(_daily.delete().where(_daily.c.day < cutoff))
+    await session.commit()
+    return result.rowcount
+
+
+@inject
+async def maintain_offer_history(
+    now: datetime | None = None,
+    session: AsyncSession = Provide[Container.session],
+) -> None:
+    """
+    Runs the partition, rollup and retention jobs, each in its own
+    transaction. `now` defaults to the database's local time, the clock
+    `observed_at` is taken from.
+    """
+
+    if now is None:
+        now = await session.scalar(select(func.localtimestamp()))
+
+    created = await ensure_partitions(now=now)
+    dropped = await rollup_history(now=now)
+    expired = await expire_history(now=now)
+
+    if created or dropped or expired:
+        logger.info(
+            f"offer history: created partitions {created}, "
+            f"rolled up and dropped {dropped}, expired {expired} daily rows"
+        )
@@ -0,0 +1,55 @@
+"""
+Invalidation of the catalogue cache across processes.
+
+What the catalogue is built from changes in other processes too: products are
+written by other web replicas and the offer summary by the refresh worker.
+Every such change sends a notification on `CATALOGUE_CHANNEL` (from a trigger
+on `product`, and from `crud.notify_catalogue` once a refresh cycle wrote the
+offer summary), delivered once its transaction commits. Each web process listens on one dedicated
+connection and drops its cached catalogue pages when one arrives. While the
+connection is down the cache falls back to its TTL, and it is dropped again
+once the connection is back, since notifications may have been missed.
+"""
+
+from asyncio import Event, sleep
+
+import asyncpg
+from loguru import logger
+
+from api.cache import catalogue_cache
+from api.config import settings
+
+CATALOGUE_CHANNEL = "catalogue"
+
+
+def _invalidate(*_: object) -> None:
+    catalogue_cache.invalidate()
+
+
+async def listen_for_invalidations() -> None:
+    """Invalidates the catalogue cache on every notification, until cancelled."""
+
+    while True:
+        try:
+            connection = await asyncpg.connect(
+                host=settings.postgres_host,
+                port=settings.postgres_port,
+                user=settings.postgres_user,
+                password=settings.postgres_password,
+                database=settings.postgres_database,
+            )
+        except (OSError, asyncpg.PostgresError) as e:
+            logger.warning(f"cannot listen for catalogue invalidations: {e}")
+            await sleep(settings.catalogue_listen_retry_interval)
+            continue
+
+        closed = Event()
+        connection.add_termination_listener(lambda _: closed.set())
+
+        try:
+            await connection.add_listener(CATALOGUE_CHANNEL, _invalidate)
+            catalogue_cache.invalidate()
+            await closed.wait()
+            logger.warning("lost the connection listening for catalogue invalidations")
+        finally:
+            await connection.close()
@@ -0,0 +1,210 @@
+import asyncio
+import logging
+import sys
+import traceback
+from contextvars import ContextVar
+from queue import Full, Queue
+from threading import Thread
+from time import monotonic
+from typing import TYPE_CHECKING, Any, TextIO
+
+import orjson
+from loguru import logger
+
+from api.config import Settings, settings
+from api.metrics import log_records_dropped
+
+if TYPE_CHECKING:
+    from loguru import Message, Record
+
+request_id: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+_TEXT_FORMAT = (
+    "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {name}:{function}:{line} | "
+    "{extra[request_id]} | {message}"
+)
+
+
+def _serialize(record: "Record") -> str:
+    extra = dict(record["extra"])
+    entry = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "logger": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        "message": record["message"],
+        "request_id": extra.pop("request_id", None),
+        **extra,
+    }
+
+    if record["exception"] is not None:
+        type_, value, tb = record["exception"]
+        entry["exception"] = "".join(traceback.format_exception(type_, value, tb))
+
+    return orjson.dumps(entry, default=str).decode() + "\n"
+
+
+class BatchingSink:
+    """
+    Loguru sink that only puts records on a bounded queue, so logging never
+    waits for I/O. A writer thread serializes them (as JSON lines, or as
+    formatted by loguru) and writes everything queued at that point with one
+    write and one flush. Records that do not fit in the queue are dropped.
+    """
+
+    _stop = object()
+
+    def __init__(
+        self,
+        stream: TextIO,
+        serialize: bool = True,
+        queue_size: int = 10_000,
+        batch_size: int = 500,
+    ) -> None:
+        self.stream = stream
+        self.serialize = serialize
+        self.batch_size = batch_size
+        self._queue: Queue[Any] = Queue(maxsize=queue_size)
+        self._thread = Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, message: "Message") -> None:
+        try:
+            self._queue.put_nowait(message)
+        except Full:
+            log_records_dropped.labels("queue_full").inc()
+
+    def _format(self, message: "Message") -> str:
+        return _serialize(message.record) if self.serialize else str(message)
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            stopping = batch[-1] is self._stop
+            lines = [
+                self._format(message) for message in batch if message is not self._stop
+            ]
+
+            try:
+                self.stream.write("".join(lines))
+                self.stream.flush()
+            except Exception:
+                # ? nowhere left to log to, the records are lost
+                log_records_dropped.labels("write_failed").inc(len(lines))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+            if stopping:
+                return
+
+    async def complete(self) -> None:
+        """Waits until every queued record has been written."""
+
+        await asyncio.to_thread(self._queue.join)
+
+    def stop(self) -> None:
+        self._queue.put(self._stop)
+        self._thread.join()
+
+
+class LogRateLimit:
+    """
+    Loguru filter that lets at most `rate` records per second, in bursts of up
+    to `burst`, through per logger and level. The next record let through
+    after some were dropped carries their number as `suppressed`.
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._buckets: dict[tuple[str | None, str], tuple[float, float, int]] = {}
+
+    def __call__(self, record: "Record") -> bool:
+        key = (record["name"], record["level"].name)
+        now = monotonic()
+        tokens, updated_at, suppressed = self._buckets.get(key, (self.burst, now, 0))
+        tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+
+        if tokens < 1:
+            self._buckets[key] = (tokens, now, suppressed + 1)
+            log_records_dropped.labels("rate_limited").inc()
+            return False
+
+        if suppressed:
+            record["extra"]["suppressed"] = suppressed
+
+        self._buckets[key] = (tokens - 1, now, 0)
+        return True
+
+
+class _InterceptHandler(logging.Handler):
+    """Hands records of standard library loggers over to loguru."""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            level: str | int = logger.level(record.levelname).name
+        except ValueError:
+            level = record.levelno
+
+        logger.patch(
+            lambda loguru_record: loguru_record.update(
+                name=record.name,
+                function=record.funcName,
+                line=record.lineno,
+            )
+        ).opt(exception=record.exc_info).log(level, record.getMessage())
+
+
+def _add_request_id(record: "Record") -> None:
+    current = request_id.get()
+
+    if current is not None:
+        record["extra"]["request_id"] = current
+
+
+def configure_logging(
+    settings: Settings = settings, stream: TextIO | None = None
+) -> None:
+    """
+    Routes all logging, loguru and the standard library loggers (uvicorn,
+    SQLAlchemy, alembic), through one rate limited `BatchingSink`.
+    Every record logged while serving a request carries its `request_id`.
+    SQL statements are logged the same way when `postgres_echo` is on.
+    """
+
+    serialize = settings.log_format == "json"
+
+    logger.remove()
+    logger.configure(patcher=_add_request_id, extra={"request_id": None})
+    logger.add(
+        BatchingSink(
+            stream or sys.stderr,
+            serialize=serialize,
+            queue_size=settings.log_queue_size,
+            batch_size=settings.log_batch_size,
+        ),
+        level=settings.log_level,
+        # ? JSON lines are built from the record on the writer thread instead
+        format="{message}" if serialize else _TEXT_FORMAT,
+        filter=LogRateLimit(settings.log_rate_limit, settings.log_rate_limit_burst),
+        colorize=False,
+    )
+
+    logging.basicConfig(handlers=[_InterceptHandler()], level=0, force=True)
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        logging.getLogger(name).handlers = []
+        logging.getLogger(name).propagate = True
+
+    echo = (
+        settings.environment == "development"
+        if settings.postgres_echo is None
+        else settings.postgres_echo
+    )
+    logging.getLogger("sqlalchemy.engine").setLevel(
+        logging.INFO if echo else logging.WARNING
+    )
@@ -1,37 +1,63 @@
 import asyncio
-import os
-import subprocess
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from loguru import logger
 
-from api import crud, utils
+from api import crud, history, utils
 from api.client import client
 from api.config import settings
+from api.crud import remove_replica
+from api.database import session_scope
 from api.dependencies import Container
-from api.routers import health, products
-from api.utils import fetch_loop
+from api.invalidation import listen_for_invalidations
+from api.log import configure_logging
+from api.middleware import MetricsMiddleware, RequestIdMiddleware, SessionMiddleware
+from api.migrate import ensure_schema
+from api.routers import health, metrics, products
+from api.sharding import replica_id
+from api.utils import fetch_loop, flush_reads, flush_reads_loop
 
 container = Container()
-container.wire(modules=[utils, crud, health])
+container.wire(modules=[utils, crud, history, health])
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI) -> AsyncGenerator[FastAPI, None]:
-    subprocess.run(["alembic", "upgrade", "head"], check=True)
+    configure_logging()
+    await ensure_schema(migrate=settings.migrate_on_startup)
 
-    if os.getenv("ENVIRONMENT") != "testing":
-        backgroud_tasks = set()
-        task = asyncio.create_task(fetch_loop(), name="fetch_loop")
-        background_tasks.add(task)
-        task.add_done_callback(background_tasks.discard)
+    tasks = [
+        asyncio.create_task(flush_reads_loop(), name="flush_reads_loop"),
+        asyncio.create_task(
+            listen_for_invalidations(), name="listen_for_invalidations"
+        ),
+    ]
+
+    # ? the refresh can run in its own process instead, see api.worker
+    if settings.refresh_enabled:
+        tasks.append(asyncio.create_task(fetch_loop(), name="fetch_loop"))
 
     try:
         yield
     finally:
+        for task in tasks:
+            task.cancel()
+        # ? let them unwind before the client and the pool they use go away
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        # ? the reads served since the last flush
+        await flush_reads()
+
+        if settings.refresh_enabled:
+            # ? hand this replica's products over without waiting for replica_ttl
+            async with session_scope():
+                await remove_replica(replica_id=replica_id)
+
         await client.aclose()
+        await logger.complete()
 
 
 # ? root_path could be set in NGINX instead using .env
@@ -41,6 +67,8 @@ app = FastAPI(
     root_path=settings.api_prefix,
 )
 
+app.add_middleware(SessionMiddleware)
+app.add_middleware(MetricsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -48,14 +76,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# ? outermost, so even CORS preflights and errors are logged with a request id
+app.add_middleware(RequestIdMiddleware)
 
 app.include_router(health.router, prefix="/health", tags=["health"])
 app.include_router(products.router, prefix="/products", tags=["products"])
-
-
-# @app.middleware("http")
-# async def logging_middleware(
-#     request: Request, call_next: Coroutine[None, Request, Response]
-# ):
-#     request_body = await request.body()
-#     response = await call_next(request)
+app.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
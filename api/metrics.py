@@ -0,0 +1,66 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+refresh_skipped_products = Counter(
+    "offer_refresh_skipped_products",
+    "Products whose upstream offers did not change since the last refresh.",
+)
+
+upstream_request_duration = Histogram(
+    "upstream_request_duration_seconds",
+    "Time from sending an upstream request until its response headers arrive.",
+    ["method", "endpoint", "status"],
+)
+
+upstream_pool_wait = Histogram(
+    "upstream_pool_wait_seconds",
+    "Time an upstream request waited for a pooled connection.",
+    ["endpoint"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+upstream_retries = Counter(
+    "upstream_retries",
+    "Upstream requests resent after a retryable failure.",
+    ["method"],
+)
+
+upstream_circuit_open = Gauge(
+    "upstream_circuit_open",
+    "Whether the upstream circuit breaker is open (1) or closed (0).",
+)
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Time to serve an HTTP request, until its whole response has been sent.",
+    ["method", "route", "status"],
+)
+
+db_query_duration = Histogram(
+    "db_query_duration_seconds",
+    "Time to execute one SQL statement, by its leading keyword.",
+    ["statement"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+
+db_pool_connections = Gauge(
+    "db_pool_connections",
+    "Database connections of the pool: its configured size, checked out and idle.",
+    ["state"],
+)
+
+refresh_cycle_duration = Histogram(
+    "offer_refresh_cycle_duration_seconds",
+    "Wall time of one offer refresh cycle.",
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0),
+)
+
+refresh_lag = Gauge(
+    "offer_refresh_lag_seconds",
+    "How long the most overdue product has been due for a refresh.",
+)
+
+log_records_dropped = Counter(
+    "log_records_dropped",
+    "Log records that were not written, by why: rate_limited, queue_full or write_failed.",
+    ["reason"],
+)
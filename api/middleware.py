@@ -0,0 +1,114 @@
+from time import perf_counter
+from uuid import uuid4
+
+from loguru import logger
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.database import session_scope
+from api.log import request_id
+from api.metrics import http_request_duration
+
+
+class SessionMiddleware:
+    """
+    Opens one database session per HTTP request. The session stays open until
+    the response (including streamed bodies) has been sent.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async with session_scope():
+            await self.app(scope, receive, send)
+
+
+def _route_template(scope: Scope) -> str:
+    """
+    The path template of the route that served a request, e.g.
+    `/products/{product_id}`, set in the scope by routing.
+    """
+
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+
+    return route.path
+
+
+class MetricsMiddleware:
+    """
+    Observes how long each HTTP request took, until its whole response has been
+    sent. Requests are labelled by the template of the route that served them,
+    so ids in paths do not create a series each, or `unmatched` if none did.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_request_duration.labels(
+                scope["method"], _route_template(scope), str(status)
+            ).observe(perf_counter() - started)
+
+
+class RequestIdMiddleware:
+    """
+    Gives each HTTP request an id, the `X-Request-ID` it was sent with or a new
+    one, which every record logged while serving it carries and which is sent
+    back in the response. Logs one access record per request, in place of the
+    uvicorn access log.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        current = Headers(scope=scope).get("x-request-id") or uuid4().hex
+        token = request_id.set(current)
+        status = 500
+
+        async def send_with_request_id(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message).append("X-Request-ID", current)
+            await send(message)
+
+        started = perf_counter()
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            duration = perf_counter() - started
+            logger.bind(
+                method=scope["method"],
+                path=scope["path"],
+                status=status,
+                duration_ms=round(duration * 1000, 2),
+            ).info(f"{scope['method']} {scope['path']} {status}")
+            request_id.reset(token)
@@ -0,0 +1,91 @@
+"""
+Database schema migrations.
+
+Upgrades the schema to the latest revision in-process. Concurrent runs (several
+replicas, a one-shot job next to a starting app) are serialized by an advisory
+lock taken in `alembic/env.py`, so only the first one migrates.
+
+    uv run python -m api.migrate          # upgrade to head
+    uv run python -m api.migrate --check  # exit with 1 unless the schema is at head
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from loguru import logger
+
+from alembic import command
+from api import database
+
+alembic_ini = Path(__file__).resolve().parent.parent / "alembic.ini"
+
+
+def _config(configure_logger: bool = False) -> Config:
+    config = Config(alembic_ini, attributes={"configure_logger": configure_logger})
+    config.set_main_option("script_location", str(alembic_ini.parent / "alembic"))
+    return config
+
+
+def head_revision() -> str | None:
+    return ScriptDirectory.from_config(_config()).get_current_head()
+
+
+async def current_revision() -> str | None:
+    async with database.engine.connect() as connection:
+        return await connection.run_sync(
+            lambda connection: MigrationContext.configure(
+                connection
+            ).get_current_revision()
+        )
+
+
+def upgrade(configure_logger: bool = False) -> None:
+    command.upgrade(_config(configure_logger), "head")
+
+
+async def ensure_schema(migrate: bool) -> None:
+    """
+    Checks with a single query that the schema is at head, so a process can
+    start without spawning alembic. When it is behind, upgrades it if
+    `migrate` is set and fails otherwise.
+    """
+
+    current, head = await current_revision(), head_revision()
+
+    if current == head:
+        return
+
+    if not migrate:
+        raise RuntimeError(
+            f"database schema is at revision {current}, expected {head}, "
+            "run `python -m api.migrate` first"
+        )
+
+    logger.info(f"upgrading database schema from revision {current} to {head}")
+    await asyncio.to_thread(upgrade)
+
+
+async def _check() -> bool:
+    current, head = await current_revision(), head_revision()
+    await database.engine.dispose()
+
+    if current != head:
+        logger.error(f"database schema is at revision {current}, expected {head}")
+
+    return current == head
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--check", action="store_true")
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(0 if asyncio.run(_check()) else 1)
+
+    upgrade(configure_logger=True)
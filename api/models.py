@@ -1,8 +1,19 @@
+import re
 import uuid
-from datetime import datetime
+from datetime import date, datetime
+from typing import Any
 
-from sqlalchemy import ForeignKey, func
-from sqlalchemy.dialects.postgresql import INTEGER, TEXT, TIMESTAMP, UUID, VARCHAR
+from sqlalchemy import BIGINT, CheckConstraint, ForeignKey, Index, func
+from sqlalchemy.dialects.postgresql import (
+    DATE,
+    DOUBLE_PRECISION,
+    INTEGER,
+    JSONB,
+    TEXT,
+    TIMESTAMP,
+    UUID,
+    VARCHAR,
+)
 from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
@@ -13,6 +24,14 @@ class Base(AsyncAttrs, DeclarativeBase):
 
 class ProductORM(Base):
     __tablename__ = "product"
+    __table_args__ = (
+        Index("ix_product_created_at_id", "created_at", "id"),
+        Index(
+            "ix_product_name_pattern",
+            "name",
+            postgresql_ops={"name": "varchar_pattern_ops"},
+        ),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID, primary_key=True)
     name: Mapped[str] = mapped_column(VARCHAR(50))
@@ -23,19 +42,133 @@ class ProductORM(Base):
         default=func.now(),
         onupdate=func.now(),
     )
+    # ? sha256 of the last offer set written for this product, see utils.offers_fingerprint
+    offers_fingerprint: Mapped[str | None] = mapped_column(VARCHAR(64))
 
     offers: Mapped[list["OfferORM"]] = relationship(
-        back_populates="product", cascade="all, delete-orphan"
+        back_populates="product", cascade="all, delete-orphan", passive_deletes=True
     )
 
 
 class OfferORM(Base):
     __tablename__ = "offer"
+    __table_args__ = (
+        # ? covering, offers of a product and the stock filter never touch the heap
+        Index(
+            "ix_offer_product_id_price",
+            "product_id",
+            "price",
+            postgresql_include=["id", "items_in_stock"],
+        ),
+        CheckConstraint("price >= 0", name="ck_offer_price_non_negative"),
+        CheckConstraint(
+            "items_in_stock >= 0", name="ck_offer_items_in_stock_non_negative"
+        ),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID, primary_key=True)
     price: Mapped[int] = mapped_column(INTEGER)
     items_in_stock: Mapped[int] = mapped_column(INTEGER)
-    product_id: Mapped[UUID] = mapped_column(ForeignKey("product.id"))
+    product_id: Mapped[UUID] = mapped_column(
+        ForeignKey("product.id", ondelete="CASCADE")
+    )
     fetched_at: Mapped[datetime] = mapped_column(TIMESTAMP, default=func.now())
 
     product: Mapped[ProductORM] = relationship(back_populates="offers")
+
+
+class AccessTokenORM(Base):
+    """Upstream access token shared by all processes, see token_store.PostgresTokenStore"""
+
+    __tablename__ = "access_token"
+
+    name: Mapped[str] = mapped_column(VARCHAR(50), primary_key=True)
+    access_token: Mapped[str] = mapped_column(TEXT)
+    version: Mapped[int] = mapped_column(INTEGER)
+    expires_at: Mapped[datetime | None] = mapped_column(TIMESTAMP(timezone=True))
+    updated_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP,
+        default=func.now(),
+        onupdate=func.now(),
+    )
+
+
+class ReplicaORM(Base):
+    """Live API replicas sharing the offer refresh, see sharding.owned_products"""
+
+    __tablename__ = "replica"
+
+    id: Mapped[str] = mapped_column(VARCHAR(100), primary_key=True)
+    heartbeat_at: Mapped[datetime] = mapped_column(TIMESTAMP, default=func.now())
+
+
+class ProductReadORM(Base):
+    """Reads of products counted by all processes, see scheduler.ReadCounter"""
+
+    __tablename__ = "product_read"
+
+    product_id: Mapped[uuid.UUID] = mapped_column(
+        ForeignKey("product.id", ondelete="CASCADE"), primary_key=True
+    )
+    # ? reads as of read_at, each weighing half as much every refetch_read_half_life
+    reads: Mapped[float] = mapped_column(DOUBLE_PRECISION)
+    read_at: Mapped[datetime] = mapped_column(TIMESTAMP, default=func.now())
+
+
+# ? partitions of offer_history, created and dropped at runtime by api.history
+OFFER_HISTORY_PARTITION = re.compile(r"offer_history_(default|\d{4}_\d{2})")
+
+
+class OfferHistoryORM(Base):
+    """
+    Append-only observations of offers, one row only when an offer appears or
+    its price or stock changes (stock 0 once it is gone). Partitioned by
+    month of `observed_at`, see history.maintain_offer_history.
+    """
+
+    __tablename__ = "offer_history"
+    __table_args__ = ({"postgresql_partition_by": "RANGE (observed_at)"},)
+
+    # ? the primary key is the index of history queries, a product over a time range
+    product_id: Mapped[uuid.UUID] = mapped_column(UUID, primary_key=True)
+    observed_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP, primary_key=True, default=func.now()
+    )
+    offer_id: Mapped[uuid.UUID] = mapped_column(UUID, primary_key=True)
+    price: Mapped[int] = mapped_column(INTEGER)
+    items_in_stock: Mapped[int] = mapped_column(INTEGER)
+
+
+class OfferHistoryDailyORM(Base):
+    """Offer history older than `offer_history_raw_retention`, one row per offer and day"""
+
+    __tablename__ = "offer_history_daily"
+    __table_args__ = (Index("ix_offer_history_daily_day", "day"),)
+
+    product_id: Mapped[uuid.UUID] = mapped_column(UUID, primary_key=True)
+    day: Mapped[date] = mapped_column(DATE, primary_key=True)
+    offer_id: Mapped[uuid.UUID] = mapped_column(UUID, primary_key=True)
+    # ? the last observation of the day
+    price: Mapped[int] = mapped_column(INTEGER)
+    items_in_stock: Mapped[int] = mapped_column(INTEGER)
+    min_price: Mapped[int] = mapped_column(INTEGER)
+    max_price: Mapped[int] = mapped_column(INTEGER)
+    observations: Mapped[int] = mapped_column(INTEGER)
+
+
+class OfferSummaryORM(Base):
+    """
+    Offers of each product as JSON with their aggregates, the read model the
+    catalogue is served from. Written by crud.replace_offers for the products
+    whose offers it changed, rebuilt whole by crud.refresh_catalogue.
+    """
+
+    __tablename__ = "offer_summary"
+
+    product_id: Mapped[uuid.UUID] = mapped_column(
+        ForeignKey("product.id", ondelete="CASCADE"), primary_key=True
+    )
+    offers: Mapped[list[dict[str, Any]]] = mapped_column(JSONB)
+    min_price: Mapped[int] = mapped_column(INTEGER)
+    max_price: Mapped[int] = mapped_column(INTEGER)
+    total_stock: Mapped[int] = mapped_column(BIGINT)
@@ -0,0 +1,244 @@
+import random
+from asyncio import Lock, sleep
+from email.utils import parsedate_to_datetime
+from time import monotonic, time
+
+import httpx
+from httpx import AsyncBaseTransport, Request, Response
+from loguru import logger
+
+from api.metrics import upstream_circuit_open, upstream_retries
+
+# ? methods that are safe to resend after upstream may have processed them
+_idempotent_methods = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+# ? responses that mean upstream did not process the request
+_retry_statuses = {
+    httpx.codes.TOO_MANY_REQUESTS,
+    httpx.codes.BAD_GATEWAY,
+    httpx.codes.SERVICE_UNAVAILABLE,
+    httpx.codes.GATEWAY_TIMEOUT,
+}
+# ? errors raised before the request reached upstream
+_unsent_errors = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class CircuitOpenError(httpx.TransportError):
+    """Raised instead of sending a request while the circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Stops calling upstream after `failure_threshold` consecutive failures.
+    While open, one probe request is let through every `reset_timeout`
+    seconds; its success closes the circuit again.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def check(self, request: Request) -> None:
+        if self.opened_at is None:
+            return
+
+        if monotonic() - self.opened_at < self.reset_timeout:
+            raise CircuitOpenError("upstream circuit is open", request=request)
+
+        # ? let this request probe upstream, the next one waits another reset_timeout
+        self.opened_at = monotonic()
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            logger.info("upstream recovered, closing the circuit")
+            upstream_circuit_open.set(0)
+
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+
+        if self.opened_at is None and self.failures >= self.failure_threshold:
+            logger.warning(
+                f"upstream failed {self.failures} times in a row, opening the circuit"
+            )
+            upstream_circuit_open.set(1)
+            self.opened_at = monotonic()
+
+
+class RateLimiter:
+    """
+    Token bucket whose rate adapts to upstream (additive increase,
+    multiplicative decrease): every success raises the rate by `increase`
+    up to `max_rate`, every 429 halves it down to `min_rate` and a
+    Retry-After pauses all requests until it has passed.
+    """
+
+    def __init__(
+        self,
+        max_rate: float,
+        min_rate: float,
+        burst: int,
+        increase: float = 1.0,
+    ) -> None:
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.burst = burst
+        self.increase = increase
+        self.rate = max_rate
+        self.tokens = float(burst)
+        self.updated_at = monotonic()
+        self.paused_until = 0.0
+        # ? waiters are served in arrival order
+        self._lock = Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = monotonic()
+
+                if now < self.paused_until:
+                    await sleep(self.paused_until - now)
+                    continue
+
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.updated_at) * self.rate
+                )
+                self.updated_at = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                await sleep((1 - self.tokens) / self.rate)
+
+    def speed_up(self) -> None:
+        self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def slow_down(self, retry_after: float | None = None) -> None:
+        self.rate = max(self.min_rate, self.rate / 2)
+
+        if retry_after is not None:
+            self.paused_until = max(self.paused_until, monotonic() + retry_after)
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter."""
+
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+def retry_after(response: Response) -> float | None:
+    """Seconds to wait according to the Retry-After header, if any."""
+
+    value = response.headers.get("Retry-After")
+
+    if value is None:
+        return None
+
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class ResilientTransport(AsyncBaseTransport):
+    """
+    Wraps the upstream transport with a circuit breaker, an adaptive rate
+    limiter and retries with jittered exponential backoff.
+    Requests are resent after 429/502/503/504 responses and transport errors
+    only when that is safe: idempotent methods always, others only when
+    upstream certainly did not process them (429, 503, connection errors).
+    """
+
+    def __init__(
+        self,
+        transport: AsyncBaseTransport,
+        breaker: CircuitBreaker,
+        limiter: RateLimiter,
+        max_retries: int,
+        backoff: float,
+        backoff_max: float,
+    ) -> None:
+        self.transport = transport
+        self.breaker = breaker
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+
+    async def handle_async_request(self, request: Request) -> Response:
+        idempotent = request.method in _idempotent_methods
+        attempt = 0
+
+        while True:
+            self.breaker.check(request)
+            await self.limiter.acquire()
+
+            try:
+                response = await self.transport.handle_async_request(request)
+            except httpx.TransportError as e:
+                self.breaker.record_failure()
+
+                if attempt >= self.max_retries or not (
+                    idempotent or isinstance(e, _unsent_errors)
+                ):
+                    raise
+
+                delay = backoff_delay(attempt, self.backoff, self.backoff_max)
+            else:
+                if response.status_code not in _retry_statuses:
+                    if response.status_code >= httpx.codes.INTERNAL_SERVER_ERROR:
+                        self.breaker.record_failure()
+                    else:
+                        self.breaker.record_success()
+                        self.limiter.speed_up()
+
+                    return response
+
+                wait = retry_after(response)
+
+                if response.status_code == httpx.codes.TOO_MANY_REQUESTS:
+                    self.limiter.slow_down(wait)
+                else:
+                    self.breaker.record_failure()
+
+                    if wait is not None:
+                        self.limiter.slow_down(wait)
+
+                if attempt >= self.max_retries or not (
+                    idempotent
+                    or response.status_code
+                    in (httpx.codes.TOO_MANY_REQUESTS, httpx.codes.SERVICE_UNAVAILABLE)
+                ):
+                    return response
+
+                await response.aclose()
+                # ? the limiter already waits out Retry-After
+                delay = (
+                    0.0
+                    if wait is not None
+                    else backoff_delay(attempt, self.backoff, self.backoff_max)
+                )
+
+            attempt += 1
+            upstream_retries.labels(request.method).inc()
+            logger.info(
+                f"retrying {request.method} {request.url!r} "
+                f"(attempt {attempt}/{self.max_retries}) in {delay:.2f}s"
+            )
+            await sleep(delay)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
@@ -0,0 +1,36 @@
+from typing import Any
+from uuid import UUID
+
+import orjson
+from fastapi import Response
+
+
+def _default(value: Any) -> Any:
+    # ? asyncpg returns its own UUID subclass which orjson does not encode natively
+    if isinstance(value, UUID):
+        return str(value)
+
+    raise TypeError
+
+
+def dumps(content: Any, option: int | None = None) -> bytes:
+    """
+    Encodes plain dicts/lists straight to JSON bytes with orjson, skipping
+    Pydantic validation and serialization. UUIDs and datetimes are encoded the
+    same way the Pydantic schemas encode them.
+    """
+
+    return orjson.dumps(content, default=_default, option=option)
+
+
+def json_response(
+    content: Any,
+    status_code: int = 200,
+    headers: dict[str, str] | None = None,
+) -> Response:
+    return Response(
+        content=dumps(content),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
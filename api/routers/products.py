@@ -1,102 +1,335 @@
-import os
+from functools import partial
+from typing import Annotated, Any, AsyncGenerator, Literal
 from uuid import UUID
 
-from fastapi import APIRouter, Depends
+import orjson
+from fastapi import APIRouter, Body, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from loguru import logger
 
+from api.cache import catalogue_cache, etag_matches
+from api.config import settings
 from api.crud import (
     create_product,
+    create_products,
     delete_product,
+    delete_products,
+    read_offer_history,
     read_offers,
     read_product,
     read_products,
     read_products_with_offers,
+    stream_products_with_offers,
     update_product,
+    update_products,
 )
-from api.dependencies import product_exists
-from api.schemas.offer import Offer
+from api.responses import dumps, json_response
+from api.scheduler import read_counter
+from api.schemas.batch import BatchItemResult
+from api.schemas.offer import Offer, OfferHistoryEntry, OfferHistoryQuery
 from api.schemas.product import (
+    ProductBatchUpdateIn,
     ProductCatalogue,
     ProductCreateIn,
     ProductCreateOut,
     ProductDelete,
+    ProductQuery,
     ProductRead,
     ProductUpdateIn,
     ProductUpdateOut,
 )
-from api.utils import fetch_product_offers, register_product
+from api.utils import fetch_product_offers, register_product, register_products
 
 router = APIRouter()
 
+ExportFormat = Literal["ndjson", "json"]
 
-@router.get("/catalogue", summary="Get all products and their offers")
-async def get_catalogue_() -> list[ProductCatalogue]:
-    products = await read_products_with_offers()
-    return [
-        ProductCatalogue(
-            id=product.id,
-            name=product.name,
-            description=product.description,
-            offers=[Offer.model_validate(offer) for offer in product.offers],
-            created_at=product.created_at,
-            updated_at=product.updated_at,
-        )
-        for product in products
-    ]
 
+async def _serialize_catalogue(query: ProductQuery) -> tuple[bytes, dict[str, str]]:
+    products, next_cursor = await read_products_with_offers(query=query)
+
+    # ? counted when the page is built, so a cached page counts once per rebuild
+    for product in products:
+        read_counter.record(product["id"])
+
+    return dumps(products), _page_headers(next_cursor)
+
+
+def _page_headers(next_cursor: str | None) -> dict[str, str]:
+    return {} if next_cursor is None else {"X-Next-Cursor": next_cursor}
+
+
+@router.get(
+    "/catalogue",
+    response_model=list[ProductCatalogue],
+    summary="Get a page of products and their offers",
+)
+async def get_catalogue_(
+    query: Annotated[ProductQuery, Query()],
+    if_none_match: str | None = Header(None),
+) -> Response:
+    catalogue = await catalogue_cache.get_or_build(
+        ("catalogue", query.model_dump_json()),
+        partial(_serialize_catalogue, query),
+    )
+
+    if etag_matches(catalogue.etag, if_none_match):
+        return Response(status_code=304, headers={"ETag": catalogue.etag})
+
+    return Response(
+        content=catalogue.body,
+        media_type="application/json",
+        headers=catalogue.headers,
+    )
+
+
+async def _export_catalogue(
+    format: ExportFormat,
+) -> AsyncGenerator[bytes, None]:
+    """
+    Serializes streamed product/offer rows one product at a time. Every
+    fetched batch of rows is sent as one chunk, so memory stays bounded by
+    `export_batch_size` regardless of the catalogue size.
+    """
+
+    result = await stream_products_with_offers()
+    product: dict[str, Any] | None = None
+    delimiter = b"["
+
+    def encode(products: list[dict[str, Any]]) -> bytes:
+        nonlocal delimiter
+
+        if format == "ndjson":
+            return b"".join(
+                dumps(product, option=orjson.OPT_APPEND_NEWLINE) for product in products
+            )
 
-@router.get("", summary="Get all products")
-async def get_root_() -> list[ProductRead]:
-    products = await read_products()
-    return [ProductRead.model_validate(product) for product in products]
+        chunk = delimiter + dumps(products)[1:-1]
+        delimiter = b","
+        return chunk
+
+    async for rows in result.partitions():
+        products = []
+
+        for id, name, description, created_at, updated_at, *offer in rows:
+            if product is None or product["id"] != id:
+                if product is not None:
+                    products.append(product)
+
+                product = {
+                    "id": id,
+                    "name": name,
+                    "description": description,
+                    "offers": [],
+                    "created_at": created_at,
+                    "updated_at": updated_at,
+                }
+
+            offer_id, price, items_in_stock = offer
+            if offer_id is not None:
+                product["offers"].append(
+                    {"id": offer_id, "price": price, "items_in_stock": items_in_stock}
+                )
+
+        if products:
+            yield encode(products)
+
+    if product is not None:
+        yield encode([product])
+
+    if format == "json":
+        yield b"]" if delimiter == b"," else b"[]"
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    summary="Stream all products and their offers",
+)
+async def get_export_(format: ExportFormat = "ndjson") -> StreamingResponse:
+    return StreamingResponse(
+        _export_catalogue(format),
+        media_type="application/x-ndjson" if format == "ndjson" else "application/json",
+    )
+
+
+@router.get(
+    "",
+    response_model=list[ProductRead],
+    summary="Get a page of products",
+)
+async def get_root_(query: Annotated[ProductQuery, Query()]) -> Response:
+    products, next_cursor = await read_products(query=query)
+    return json_response(products, headers=_page_headers(next_cursor))
 
 
 @router.post("", status_code=201, summary="Create a product")
 async def post_root_(
     product: ProductCreateIn,
 ) -> ProductCreateOut:
-    if os.getenv("ENVIRONMENT") == "testing":
-        registered_product = product
-    else:
-        registered_product = await register_product(product=product)
+    registered_product = await register_product(product=product)
 
     created_product = await create_product(product=registered_product)
     return ProductCreateOut.model_validate(created_product)
 
 
-@router.get(
-    "/{product_id}", dependencies=[Depends(product_exists)], summary="Get a product"
-)
-async def get_product_(product_id: UUID) -> ProductRead:
+def _batch_results(
+    ids: list[UUID],
+    done: set[UUID],
+    status: int,
+    missing_status: int,
+    missing_detail: str,
+) -> list[BatchItemResult]:
+    return [
+        BatchItemResult(id=id, status=status)
+        if id in done
+        else BatchItemResult(id=id, status=missing_status, detail=missing_detail)
+        for id in ids
+    ]
+
+
+@router.post("/batch", status_code=207, summary="Create products in bulk")
+async def post_batch_(
+    products: Annotated[
+        list[ProductCreateIn], Body(max_length=settings.batch_max_size)
+    ],
+) -> list[BatchItemResult]:
+    registered = await register_products(products=products)
+
+    results: list[BatchItemResult | None] = [None] * len(products)
+    creatable: dict[UUID, int] = {}
+
+    for index, (product, registration) in enumerate(zip(products, registered)):
+        if isinstance(registration, HTTPException):
+            results[index] = BatchItemResult(
+                id=product.id,
+                status=registration.status_code,
+                detail=registration.detail,
+            )
+        elif registration.id in creatable:
+            results[index] = BatchItemResult(
+                id=registration.id,
+                status=409,
+                detail="Product with this ID is repeated in the batch",
+            )
+        else:
+            creatable[registration.id] = index
+
+    created = await create_products(
+        products=[registered[index] for index in creatable.values()]
+    )
+
+    for id, index in creatable.items():
+        results[index] = (
+            BatchItemResult(id=id, status=201)
+            if id in created
+            else BatchItemResult(
+                id=id, status=409, detail="Product with this ID already exists"
+            )
+        )
+
+    return results
+
+
+@router.put("/batch", status_code=207, summary="Update products in bulk")
+async def put_batch_(
+    products: Annotated[
+        list[ProductBatchUpdateIn], Body(max_length=settings.batch_max_size)
+    ],
+) -> list[BatchItemResult]:
+    # ? the last update of a repeated id wins, as if the items were sent one by one
+    latest = {product.id: product for product in products}
+    updated = await update_products(products=list(latest.values()))
+    return _batch_results(
+        [product.id for product in products],
+        updated,
+        status=200,
+        missing_status=404,
+        missing_detail="Product not found",
+    )
+
+
+@router.delete("/batch", status_code=207, summary="Delete products in bulk")
+async def delete_batch_(
+    product_ids: Annotated[list[UUID], Body(max_length=settings.batch_max_size)],
+) -> list[BatchItemResult]:
+    deleted = await delete_products(product_ids=list(set(product_ids)))
+    return _batch_results(
+        product_ids,
+        deleted,
+        status=200,
+        missing_status=404,
+        missing_detail="Product not found",
+    )
+
+
+def _product_not_found() -> HTTPException:
+    return HTTPException(status_code=404, detail="Product not found")
+
+
+@router.get("/{product_id}", response_model=ProductRead, summary="Get a product")
+async def get_product_(product_id: UUID) -> Response:
     product = await read_product(product_id=product_id)
-    return ProductRead.model_validate(product)
+
+    if product is None:
+        raise _product_not_found()
+
+    read_counter.record(product_id)
+    return json_response(product)
 
 
 # ? product_id query param coud be in body (kept as query param for consistent API)
 @router.put(
-    "/{product_id}", dependencies=[Depends(product_exists)], summary="Update a product"
+    "/{product_id}", response_model=ProductUpdateOut, summary="Update a product"
 )
 async def put_product_(
     product_id: UUID,
     product: ProductUpdateIn,
-):
+) -> Response:
     updated_product = await update_product(product_id=product_id, product=product)
-    return ProductUpdateOut.model_validate(updated_product)
 
+    if updated_product is None:
+        raise _product_not_found()
 
-@router.delete(
-    "/{product_id}", dependencies=[Depends(product_exists)], summary="Delete a product"
-)
+    return json_response(updated_product)
+
+
+@router.delete("/{product_id}", summary="Delete a product")
 async def delete_product_(product_id: UUID) -> ProductDelete:
-    product = await read_product(product_id=product_id)
-    deleted_product = await delete_product(product=product)
-    return ProductDelete.model_validate(deleted_product)
+    deleted_id = await delete_product(product_id=product_id)
+
+    if deleted_id is None:
+        raise _product_not_found()
+
+    return ProductDelete(id=deleted_id)
 
 
 @router.get(
     "/{product_id}/offers",
-    dependencies=[Depends(product_exists)],
+    response_model=list[Offer],
     summary="Get product offers",
 )
-async def get_products_offers(product_id: UUID) -> list[Offer]:
-    return await read_offers(product_id=product_id)
+async def get_products_offers(product_id: UUID) -> Response:
+    offers = await read_offers(product_id=product_id)
+
+    if offers is None:
+        raise _product_not_found()
+
+    read_counter.record(product_id)
+    return json_response(offers)
+
+
+@router.get(
+    "/{product_id}/offers/history",
+    response_model=list[OfferHistoryEntry],
+    summary="Get the price and stock history of product offers",
+)
+async def get_products_offers_history(
+    product_id: UUID, query: Annotated[OfferHistoryQuery, Query()]
+) -> Response:
+    history = await read_offer_history(product_id=product_id, query=query)
+
+    if history is None:
+        raise _product_not_found()
+
+    return json_response(history)
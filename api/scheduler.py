@@ -0,0 +1,191 @@
+import heapq
+from collections import Counter
+from time import monotonic
+from typing import Iterable, Iterator
+from uuid import UUID
+
+from api.config import Seconds, settings
+from api.metrics import refresh_lag
+
+
+class RefreshScheduler:
+    """
+    Decides when the offers of each product are refreshed next.
+    Every product is refreshed at least every `max_interval` and at most every
+    `min_interval` seconds; in between, the interval shrinks geometrically with
+    the product's priority, which is high when the product is read often or
+    its offers changed on recent refreshes.
+    Read counts decay with `read_half_life`, a product read `hot_reads` times
+    per half-life is half way to the top priority on reads alone. Volatility
+    is the moving average (weight `volatility_alpha`) of whether a refresh
+    found the offers changed.
+    """
+
+    def __init__(
+        self,
+        min_interval: Seconds,
+        max_interval: Seconds,
+        read_half_life: Seconds,
+        hot_reads: float,
+        volatility_alpha: float,
+    ) -> None:
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.read_half_life = read_half_life
+        self.hot_reads = hot_reads
+        self.volatility_alpha = volatility_alpha
+        # ? (due_at, product_id), entries whose due_at is not in _due_at are stale
+        self._queue: list[tuple[float, UUID]] = []
+        self._due_at: dict[UUID, float] = {}
+        self._reads: dict[UUID, tuple[float, float]] = {}
+        self._volatility: dict[UUID, float] = {}
+        # ? monotonic time of the last sync with the database
+        self.synced_at: float | None = None
+
+    def __len__(self) -> int:
+        return len(self._due_at)
+
+    def __iter__(self) -> Iterator[UUID]:
+        return iter(self._due_at)
+
+    def _schedule(self, product_id: UUID, due_at: float) -> None:
+        self._due_at[product_id] = due_at
+        heapq.heappush(self._queue, (due_at, product_id))
+
+    def _read_score(self, product_id: UUID, now: float) -> float:
+        reads, updated_at = self._reads.get(product_id, (0.0, now))
+        return reads * 0.5 ** ((now - updated_at) / self.read_half_life)
+
+    def priority(self, product_id: UUID, now: float | None = None) -> float:
+        """Priority in [0, 1], either being hot or volatile raises it."""
+
+        now = monotonic() if now is None else now
+        reads = self._read_score(product_id, now)
+        hotness = reads / (reads + self.hot_reads)
+        volatility = self._volatility.get(product_id, 0.0)
+        return 1 - (1 - hotness) * (1 - volatility)
+
+    def interval(self, product_id: UUID, now: float | None = None) -> float:
+        ratio = self.min_interval / self.max_interval
+        return self.max_interval * ratio ** self.priority(product_id, now)
+
+    def sync(self, product_ids: Iterable[UUID]) -> None:
+        """Schedules new products right away and forgets removed ones."""
+
+        product_ids = set(product_ids)
+        now = monotonic()
+        self.synced_at = now
+
+        for product_id in product_ids - self._due_at.keys():
+            self._schedule(product_id, now)
+
+        for product_id in self._due_at.keys() - product_ids:
+            del self._due_at[product_id]
+            self._reads.pop(product_id, None)
+            self._volatility.pop(product_id, None)
+
+    def _expedite(self, product_id: UUID, now: float) -> None:
+        next_due_at = now + self.interval(product_id, now)
+
+        if next_due_at < self._due_at[product_id]:
+            self._schedule(product_id, next_due_at)
+
+    def sync_reads(self, reads: Iterable[tuple[UUID, float]]) -> None:
+        """
+        Replaces the read counts of scheduled products with the ones counted
+        by all processes (decayed to now), see `ReadCounter`, and moves the
+        refreshes of products that became hotter earlier.
+        """
+
+        now = monotonic()
+
+        for product_id, count in reads:
+            if product_id in self._due_at:
+                self._reads[product_id] = (count, now)
+                self._expedite(product_id, now)
+
+    def record_refresh(self, product_id: UUID, changed: bool) -> None:
+        """Updates volatility after a refresh and schedules the next one."""
+
+        if product_id not in self._due_at:
+            return
+
+        volatility = self._volatility.get(product_id, 0.0)
+        self._volatility[product_id] = volatility + self.volatility_alpha * (
+            float(changed) - volatility
+        )
+
+        now = monotonic()
+        self._schedule(product_id, now + self.interval(product_id, now))
+
+    def due(self) -> list[UUID]:
+        """
+        Pops products due for a refresh. Each is provisionally rescheduled one
+        interval ahead, so a failed or unfinished refresh is retried later.
+        """
+
+        now = monotonic()
+        product_ids = []
+
+        while self._queue and self._queue[0][0] <= now:
+            due_at, product_id = heapq.heappop(self._queue)
+
+            if self._due_at.get(product_id) != due_at:
+                continue
+
+            product_ids.append(product_id)
+            self._schedule(product_id, now + self.interval(product_id, now))
+
+        return product_ids
+
+    def next_due(self) -> float | None:
+        """Monotonic time of the earliest scheduled refresh."""
+
+        while self._queue and self._due_at.get(self._queue[0][1]) != self._queue[0][0]:
+            heapq.heappop(self._queue)
+
+        return self._queue[0][0] if self._queue else None
+
+    def lag(self) -> float:
+        """Seconds the most overdue product has been due for, zero if none is."""
+
+        next_due = self.next_due()
+        return 0.0 if next_due is None else max(monotonic() - next_due, 0.0)
+
+
+class ReadCounter:
+    """
+    Counts the product reads served by this process until they are flushed
+    to the database, from where the replica refreshing each product picks them
+    up (`crud.record_product_reads`, `RefreshScheduler.sync_reads`). Reads
+    served by any replica count, not just the ones of the product's owner.
+    """
+
+    def __init__(self) -> None:
+        self._reads: Counter[UUID] = Counter()
+
+    def record(self, product_id: UUID) -> None:
+        self._reads[product_id] += 1
+
+    def drain(self) -> dict[UUID, int]:
+        """Returns the reads counted since the last drain and starts over."""
+
+        reads, self._reads = self._reads, Counter()
+        return dict(reads)
+
+    def restore(self, reads: dict[UUID, int]) -> None:
+        """Counts drained reads again, for the next drain to pick them up."""
+
+        self._reads.update(reads)
+
+
+refresh_scheduler = RefreshScheduler(
+    min_interval=settings.refetch_min_interval,
+    max_interval=settings.refetch_max_interval,
+    read_half_life=settings.refetch_read_half_life,
+    hot_reads=settings.refetch_hot_reads,
+    volatility_alpha=settings.refetch_volatility_alpha,
+)
+read_counter = ReadCounter()
+# ? computed at scrape time, a stalled loop keeps lagging instead of freezing
+refresh_lag.set_function(refresh_scheduler.lag)
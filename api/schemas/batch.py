@@ -0,0 +1,13 @@
+from uuid import UUID
+
+from pydantic import BaseModel, field_serializer
+
+
+class BatchItemResult(BaseModel):
+    id: UUID
+    status: int
+    detail: str | None = None
+
+    @field_serializer("id")
+    def serialize_id(self, value: UUID) -> str:
+        return str(value)
@@ -1,15 +1,42 @@
+from datetime import datetime
+from typing import Literal
 from uuid import UUID
 
-from pydantic import BaseModel, ConfigDict, field_serializer
+from pydantic import BaseModel, ConfigDict, Field, field_serializer
+
+from api.config import settings
 
 
 class Offer(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
     id: UUID
-    price: int
-    items_in_stock: int
+    price: int = Field(ge=0)
+    items_in_stock: int = Field(ge=0)
 
     @field_serializer("id")
     def serialize_id(self, value: UUID) -> str:
         return str(value)
+
+
+class OfferSyncResult(BaseModel):
+    inserted: int = 0
+    updated: int = 0
+    removed: int = 0
+
+
+class OfferHistoryQuery(BaseModel):
+    since: datetime | None = Field(None, description="Observed at or after")
+    until: datetime | None = Field(None, description="Observed before")
+    limit: int = Field(settings.page_max_limit, ge=1, le=settings.page_max_limit)
+
+
+class OfferHistoryEntry(BaseModel):
+    offer_id: UUID
+    observed_at: datetime
+    price: int
+    items_in_stock: int
+    min_price: int
+    max_price: int
+    # ? days older than offer_history_raw_retention are only kept rolled up
+    resolution: Literal["observation", "day"]
@@ -1,8 +1,9 @@
 from datetime import datetime
 from uuid import UUID
 
-from pydantic import BaseModel, ConfigDict, field_serializer
+from pydantic import BaseModel, ConfigDict, Field, field_serializer
 
+from api.config import settings
 from api.schemas.offer import Offer
 
 
@@ -10,6 +11,15 @@ class ProductBase(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class ProductQuery(BaseModel):
+    limit: int = Field(settings.page_default_limit, ge=1, le=settings.page_max_limit)
+    cursor: str | None = Field(None, description="X-Next-Cursor of the previous page")
+    name_prefix: str | None = Field(None, min_length=1)
+    price_min: int | None = Field(None, ge=0, description="Has an offer this pricey")
+    price_max: int | None = Field(None, ge=0, description="Has an offer this cheap")
+    in_stock: bool = Field(False, description="Has an offer with items in stock")
+
+
 class ProductFromORM(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
@@ -63,6 +73,10 @@ class ProductUpdateIn(ProductBase):
     description: str
 
 
+class ProductBatchUpdateIn(ProductUpdateIn):
+    id: UUID
+
+
 class ProductUpdateOut(ProductFromORM):
     id: UUID
     name: str
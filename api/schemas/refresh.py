@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+
+
+class RefreshStats(BaseModel):
+    products: int = 0
+    refreshed: int = 0
+    failed: int = 0
+    skipped: int = 0
+    inserted: int = 0
+    updated: int = 0
+    removed: int = 0
+    unfinished: int = 0
+    wall_time: float = 0.0
@@ -0,0 +1,34 @@
+import os
+import socket
+from hashlib import blake2b
+from typing import Iterable
+from uuid import UUID, uuid4
+
+# ? unique per process, several workers of one container must not share an id
+replica_id = f"{socket.gethostname()}-{os.getpid()}-{uuid4().hex[:8]}"
+
+
+def _weight(replica: str, product_id: UUID) -> bytes:
+    return blake2b(f"{replica}:{product_id}".encode(), digest_size=8).digest()
+
+
+def owner(product_id: UUID, replicas: Iterable[str]) -> str:
+    """
+    Replica that refreshes the product (rendezvous hashing): the one with the
+    highest hash of (replica, product). When a replica joins or leaves, only
+    the products it wins or held move.
+    """
+
+    return max(replicas, key=lambda replica: _weight(replica, product_id))
+
+
+def owned_products(
+    product_ids: Iterable[UUID],
+    replicas: list[str],
+    replica: str,
+) -> list[UUID]:
+    return [
+        product_id
+        for product_id in product_ids
+        if owner(product_id, replicas) == replica
+    ]
@@ -0,0 +1,189 @@
+import fcntl
+import json
+import os
+from abc import ABC, abstractmethod
+from asyncio import Lock, to_thread
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import AsyncGenerator, NamedTuple
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from api.config import Settings
+from api.models import AccessTokenORM
+
+
+class StoredToken(NamedTuple):
+    access_token: str = ""
+    # ? incremented by every refresh, an empty store is at version 0
+    version: int = 0
+    # ? unix timestamp, wall clock because it is shared between processes
+    expires_at: float | None = None
+
+
+class TokenStore(ABC):
+    """
+    Keeps the upstream access token where every process can see it.
+    `lock` is held by the process refreshing the token, `save` only succeeds
+    if the stored version is still `expected_version` (compare-and-swap).
+    """
+
+    def __init__(self) -> None:
+        # ? waiters of the same process queue here instead of on the shared lock
+        self._lock = Lock()
+
+    @abstractmethod
+    async def load(self) -> StoredToken: ...
+
+    @abstractmethod
+    async def save(self, token: StoredToken, expected_version: int) -> bool: ...
+
+    @asynccontextmanager
+    async def lock(self) -> AsyncGenerator[None, None]:
+        async with self._lock:
+            yield
+
+
+class MemoryTokenStore(TokenStore):
+    """Token store of a single process"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._token = StoredToken()
+
+    async def load(self) -> StoredToken:
+        return self._token
+
+    async def save(self, token: StoredToken, expected_version: int) -> bool:
+        if self._token.version != expected_version:
+            return False
+
+        self._token = token
+        return True
+
+
+class FileTokenStore(TokenStore):
+    """Token store shared by processes of one host, locked with flock(2)"""
+
+    def __init__(self, path: Path) -> None:
+        super().__init__()
+        self.path = path
+        self.lock_path = path.with_name(f"{path.name}.lock")
+
+    async def load(self) -> StoredToken:
+        try:
+            content = self.path.read_text()
+        except FileNotFoundError:
+            return StoredToken()
+
+        if not content:
+            return StoredToken()
+
+        try:
+            return StoredToken(**json.loads(content))
+        except json.JSONDecodeError:
+            # ? plain token written by older versions
+            return StoredToken(access_token=content.strip(), version=1)
+
+    async def save(self, token: StoredToken, expected_version: int) -> bool:
+        if (await self.load()).version != expected_version:
+            return False
+
+        # ? written aside and renamed, readers never see a partial file
+        temporary_path = self.path.with_name(f"{self.path.name}.{os.getpid()}")
+        temporary_path.write_text(json.dumps(token._asdict()))
+        temporary_path.replace(self.path)
+        return True
+
+    @asynccontextmanager
+    async def lock(self) -> AsyncGenerator[None, None]:
+        async with self._lock:
+            fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                await to_thread(fcntl.flock, fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                # ? closing the descriptor releases the flock
+                os.close(fd)
+
+
+class PostgresTokenStore(TokenStore):
+    """Token store shared by all replicas, locked with a Postgres advisory lock"""
+
+    def __init__(self, name: str = "applifting") -> None:
+        super().__init__()
+        self.name = name
+
+    async def load(self) -> StoredToken:
+        from api.database import session_factory
+
+        statement = select(
+            AccessTokenORM.access_token,
+            AccessTokenORM.version,
+            AccessTokenORM.expires_at,
+        ).where(AccessTokenORM.name == self.name)
+
+        async with session_factory() as session:
+            row = (await session.execute(statement)).one_or_none()
+
+        if row is None:
+            return StoredToken()
+
+        access_token, version, expires_at = row
+        return StoredToken(
+            access_token=access_token,
+            version=version,
+            expires_at=expires_at.timestamp() if expires_at is not None else None,
+        )
+
+    async def save(self, token: StoredToken, expected_version: int) -> bool:
+        from api.database import session_factory
+
+        values = {
+            "access_token": token.access_token,
+            "version": token.version,
+            "expires_at": (
+                datetime.fromtimestamp(token.expires_at, tz=timezone.utc)
+                if token.expires_at is not None
+                else None
+            ),
+        }
+        statement = insert(AccessTokenORM).values(name=self.name, **values)
+        statement = statement.on_conflict_do_update(
+            index_elements=[AccessTokenORM.name],
+            set_={**values, "updated_at": func.now()},
+            where=AccessTokenORM.version == expected_version,
+        ).returning(AccessTokenORM.version)
+
+        async with session_factory() as session:
+            saved = (await session.scalars(statement)).one_or_none()
+            await session.commit()
+
+        return saved is not None
+
+    @asynccontextmanager
+    async def lock(self) -> AsyncGenerator[None, None]:
+        from api.database import engine
+
+        key = func.hashtext(f"{AccessTokenORM.__tablename__}:{self.name}")
+
+        async with self._lock, engine.connect() as connection:
+            await connection.execute(select(func.pg_advisory_lock(key)))
+            await connection.commit()
+            try:
+                yield
+            finally:
+                await connection.execute(select(func.pg_advisory_unlock(key)))
+                await connection.commit()
+
+
+def create_token_store(settings: Settings) -> TokenStore:
+    match settings.token_store:
+        case "file":
+            return FileTokenStore(settings.token_store_path)
+        case "postgres":
+            return PostgresTokenStore()
+        case _:
+            return MemoryTokenStore()
@@ -1,4 +1,16 @@
-from asyncio import sleep
+import hashlib
+from asyncio import (
+    CancelledError,
+    Event,
+    Queue,
+    Semaphore,
+    TimeoutError,
+    gather,
+    sleep,
+    wait_for,
+)
+from contextlib import suppress
+from time import monotonic
 from typing import Any, cast
 from uuid import UUID, uuid4
 
@@ -7,47 +19,122 @@ from dependency_injector.wiring import Provide, inject
 from fastapi import HTTPException
 from httpx import AsyncClient, HTTPStatusError, RequestError
 from loguru import logger
-from sqlalchemy.ext.asyncio import AsyncSession
 
 from api.config import Settings
-from api.crud import read_products, replace_offers
+from api.crud import (
+    heartbeat_replica,
+    notify_catalogue,
+    read_offer_fingerprints,
+    read_product_reads,
+    record_product_reads,
+    replace_offers,
+)
+from api.database import session_scope
 from api.dependencies import Container
+from api.history import maintain_offer_history
+from api.metrics import refresh_cycle_duration, refresh_skipped_products
+from api.scheduler import RefreshScheduler, read_counter, refresh_scheduler
 from api.schemas.offer import Offer
 from api.schemas.product import ProductCreateIn
+from api.schemas.refresh import RefreshStats
+from api.sharding import owned_products, replica_id
+
+_host_semaphores: dict[str, Semaphore] = {}
+_offer_fingerprints: dict[UUID, str] = {}
+
+
+def _host_semaphore(host: str, limit: int) -> Semaphore:
+    semaphore = _host_semaphores.get(host)
+
+    if semaphore is None:
+        semaphore = _host_semaphores[host] = Semaphore(limit)
+
+    return semaphore
+
+
+def offers_fingerprint(offers: list[Offer]) -> str:
+    """
+    Hashes the part of an offer set that is stored in the database,
+    so the same upstream payload always yields the same fingerprint.
+    """
+
+    digest = hashlib.sha256()
+
+    for offer in sorted(offers, key=lambda offer: offer.id):
+        if offer.items_in_stock > 0:
+            digest.update(f"{offer.id}:{offer.price}:{offer.items_in_stock};".encode())
+
+    return digest.hexdigest()
 
 
 @inject
 async def register_product(
     product: ProductCreateIn,
     client: AsyncClient = Provide[Container.client],
+    settings: Settings = Provide[Container.settings],
 ) -> ProductCreateIn:
-    try:
-        response = await client.post(
-            "/products/register",
-            json=product.model_dump(),
-        )
-        response.raise_for_status()
-    except RequestError as e:
-        logger.error(f"An error occurred while requesting {e.request.url!r}.")
-        raise HTTPException(
-            status_code=503,
-            detail="Service temporarily unavailable. Please try again later.",
-        ) from e
-    except HTTPStatusError as e:
-        logger.error(
-            f"Error response {e.response.status_code} while requesting {e.request.url!r}.",
-        )
-        if e.response.status_code == httpx.codes.UNPROCESSABLE_ENTITY:
+    """
+    Registers the product upstream. While upstream reports its id as taken,
+    it is retried under a fresh id, at most `register_max_attempts` times.
+    Returns the product as registered, the given one is never modified.
+    """
+
+    for _ in range(settings.register_max_attempts):
+        try:
+            response = await client.post(
+                "/products/register",
+                json=product.model_dump(),
+            )
+            response.raise_for_status()
+        except RequestError as e:
+            logger.error(f"An error occurred while requesting {e.request.url!r}.")
             raise HTTPException(
-                status_code=e.response.status_code,
-                detail="Could not register product.",
+                status_code=503,
+                detail="Service temporarily unavailable. Please try again later.",
             ) from e
+        except HTTPStatusError as e:
+            logger.error(
+                f"Error response {e.response.status_code} while requesting {e.request.url!r}.",
+            )
+            if e.response.status_code == httpx.codes.UNPROCESSABLE_ENTITY:
+                raise HTTPException(
+                    status_code=e.response.status_code,
+                    detail="Could not register product.",
+                ) from e
+
+            if e.response.status_code == httpx.codes.CONFLICT:
+                product = product.model_copy(update={"id": uuid4()})
+                continue
+
+        return product
+
+    raise HTTPException(
+        status_code=httpx.codes.CONFLICT,
+        detail="Could not register product under a free ID.",
+    )
+
 
-        if e.response.status_code == httpx.codes.CONFLICT:
-            product.id = uuid4()
-            product = await register_product(product=product)
+@inject
+async def register_products(
+    products: list[ProductCreateIn],
+    settings: Settings = Provide[Container.settings],
+) -> list[ProductCreateIn | HTTPException]:
+    """
+    Registers products concurrently (at most `register_concurrency` at once).
+    Failed registrations are returned in place of the product instead of
+    being raised, so one failure does not abort the others.
+    """
+
+    semaphore = Semaphore(settings.register_concurrency)
 
-    return product
+    async def register(product: ProductCreateIn) -> ProductCreateIn | HTTPException:
+        async with semaphore:
+            try:
+                return await register_product(product=product)
+            except HTTPException as e:
+                return e
+
+    return list(await gather(*(register(product) for product in products)))
 
 
 @inject
@@ -76,17 +163,267 @@ async def fetch_product_offers(
 
 
 @inject
-async def fetch_loop(
+async def refresh_offers(
+    product_ids: list[UUID],
+    settings: Settings = Provide[Container.settings],
+    client: AsyncClient = Provide[Container.client],
+) -> RefreshStats:
+    """
+    Refreshes offers of the given products using a bounded pool of workers.
+    At most `refetch_concurrency` products are in flight at once, at most
+    `refetch_host_concurrency` of them talk to the same upstream host and the
+    whole cycle is abandoned after `refetch_cycle_timeout` seconds, the
+    products it did not finish are counted as unfinished.
+    Fetched offers are written in batches of `offer_sync_batch_size` products,
+    each batch in its own session and transaction. Products whose offers hash
+    to the last stored fingerprint are skipped without any write.
+    Whether each product's offers changed is reported to `refresh_scheduler`.
+    If any batch changed offers, the cached catalogue is dropped once, after
+    the last batch, see `crud.notify_catalogue`.
+    """
+
+    started = monotonic()
+    stats = RefreshStats(products=len(product_ids))
+    host_semaphore = _host_semaphore(
+        client.base_url.host, settings.refetch_host_concurrency
+    )
+
+    queue: Queue[UUID] = Queue()
+    for product_id in product_ids:
+        queue.put_nowait(product_id)
+
+    pending: dict[UUID, list[Offer]] = {}
+    pending_fingerprints: dict[UUID, str] = {}
+    # ? taken from the queue and not yet counted as refreshed, skipped or failed
+    in_flight: set[UUID] = set()
+
+    async def flush() -> None:
+        batch, fingerprints = pending.copy(), pending_fingerprints.copy()
+        pending.clear()
+        pending_fingerprints.clear()
+
+        if not batch:
+            return
+
+        async with session_scope():
+            result = await replace_offers(offers=batch, fingerprints=fingerprints)
+
+        in_flight.difference_update(batch)
+
+        if result is None:
+            stats.failed += len(batch)
+            return
+
+        _offer_fingerprints.update(fingerprints)
+        for product_id in batch:
+            refresh_scheduler.record_refresh(product_id, changed=True)
+
+        stats.refreshed += len(batch)
+        stats.inserted += result.inserted
+        stats.updated += result.updated
+        stats.removed += result.removed
+
+    async def worker() -> None:
+        while not queue.empty():
+            product_id = queue.get_nowait()
+            in_flight.add(product_id)
+
+            try:
+                async with host_semaphore:
+                    offers = await fetch_product_offers(product_id=product_id)
+            except HTTPException as e:
+                logger.error(f"failed to fetch offers for product {product_id}: {e}")
+                stats.failed += 1
+                in_flight.discard(product_id)
+                continue
+            except Exception:
+                # ? e.g. a malformed payload, must not take the other products down
+                logger.exception(f"failed to fetch offers for product {product_id}")
+                stats.failed += 1
+                in_flight.discard(product_id)
+                continue
+
+            fingerprint = offers_fingerprint(offers)
+
+            if _offer_fingerprints.get(product_id) == fingerprint:
+                stats.skipped += 1
+                in_flight.discard(product_id)
+                refresh_skipped_products.inc()
+                refresh_scheduler.record_refresh(product_id, changed=False)
+                continue
+
+            pending[product_id] = offers
+            pending_fingerprints[product_id] = fingerprint
+
+            if len(pending) >= settings.offer_sync_batch_size:
+                await flush()
+
+    workers = min(settings.refetch_concurrency, len(product_ids))
+
+    try:
+        await wait_for(
+            gather(*(worker() for _ in range(workers))),
+            timeout=settings.refetch_cycle_timeout,
+        )
+    except TimeoutError:
+        logger.warning(
+            f"offer refresh cycle exceeded {settings.refetch_cycle_timeout}s deadline"
+        )
+
+    await flush()
+    # ? left in the queue, or abandoned by a cancelled fetch or batch write;
+    # their provisional reschedule in `refresh_scheduler` retries them later
+    stats.unfinished = queue.qsize() + len(in_flight)
+
+    if stats.inserted or stats.updated or stats.removed:
+        async with session_scope():
+            await notify_catalogue()
+
+    stats.wall_time = monotonic() - started
+    refresh_cycle_duration.observe(stats.wall_time)
+    logger.info(
+        f"refreshed offers of {stats.refreshed}/{stats.products} products "
+        f"({stats.skipped} unchanged, {stats.failed} failed, "
+        f"{stats.unfinished} unfinished) "
+        f"in {stats.wall_time:.2f}s, offers: {stats.inserted} inserted, "
+        f"{stats.updated} updated, {stats.removed} removed"
+    )
+
+    return stats
+
+
+@inject
+async def sync_schedule(
+    scheduler: RefreshScheduler,
+    replica: str,
     settings: Settings = Provide[Container.settings],
-    session: AsyncSession = Provide[Container.session],
 ) -> None:
+    """
+    Sends the replica's heartbeat and schedules the products it owns among
+    the live replicas, together with the fingerprints of their stored offers.
+    Replicas agree on ownership once they have all seen the same heartbeats,
+    so while one joins or leaves a product may be refreshed twice or skipped
+    for up to one `refetch_interval`.
+    The owned products take the read counts flushed by all processes, see
+    `flush_reads`, so a product is as hot to its owner as to the web
+    processes that served its reads.
+    """
+
+    async with session_scope():
+        replicas = await heartbeat_replica(replica_id=replica, ttl=settings.replica_ttl)
+        products = await read_offer_fingerprints()
+        reads = await read_product_reads(half_life=settings.refetch_read_half_life)
+
+    owned = set(
+        owned_products((product_id for product_id, _ in products), replicas, replica)
+    )
+    scheduler.sync(owned)
+    scheduler.sync_reads((product_id, count) for product_id, count in reads)
+
+    _offer_fingerprints.clear()
+    _offer_fingerprints.update(
+        (product_id, fingerprint)
+        for product_id, fingerprint in products
+        if product_id in owned and fingerprint is not None
+    )
+
+    logger.info(
+        f"replica {replica} owns {len(owned)}/{len(products)} products "
+        f"shared by {len(replicas)} replicas"
+    )
+
+
+@inject
+async def flush_reads(settings: Settings = Provide[Container.settings]) -> None:
+    """
+    Adds the product reads this process served since the last flush to the
+    database. If the flush is cancelled, its reads are left for the next one.
+    """
+
+    reads = read_counter.drain()
+
+    try:
+        async with session_scope():
+            await record_product_reads(
+                reads=reads, half_life=settings.refetch_read_half_life
+            )
+    except CancelledError:
+        read_counter.restore(reads)
+        raise
+
+
+@inject
+async def flush_reads_loop(settings: Settings = Provide[Container.settings]) -> None:
+    """
+    Flushes the product reads every `read_flush_interval` seconds, whether or
+    not this process refreshes offers, so the refresh worker schedules by the
+    reads of every web process.
+    """
+
     while True:
-        products = await read_products()
+        await sleep(settings.read_flush_interval)
+
+        try:
+            await flush_reads()
+        except Exception:
+            # ? the reads are lost, but the next flush must still happen
+            logger.exception("flushing product reads failed")
+
+
+@inject
+async def fetch_loop(
+    stop: Event | None = None,
+    settings: Settings = Provide[Container.settings],
+) -> None:
+    """
+    Refreshes products as `refresh_scheduler` makes them due.
+    Every `refetch_interval` seconds the scheduled set is re-synced with the
+    database and the other replicas, see `sync_schedule`, and every
+    `offer_history_maintenance_interval` seconds the offer history is
+    maintained, see `history.maintain_offer_history`.
+    Once `stop` is set the loop returns after the cycle in progress.
+    """
+
+    synced_at: float | None = None
+    maintained_at: float | None = None
+
+    while stop is None or not stop.is_set():
+        try:
+            if (
+                synced_at is None
+                or monotonic() - synced_at >= settings.refetch_interval
+            ):
+                await sync_schedule(scheduler=refresh_scheduler, replica=replica_id)
+                synced_at = monotonic()
+
+            if (
+                maintained_at is None
+                or monotonic() - maintained_at
+                >= settings.offer_history_maintenance_interval
+            ):
+                # ? set first, a failing maintenance waits for the next interval too
+                maintained_at = monotonic()
+                async with session_scope():
+                    await maintain_offer_history()
+
+            product_ids = refresh_scheduler.due()
+
+            if product_ids:
+                await refresh_offers(product_ids=product_ids)
+        except Exception:
+            # ? a failed cycle is retried on the next tick instead of ending the loop
+            logger.exception("offer refresh cycle failed")
+
+        wake_at = (synced_at or monotonic()) + settings.refetch_interval
+        next_due = refresh_scheduler.next_due()
+
+        if next_due is not None:
+            wake_at = min(wake_at, next_due)
 
-        for product in products:
-            logger.info(f"fetching offers for product {product.name}")
-            offers = await fetch_product_offers(product_id=product.id)
-            await replace_offers(product_id=product.id, offers=offers)
+        delay = max(wake_at - monotonic(), 0.0)
 
-        await session.commit()
-        await sleep(settings.refetch_interval)
+        if stop is None:
+            await sleep(delay)
+        else:
+            with suppress(TimeoutError):
+                await wait_for(stop.wait(), timeout=delay)
@@ -0,0 +1,117 @@
+"""
+Standalone offer refresh worker.
+
+Runs only the refresh pipeline (`utils.fetch_loop`) with its own database
+pool, so it can be scaled apart from the web process (started with
+`REFRESH_ENABLED=false`). Serves `/health` and `/metrics` on
+`WORKER_HEALTH_PORT` and shuts down gracefully on SIGTERM/SIGINT: the cycle
+in progress gets `WORKER_SHUTDOWN_TIMEOUT` seconds to finish.
+
+    uv run python -m api.worker
+"""
+
+import asyncio
+import signal
+from asyncio import Event, StreamReader, StreamWriter
+from contextlib import suppress
+from time import monotonic
+
+from loguru import logger
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from api import crud, database, history, utils
+from api.client import client
+from api.config import settings
+from api.crud import remove_replica
+from api.dependencies import Container
+from api.log import configure_logging
+from api.migrate import ensure_schema
+from api.scheduler import refresh_scheduler
+from api.sharding import replica_id
+from api.utils import fetch_loop
+
+
+def is_healthy() -> bool:
+    """Whether the worker synced its schedule with the database recently."""
+
+    synced_at = refresh_scheduler.synced_at
+    return (
+        synced_at is not None
+        and monotonic() - synced_at < 3 * settings.refetch_interval
+    )
+
+
+async def _handle_health(reader: StreamReader, writer: StreamWriter) -> None:
+    try:
+        request_line = await reader.readline()
+        path = request_line.split()[1].decode() if request_line.count(b" ") >= 2 else ""
+
+        if path == "/metrics":
+            status, content_type, body = (
+                "200 OK",
+                CONTENT_TYPE_LATEST,
+                generate_latest(),
+            )
+        elif path == "/health":
+            status = "200 OK" if is_healthy() else "503 Service Unavailable"
+            content_type, body = "text/plain", status.encode()
+        else:
+            status, content_type, body = "404 Not Found", "text/plain", b"Not Found"
+
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def main() -> None:
+    configure_logging()
+    database.resize_pool(
+        settings.worker_postgres_pool_size, settings.worker_postgres_max_overflow
+    )
+    await ensure_schema(migrate=settings.migrate_on_startup)
+
+    stop = Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+
+    health_server = await asyncio.start_server(
+        _handle_health, settings.worker_health_host, settings.worker_health_port
+    )
+    refresh = asyncio.create_task(fetch_loop(stop=stop), name="fetch_loop")
+    logger.info(f"refresh worker {replica_id} started")
+
+    try:
+        await stop.wait()
+        logger.info("stopping refresh worker, finishing the cycle in progress...")
+
+        try:
+            await asyncio.wait_for(refresh, timeout=settings.worker_shutdown_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("refresh cycle did not finish in time, cancelled")
+    finally:
+        refresh.cancel()
+        with suppress(asyncio.CancelledError):
+            await refresh
+        health_server.close()
+        await health_server.wait_closed()
+
+        async with database.session_scope():
+            await remove_replica(replica_id=replica_id)
+
+        await client.aclose()
+        await database.engine.dispose()
+        logger.info(f"refresh worker {replica_id} stopped")
+        await logger.complete()
+
+
+if __name__ == "__main__":
+    container = Container()
+    container.wire(modules=[utils, crud, history])
+
+    asyncio.run(main())
@@ -0,0 +1,174 @@
+"""
+Latency benchmark of catalogue pages served from the offer summary.
+
+Seeds the database with synthetic products and offers, rebuilds the
+`offer_summary` read model and times building one encoded catalogue page from
+it (one query, offers embedded as JSON text) against the live join it replaced
+(a products page, then its offers, grouped and encoded in Python), for a few
+filter combinations. The time of the full rebuild is reported as well, only
+bulk loads pay it, offer refreshes update the summary of the products they
+change.
+
+    ENVIRONMENT=testing UPSTREAM_FAKE=true REFRESH_ENABLED=false uv run python -m benchmarks.catalogue --products 100000
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable
+from uuid import UUID, uuid4
+
+from sqlalchemy import delete, insert, select, text
+
+from api.crud import (
+    _page,
+    _select_products,
+    read_products_with_offers,
+    refresh_catalogue,
+)
+from api.database import engine, session_scope
+from api.main import container  # noqa: F401 (wires the dependency container)
+from api.models import OfferORM, ProductORM
+from api.responses import dumps
+from api.schemas.product import ProductQuery
+
+BENCHMARK_NAME = "benchmark-catalogue"
+
+QUERIES = {
+    "first page": {},
+    "in stock": {"in_stock": True},
+    "price >= 900": {"price_min": 900},
+    "price 400-420": {"price_min": 400, "price_max": 420},
+    "price 400-420 in stock": {"price_min": 400, "price_max": 420, "in_stock": True},
+}
+
+
+async def seed(products: int, offers_per_product: int, chunk: int = 5000) -> None:
+    async with session_scope() as session:
+        for start in range(0, products, chunk):
+            product_rows = [
+                {"id": uuid4(), "name": BENCHMARK_NAME, "description": "seeded"}
+                for _ in range(min(chunk, products - start))
+            ]
+            offer_rows = [
+                {
+                    "id": uuid4(),
+                    "price": random.randint(1, 1000),
+                    "items_in_stock": random.randint(1, 50),
+                    "product_id": row["id"],
+                }
+                for row in product_rows
+                for _ in range(random.randint(0, 2 * offers_per_product))
+            ]
+            await session.execute(insert(ProductORM), product_rows)
+            if offer_rows:
+                await session.execute(insert(OfferORM), offer_rows)
+
+        await session.commit()
+
+    # ? what autovacuum would do eventually, the plans depend on the statistics
+    async with engine.connect() as connection:
+        await connection.execute(text("ANALYZE product, offer"))
+
+
+async def refresh() -> None:
+    async with session_scope():
+        await refresh_catalogue()
+
+
+async def clean() -> None:
+    async with session_scope() as session:
+        await session.execute(
+            delete(ProductORM).where(ProductORM.name == BENCHMARK_NAME)
+        )
+        await session.commit()
+
+    await refresh()
+
+
+async def live_join(query: ProductQuery) -> bytes:
+    async with session_scope() as session:
+        result = await session.execute(_select_products(query))
+        products, _ = _page([dict(row) for row in result.mappings()], query)
+
+        offers: dict[UUID, list[dict[str, Any]]] = {}
+        for product in products:
+            product["offers"] = offers[product["id"]] = []
+
+        if offers:
+            statement = select(
+                OfferORM.product_id,
+                OfferORM.id,
+                OfferORM.price,
+                OfferORM.items_in_stock,
+            ).where(OfferORM.product_id.in_(list(offers)))
+            for row in (await session.execute(statement)).mappings():
+                offer = dict(row)
+                offers[offer.pop("product_id")].append(offer)
+
+    return dumps(products)
+
+
+async def view(query: ProductQuery) -> bytes:
+    async with session_scope():
+        products, _ = await read_products_with_offers(query=query)
+
+    return dumps(products)
+
+
+async def measure(
+    build: Callable[[ProductQuery], Awaitable[bytes]],
+    query: ProductQuery,
+    repeat: int,
+) -> tuple[float, int]:
+    await build(query)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        body = await build(query)
+
+    return (time.perf_counter() - started) / repeat * 1000, len(body)
+
+
+async def main(products: int, offers_per_product: int, limit: int, repeat: int) -> None:
+    engine.echo = False
+
+    try:
+        await seed(products, offers_per_product)
+
+        started = time.perf_counter()
+        await refresh()
+        print(
+            f"summary rebuild products={products} "
+            f"time={(time.perf_counter() - started) * 1000:.1f}ms"
+        )
+
+        for name, filters in QUERIES.items():
+            query = ProductQuery(limit=limit, **filters)
+            live_ms, _ = await measure(live_join, query, repeat)
+            view_ms, view_size = await measure(view, query, repeat)
+            print(
+                f"{name:<24} live join={live_ms:>7.2f}ms view={view_ms:>7.2f}ms "
+                f"speedup={live_ms / view_ms:>5.1f}x body={view_size}B"
+            )
+    finally:
+        await clean()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--offers", type=int, default=3)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    asyncio.run(
+        main(
+            products=args.products,
+            offers_per_product=args.offers,
+            limit=args.limit,
+            repeat=args.repeat,
+        )
+    )
@@ -0,0 +1,132 @@
+"""
+Memory benchmark of the streaming catalogue export.
+
+Seeds the database with synthetic products and offers, then measures the peak
+Python memory of `GET /products/export` (streamed) and of serializing the same
+catalogue as one in-memory list (the pre-streaming approach). The streamed peak
+should stay flat as the number of products grows.
+
+    ENVIRONMENT=testing UPSTREAM_FAKE=true REFRESH_ENABLED=false uv run python -m benchmarks.export --sizes 10000 100000
+"""
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+from uuid import uuid4
+
+from pydantic import TypeAdapter
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import selectinload
+
+from api.database import engine, session_scope
+from api.main import container  # noqa: F401 (wires the dependency container)
+from api.models import OfferORM, ProductORM
+from api.routers.products import _export_catalogue
+from api.schemas.offer import Offer
+from api.schemas.product import ProductCatalogue
+
+BENCHMARK_NAME = "benchmark-export"
+
+
+async def seed(products: int, offers_per_product: int, chunk: int = 5000) -> None:
+    async with session_scope() as session:
+        for start in range(0, products, chunk):
+            product_rows = [
+                {"id": uuid4(), "name": BENCHMARK_NAME, "description": "seeded"}
+                for _ in range(min(chunk, products - start))
+            ]
+            offer_rows = [
+                {
+                    "id": uuid4(),
+                    "price": 100 + index,
+                    "items_in_stock": 1 + index,
+                    "product_id": row["id"],
+                }
+                for row in product_rows
+                for index in range(offers_per_product)
+            ]
+            await session.execute(insert(ProductORM), product_rows)
+            await session.execute(insert(OfferORM), offer_rows)
+
+        await session.commit()
+
+
+async def clean() -> None:
+    async with session_scope() as session:
+        seeded = select(ProductORM.id).where(ProductORM.name == BENCHMARK_NAME)
+        await session.execute(delete(OfferORM).where(OfferORM.product_id.in_(seeded)))
+        await session.execute(
+            delete(ProductORM).where(ProductORM.name == BENCHMARK_NAME)
+        )
+        await session.commit()
+
+
+async def streamed() -> int:
+    size = 0
+
+    async with session_scope():
+        async for chunk in _export_catalogue("ndjson"):
+            size += len(chunk)
+
+    return size
+
+
+async def materialized() -> int:
+    async with session_scope() as session:
+        statement = select(ProductORM).options(selectinload(ProductORM.offers))
+        products = (await session.scalars(statement)).all()
+        body = TypeAdapter(list[ProductCatalogue]).dump_json(
+            [
+                ProductCatalogue(
+                    id=product.id,
+                    name=product.name,
+                    description=product.description,
+                    offers=[Offer.model_validate(offer) for offer in product.offers],
+                    created_at=product.created_at,
+                    updated_at=product.updated_at,
+                )
+                for product in products
+            ]
+        )
+
+    return len(body)
+
+
+async def measure(name: str, products: int, export) -> None:
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = await export()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"{name:<13} products={products:>7} "
+        f"body={size / 2**20:>8.1f}MiB peak={peak / 2**20:>8.1f}MiB "
+        f"time={elapsed:>6.2f}s"
+    )
+
+
+async def main(sizes: list[int], offers_per_product: int) -> None:
+    engine.echo = False
+    seeded = 0
+
+    try:
+        for size in sorted(sizes):
+            await seed(size - seeded, offers_per_product)
+            seeded = size
+            await measure("streamed", size, streamed)
+            await measure("materialized", size, materialized)
+    finally:
+        await clean()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--offers", type=int, default=3)
+    args = parser.parse_args()
+
+    asyncio.run(main(sizes=args.sizes, offers_per_product=args.offers))
@@ -0,0 +1,307 @@
+"""
+Replays a recorded request mix against the app at several catalogue sizes.
+
+For every catalogue size, seeds the database with synthetic products and
+offers, then replays the weighted request mix (`benchmarks/mix.jsonl` by
+default, one request per line, `{product_id}` standing for a random seeded
+product and `{uuid}` for a new id) from concurrent clients in-process and
+reports p50, p95 and p99 latency and the throughput per endpoint. Then times
+an offer refresh cycle over a sample of the products against
+`api.fake_upstream` (answering after `--upstream-latency`, failing
+`--upstream-error-rate` of the requests, which are retried, and expiring
+access tokens after `--upstream-token-ttl`), which writes the offer summary
+of the products it changed as it goes. Results are saved as JSON; pass an earlier result as
+`--baseline` to print how the p95 latencies changed.
+
+    ENVIRONMENT=testing UPSTREAM_FAKE=true REFRESH_ENABLED=false uv run python -m benchmarks.load --sizes 1000 10000 100000
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+from uuid import UUID, uuid4
+
+import httpx
+import orjson
+from dependency_injector.providers import Object
+from sqlalchemy import delete, select, text
+
+from api import utils
+from api.client import BearerAuth
+from api.config import settings
+from api.crud import refresh_catalogue
+from api.database import engine, session_scope
+from api.fake_upstream import FakeUpstream
+from api.main import app, container, lifespan
+from api.models import ProductORM
+from api.resilience import CircuitBreaker, RateLimiter, ResilientTransport
+
+BENCHMARK_NAME = "benchmark-load"
+RESULTS = Path(__file__).parent / "results"
+
+
+def load_mix(path: Path) -> list[dict[str, Any]]:
+    return [orjson.loads(line) for line in path.read_bytes().splitlines() if line]
+
+
+async def seed(products: int, offers_per_product: int) -> None:
+    async with engine.begin() as connection:
+        await connection.execute(
+            text(
+                "INSERT INTO product (id, name, description, created_at, updated_at) "
+                "SELECT gen_random_uuid(), :name, 'seeded', now(), now() "
+                "FROM generate_series(1, :products)"
+            ),
+            {"name": BENCHMARK_NAME, "products": products},
+        )
+        await connection.execute(
+            text(
+                "INSERT INTO offer (id, price, items_in_stock, product_id, fetched_at) "
+                "SELECT gen_random_uuid(), 1 + floor(random() * 1000), "
+                "floor(random() * 50), product.id, now() "
+                "FROM product, generate_series(1, :offers) "
+                "WHERE product.name = :name"
+            ),
+            {"name": BENCHMARK_NAME, "offers": offers_per_product},
+        )
+        await connection.execute(text("ANALYZE product, offer"))
+
+    async with session_scope():
+        await refresh_catalogue()
+
+
+async def clean() -> None:
+    async with session_scope() as session:
+        await session.execute(
+            delete(ProductORM).where(ProductORM.name == BENCHMARK_NAME)
+        )
+        await session.commit()
+        await refresh_catalogue()
+
+
+async def sample(products: int) -> list[UUID]:
+    async with session_scope() as session:
+        statement = (
+            select(ProductORM.id)
+            .where(ProductORM.name == BENCHMARK_NAME)
+            .order_by(ProductORM.id)
+            .limit(products)
+        )
+        return list((await session.scalars(statement)).all())
+
+
+def _render(template: str, product_ids: list[UUID]) -> str:
+    return template.replace("{product_id}", str(random.choice(product_ids))).replace(
+        "{uuid}", str(uuid4())
+    )
+
+
+async def replay(
+    client: httpx.AsyncClient,
+    mix: list[dict[str, Any]],
+    product_ids: list[UUID],
+    concurrency: int,
+    duration: float,
+) -> dict[str, dict[str, float]]:
+    latencies: dict[str, list[float]] = {entry["name"]: [] for entry in mix}
+    errors = dict.fromkeys(latencies, 0)
+    weights = [entry["weight"] for entry in mix]
+
+    async def client_loop(deadline: float) -> None:
+        while time.monotonic() < deadline:
+            (entry,) = random.choices(mix, weights)
+            body = entry.get("json")
+
+            started = time.perf_counter()
+            response = await client.request(
+                entry["method"],
+                _render(entry["path"], product_ids),
+                content=_render(orjson.dumps(body).decode(), product_ids)
+                if body is not None
+                else None,
+                headers={"Content-Type": "application/json"},
+            )
+            latencies[entry["name"]].append(time.perf_counter() - started)
+
+            if response.is_error:
+                errors[entry["name"]] += 1
+
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*(client_loop(deadline) for _ in range(concurrency)))
+
+    endpoints = {}
+    for name, samples in latencies.items():
+        if len(samples) < 2:
+            continue
+
+        percentiles = statistics.quantiles(samples, n=100)
+        endpoints[name] = {
+            "requests": len(samples),
+            "errors": errors[name],
+            "rps": len(samples) / duration,
+            "p50_ms": percentiles[49] * 1000,
+            "p95_ms": percentiles[94] * 1000,
+            "p99_ms": percentiles[98] * 1000,
+        }
+
+    return endpoints
+
+
+async def refresh_cycle(product_ids: list[UUID]) -> dict[str, float]:
+    stats = await utils.refresh_offers(product_ids=product_ids)
+
+    return {
+        "products": stats.products,
+        "refreshed": stats.refreshed,
+        "failed": stats.failed,
+        "cycle_s": stats.wall_time,
+    }
+
+
+def compare(result: dict[str, Any], baseline: dict[str, Any]) -> None:
+    previous = {run["products"]: run for run in baseline["runs"]}
+
+    for run in result["runs"]:
+        if run["products"] not in previous:
+            continue
+
+        before = previous[run["products"]]["endpoints"]
+        for name, endpoint in run["endpoints"].items():
+            if name in before:
+                change = endpoint["p95_ms"] / before[name]["p95_ms"] - 1
+                print(
+                    f"products={run['products']:>7} {name:<24} "
+                    f"p95 {before[name]['p95_ms']:>7.2f}ms -> "
+                    f"{endpoint['p95_ms']:>7.2f}ms ({change:+.0%})"
+                )
+
+
+async def main(
+    sizes: list[int],
+    mix_path: Path,
+    concurrency: int,
+    duration: float,
+    cycle: int,
+    upstream_latency: float,
+    upstream_error_rate: float,
+    upstream_token_ttl: float | None,
+    output: Path,
+    baseline: Path | None,
+) -> None:
+    engine.echo = False
+    mix = load_mix(mix_path)
+    upstream = FakeUpstream(
+        refresh_token="benchmark",
+        latency=upstream_latency,
+        error_rate=upstream_error_rate,
+        token_ttl=upstream_token_ttl,
+        seed=0,
+    )
+    upstream_client = httpx.AsyncClient(
+        auth=BearerAuth(base_url="http://upstream", refresh_token="benchmark"),
+        base_url="http://upstream",
+        # ? retried like the real client, but not rate limited, that is upstream's
+        transport=ResilientTransport(
+            upstream.transport(),
+            breaker=CircuitBreaker(failure_threshold=1000, reset_timeout=1),
+            limiter=RateLimiter(max_rate=10_000, min_rate=1, burst=1000),
+            max_retries=settings.upstream_max_retries,
+            backoff=settings.upstream_retry_backoff,
+            backoff_max=settings.upstream_retry_backoff_max,
+        ),
+    )
+    result: dict[str, Any] = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "mix": str(mix_path),
+        "concurrency": concurrency,
+        "duration": duration,
+        "upstream_latency": upstream_latency,
+        "upstream_error_rate": upstream_error_rate,
+        "upstream_token_ttl": upstream_token_ttl,
+        "runs": [],
+    }
+
+    async with (
+        lifespan(app),
+        httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url=f"http://bench{settings.api_prefix}",
+        ) as client,
+    ):
+        with container.client.override(Object(upstream_client)):
+            for products in sizes:
+                try:
+                    await seed(products, offers_per_product=3)
+                    product_ids = await sample(products)
+
+                    endpoints = await replay(
+                        client, mix, product_ids, concurrency, duration
+                    )
+                    refresh = await refresh_cycle(product_ids[:cycle])
+                finally:
+                    await clean()
+
+                result["runs"].append(
+                    {"products": products, "endpoints": endpoints, "refresh": refresh}
+                )
+
+                for name, endpoint in endpoints.items():
+                    print(
+                        f"products={products:>7} {name:<24} "
+                        f"rps={endpoint['rps']:>7.1f} p50={endpoint['p50_ms']:>7.2f}ms "
+                        f"p95={endpoint['p95_ms']:>7.2f}ms p99={endpoint['p99_ms']:>7.2f}ms "
+                        f"errors={endpoint['errors']}"
+                    )
+                print(
+                    f"products={products:>7} refresh cycle={refresh['cycle_s']:.2f}s "
+                    f"({refresh['products']} products)"
+                )
+
+    await upstream_client.aclose()
+    await engine.dispose()
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_bytes(orjson.dumps(result, option=orjson.OPT_INDENT_2))
+    print(f"saved to {output}")
+
+    if baseline is not None:
+        compare(result, orjson.loads(baseline.read_bytes()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10_000, 100_000])
+    parser.add_argument("--mix", type=Path, default=Path(__file__).parent / "mix.jsonl")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--cycle", type=int, default=1000)
+    parser.add_argument("--upstream-latency", type=float, default=0.02)
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0)
+    parser.add_argument("--upstream-token-ttl", type=float, default=None)
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=RESULTS / f"load-{datetime.now(timezone.utc):%Y%m%dT%H%M%S}.json",
+    )
+    parser.add_argument("--baseline", type=Path, default=None)
+    args = parser.parse_args()
+
+    asyncio.run(
+        main(
+            sizes=args.sizes,
+            mix_path=args.mix,
+            concurrency=args.concurrency,
+            duration=args.duration,
+            cycle=args.cycle,
+            upstream_latency=args.upstream_latency,
+            upstream_error_rate=args.upstream_error_rate,
+            upstream_token_ttl=args.upstream_token_ttl,
+            output=args.output,
+            baseline=args.baseline,
+        )
+    )
@@ -0,0 +1,94 @@
+"""
+Request throughput with logging off, on a blocking sink and on the batching sink.
+
+Runs concurrent clients against `GET /health` in-process, once per logging
+setup, and reports the throughput reached and the number of lines written.
+Every request logs its access record (and httpx its own, through the
+standard library), written as JSON lines to a temporary file either by
+loguru itself, on the request's thread (`blocking`) or on its own queue
+(`enqueue`), or by the `BatchingSink` used by `configure_logging`, with and
+without the default rate limit.
+
+    ENVIRONMENT=testing UPSTREAM_FAKE=true REFRESH_ENABLED=false uv run python -m benchmarks.log
+"""
+
+import argparse
+import asyncio
+import math
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from loguru import logger
+
+from api.config import settings
+from api.log import configure_logging
+from api.main import app, lifespan
+
+MODES = ["off", "blocking", "enqueue", "batching", "batching, rate limited"]
+
+
+async def _client_loop(client: httpx.AsyncClient, deadline: float) -> int:
+    requests = 0
+
+    while time.monotonic() < deadline:
+        response = await client.get("/health")
+        response.raise_for_status()
+        requests += 1
+
+    return requests
+
+
+def use(mode: str, path: Path) -> None:
+    rate_limit = settings.log_rate_limit if mode.endswith("rate limited") else math.inf
+    configure_logging(
+        settings.model_copy(
+            update={"log_format": "json", "log_rate_limit": rate_limit}
+        ),
+        path.open("a"),
+    )
+
+    if mode == "off":
+        logger.remove()
+    elif mode in ("blocking", "enqueue"):
+        logger.remove()
+        logger.add(path, serialize=True, enqueue=mode == "enqueue")
+
+
+async def main(concurrency: int, duration: float) -> None:
+    transport = httpx.ASGITransport(app=app)
+    base_url = f"http://bench{settings.api_prefix}"
+
+    async with (
+        lifespan(app),
+        httpx.AsyncClient(transport=transport, base_url=base_url) as client,
+    ):
+        for mode in MODES:
+            with tempfile.TemporaryDirectory() as directory:
+                path = Path(directory) / "api.log"
+                use(mode, path)
+
+                deadline = time.monotonic() + duration
+                counts = await asyncio.gather(
+                    *(_client_loop(client, deadline) for _ in range(concurrency))
+                )
+                await logger.complete()
+                logger.remove()
+
+                lines = len(path.read_bytes().splitlines()) if path.exists() else 0
+                print(
+                    f"{mode:<24} requests={sum(counts):>6} "
+                    f"rps={sum(counts) / duration:>8.1f} lines={lines:>6}"
+                )
+
+        configure_logging()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    asyncio.run(main(concurrency=args.concurrency, duration=args.duration))
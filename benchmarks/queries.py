@@ -0,0 +1,67 @@
+"""
+Counts the SQL statements executed by each single-product route.
+
+Every request is sent in-process and the statements are counted with a
+SQLAlchemy `before_cursor_execute` listener on the engine.
+
+    ENVIRONMENT=testing UPSTREAM_FAKE=true REFRESH_ENABLED=false uv run python -m benchmarks.queries
+"""
+
+import asyncio
+from uuid import uuid4
+
+import httpx
+from sqlalchemy import event
+
+from api.config import settings
+from api.database import engine
+from api.main import app, lifespan
+
+
+async def main() -> None:
+    statements = 0
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def count(*_) -> None:
+        nonlocal statements
+        statements += 1
+
+    engine.echo = False
+    transport = httpx.ASGITransport(app=app)
+    base_url = f"http://bench{settings.api_prefix}"
+
+    async with (
+        lifespan(app),
+        httpx.AsyncClient(transport=transport, base_url=base_url) as client,
+    ):
+        product_id = uuid4()
+        missing_id = uuid4()
+        await client.post(
+            "/products",
+            json={"id": str(product_id), "name": "Bench", "description": "queries"},
+        )
+
+        requests = [
+            ("GET", f"/products/{product_id}", None),
+            ("GET", f"/products/{product_id}/offers", None),
+            ("PUT", f"/products/{product_id}", {"name": "B", "description": "q"}),
+            ("GET", f"/products/{missing_id}", None),
+            ("PUT", f"/products/{missing_id}", {"name": "B", "description": "q"}),
+            ("DELETE", f"/products/{product_id}", None),
+            ("DELETE", f"/products/{missing_id}", None),
+        ]
+
+        for method, path, body in requests:
+            statements = 0
+            response = await client.request(method, path, json=body)
+            name = path.replace(str(product_id), "{id}").replace(
+                str(missing_id), "{missing}"
+            )
+            print(
+                f"{method:<6} {name:<28} status={response.status_code} "
+                f"statements={statements}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,157 @@
+"""
+Wall time of an offer refresh cycle against a large offer table.
+
+Seeds the database with synthetic products and offers (1M offers by default),
+then runs `refresh_offers` over a sample of them with a fake upstream that
+replaces every offer, once with the covering `ix_offer_product_id_price`
+index and once without any index on `offer.product_id`. Without it, every
+written batch scans the whole offer table to delete the replaced offers, and
+so does every `GET /products/{id}/offers`, whose mean latency is reported too.
+Cycles include writing the offer summary of the products they changed.
+
+    ENVIRONMENT=testing UPSTREAM_FAKE=true REFRESH_ENABLED=false uv run python -m benchmarks.refresh --offers 1000000
+"""
+
+import argparse
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator
+from uuid import UUID, uuid4
+
+from sqlalchemy import delete, select, text
+
+from api import utils
+from api.crud import read_offers, refresh_catalogue
+from api.database import engine, session_scope
+from api.main import container  # noqa: F401 (wires the dependency container)
+from api.models import OfferORM, ProductORM
+from api.schemas.offer import Offer
+
+BENCHMARK_NAME = "benchmark-refresh"
+
+
+async def seed(products: int, offers_per_product: int) -> None:
+    # ? generated by the server, a million rows through the driver take minutes
+    async with engine.begin() as connection:
+        await connection.execute(
+            text(
+                "INSERT INTO product (id, name, description, created_at, updated_at) "
+                "SELECT gen_random_uuid(), :name, 'seeded', now(), now() "
+                "FROM generate_series(1, :products)"
+            ),
+            {"name": BENCHMARK_NAME, "products": products},
+        )
+        await connection.execute(
+            text(
+                "INSERT INTO offer (id, price, items_in_stock, product_id, fetched_at) "
+                "SELECT gen_random_uuid(), 100 + index, 1 + index, product.id, now() "
+                "FROM product, generate_series(0, :offers - 1) AS index "
+                "WHERE product.name = :name"
+            ),
+            {"name": BENCHMARK_NAME, "offers": offers_per_product},
+        )
+        await connection.execute(text("ANALYZE product, offer"))
+
+
+async def clean() -> None:
+    async with session_scope() as session:
+        await session.execute(
+            delete(ProductORM).where(ProductORM.name == BENCHMARK_NAME)
+        )
+        await session.commit()
+
+
+async def sample(products: int) -> list[UUID]:
+    async with session_scope() as session:
+        statement = (
+            select(ProductORM.id)
+            .where(ProductORM.name == BENCHMARK_NAME)
+            .limit(products)
+        )
+        return list((await session.scalars(statement)).all())
+
+
+@asynccontextmanager
+async def without_offer_index() -> AsyncGenerator[None, None]:
+    (index,) = (
+        index
+        for index in OfferORM.__table__.indexes
+        if index.name == "ix_offer_product_id_price"
+    )
+
+    async with engine.begin() as connection:
+        await connection.run_sync(index.drop)
+    try:
+        yield
+    finally:
+        async with engine.begin() as connection:
+            await connection.run_sync(index.create)
+
+
+async def cycle(product_ids: list[UUID], offers_per_product: int) -> float:
+    async def fetch_product_offers(product_id: UUID) -> list[Offer]:
+        return [
+            Offer(id=uuid4(), price=200 + index, items_in_stock=1 + index)
+            for index in range(offers_per_product)
+        ]
+
+    utils.fetch_product_offers = fetch_product_offers
+
+    started = time.perf_counter()
+    stats = await utils.refresh_offers(product_ids=product_ids)
+    assert stats.refreshed == len(product_ids), stats
+
+    return time.perf_counter() - started
+
+
+async def reads(product_ids: list[UUID]) -> float:
+    started = time.perf_counter()
+    for product_id in product_ids:
+        async with session_scope():
+            await read_offers(product_id=product_id)
+
+    return (time.perf_counter() - started) / len(product_ids) * 1000
+
+
+async def main(offers: int, offers_per_product: int, cycle_products: int) -> None:
+    engine.echo = False
+    products = offers // offers_per_product
+
+    try:
+        await seed(products, offers_per_product)
+        product_ids = await sample(2 * cycle_products)
+        print(
+            f"offers={products * offers_per_product} products={products} "
+            f"cycle={cycle_products} products"
+        )
+
+        elapsed = await cycle(product_ids[:cycle_products], offers_per_product)
+        read_ms = await reads(product_ids[:100])
+        print(f"covering index   cycle={elapsed:>7.2f}s read_offers={read_ms:>7.2f}ms")
+
+        async with without_offer_index():
+            elapsed = await cycle(product_ids[cycle_products:], offers_per_product)
+            read_ms = await reads(product_ids[:100])
+        print(f"no index         cycle={elapsed:>7.2f}s read_offers={read_ms:>7.2f}ms")
+    finally:
+        await clean()
+        async with session_scope():
+            await refresh_catalogue()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--offers", type=int, default=1_000_000)
+    parser.add_argument("--offers-per-product", type=int, default=5)
+    parser.add_argument("--cycle", type=int, default=1000)
+    args = parser.parse_args()
+
+    asyncio.run(
+        main(
+            offers=args.offers,
+            offers_per_product=args.offers_per_product,
+            cycle_products=args.cycle,
+        )
+    )
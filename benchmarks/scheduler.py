@@ -0,0 +1,104 @@
+"""
+Simulation of the tiered offer refresh scheduler.
+
+Replays a virtual period with Zipf-distributed reads over the catalogue and a
+small share of volatile products, driving `RefreshScheduler` with a virtual
+clock. Reads reach the scheduler as they do in production: counted and
+decayed like `product_read` and synced every `REFETCH_INTERVAL`. Reports the upstream requests it issues and the read-weighted age of
+the offers served, next to a fixed `REFETCH_INTERVAL` loop.
+
+    ENVIRONMENT=testing UPSTREAM_FAKE=true REFRESH_ENABLED=false uv run python -m benchmarks.scheduler
+"""
+
+import argparse
+import random
+from uuid import UUID, uuid4
+
+from api import scheduler
+from api.config import settings
+
+
+def main(
+    products: int,
+    duration: float,
+    reads_per_second: float,
+    volatile_share: float,
+    seed: int,
+) -> None:
+    rng = random.Random(seed)
+    now = 0.0
+    scheduler.monotonic = lambda: now  # type: ignore[assignment]
+
+    refresh_scheduler = scheduler.RefreshScheduler(
+        min_interval=settings.refetch_min_interval,
+        max_interval=settings.refetch_max_interval,
+        read_half_life=settings.refetch_read_half_life,
+        hot_reads=settings.refetch_hot_reads,
+        volatility_alpha=settings.refetch_volatility_alpha,
+    )
+    product_ids = [uuid4() for _ in range(products)]
+    weights = [1 / rank**1.1 for rank in range(1, products + 1)]
+    volatile = set(rng.sample(product_ids, int(products * volatile_share)))
+    refreshed_at = dict.fromkeys(product_ids, 0.0)
+    # ? (decayed reads, at), what crud.record_product_reads keeps per product
+    shared: dict[UUID, tuple[float, float]] = {}
+
+    def decayed(product_id: UUID) -> float:
+        count, read_at = shared[product_id]
+        return count * 0.5 ** ((now - read_at) / settings.refetch_read_half_life)
+
+    refresh_scheduler.sync(product_ids)
+    requests = reads = 0
+    age = 0.0
+
+    for second in range(int(duration)):
+        now = float(second)
+
+        if second % settings.refetch_interval == 0:
+            refresh_scheduler.sync_reads(
+                (product_id, decayed(product_id)) for product_id in shared
+            )
+
+        for product_id in rng.choices(
+            product_ids, weights, k=int(rng.expovariate(1 / reads_per_second))
+        ):
+            shared[product_id] = (
+                (decayed(product_id) if product_id in shared else 0.0) + 1,
+                now,
+            )
+            age += now - refreshed_at[product_id]
+            reads += 1
+
+        for product_id in refresh_scheduler.due():
+            requests += 1
+            refreshed_at[product_id] = now
+            changed = rng.random() < (0.9 if product_id in volatile else 0.02)
+            refresh_scheduler.record_refresh(product_id, changed=changed)
+
+    fixed_requests = products * duration / settings.refetch_interval
+    print(
+        f"fixed     upstream_requests={fixed_requests:>9.0f} "
+        f"mean_read_age={settings.refetch_interval / 2:>7.1f}s"
+    )
+    print(
+        f"scheduled upstream_requests={requests:>9} "
+        f"mean_read_age={age / max(reads, 1):>7.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--duration", type=float, default=3600.0)
+    parser.add_argument("--reads-per-second", type=float, default=50.0)
+    parser.add_argument("--volatile-share", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    main(
+        products=args.products,
+        duration=args.duration,
+        reads_per_second=args.reads_per_second,
+        volatile_share=args.volatile_share,
+        seed=args.seed,
+    )
@@ -0,0 +1,136 @@
+"""
+Benchmark of the read endpoint serialization paths.
+
+Compares, on synthetic rows and without a database, the previous path
+(ORM objects -> Pydantic models -> response model validation -> JSON) with the
+fast path (Core row tuples -> dicts -> orjson) for `GET /products` and
+`GET /products/catalogue` payloads.
+
+    uv run python -m benchmarks.serialization --sizes 1000 10000 100000
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Callable
+from uuid import uuid4
+
+from pydantic import TypeAdapter
+
+from api.responses import dumps
+from api.schemas.offer import Offer
+from api.schemas.product import ProductCatalogue, ProductRead
+
+PRODUCT_KEYS = ("id", "name", "description", "created_at", "updated_at")
+OFFER_KEYS = ("id", "price", "items_in_stock")
+
+
+def make_rows(products: int, offers_per_product: int) -> tuple[list, list]:
+    now = datetime.now()
+    product_rows = [
+        (uuid4(), f"Product {index}", "Synthetic product", now, now)
+        for index in range(products)
+    ]
+    offer_rows = [
+        (product[0], uuid4(), 100 + index, 1 + index)
+        for product in product_rows
+        for index in range(offers_per_product)
+    ]
+    return product_rows, offer_rows
+
+
+def as_orm(product_rows: list, offer_rows: list) -> list[SimpleNamespace]:
+    products = {
+        row[0]: SimpleNamespace(**dict(zip(PRODUCT_KEYS, row)), offers=[])
+        for row in product_rows
+    }
+    for product_id, *offer in offer_rows:
+        products[product_id].offers.append(
+            SimpleNamespace(**dict(zip(OFFER_KEYS, offer)))
+        )
+    return list(products.values())
+
+
+def products_pydantic(orm_products: list[SimpleNamespace]) -> bytes:
+    models = [ProductRead.model_validate(product) for product in orm_products]
+    adapter = TypeAdapter(list[ProductRead])
+    content = adapter.dump_python(adapter.validate_python(models), mode="json")
+    return json.dumps(content).encode()
+
+
+def products_fast(product_rows: list) -> bytes:
+    return dumps([dict(zip(PRODUCT_KEYS, row)) for row in product_rows])
+
+
+def catalogue_pydantic(orm_products: list[SimpleNamespace]) -> bytes:
+    return TypeAdapter(list[ProductCatalogue]).dump_json(
+        [
+            ProductCatalogue(
+                id=product.id,
+                name=product.name,
+                description=product.description,
+                offers=[Offer.model_validate(offer) for offer in product.offers],
+                created_at=product.created_at,
+                updated_at=product.updated_at,
+            )
+            for product in orm_products
+        ]
+    )
+
+
+def catalogue_fast(product_rows: list, offer_rows: list) -> bytes:
+    offers: dict[Any, list] = {}
+    products = []
+    for row in product_rows:
+        product = dict(zip(PRODUCT_KEYS, row))
+        product["offers"] = offers[row[0]] = []
+        products.append(product)
+    for product_id, *offer in offer_rows:
+        offers[product_id].append(dict(zip(OFFER_KEYS, offer)))
+    return dumps(products)
+
+
+def timed(function: Callable[[], bytes], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(sizes: list[int], offers_per_product: int, repeat: int) -> None:
+    for size in sizes:
+        product_rows, offer_rows = make_rows(size, offers_per_product)
+        orm_products = as_orm(product_rows, offer_rows)
+
+        cases = {
+            "products": (
+                lambda: products_pydantic(orm_products),
+                lambda: products_fast(product_rows),
+            ),
+            "catalogue": (
+                lambda: catalogue_pydantic(orm_products),
+                lambda: catalogue_fast(product_rows, offer_rows),
+            ),
+        }
+        for name, (pydantic_path, fast_path) in cases.items():
+            before = timed(pydantic_path, repeat)
+            after = timed(fast_path, repeat)
+            print(
+                f"{name:<10} products={size:>7} "
+                f"pydantic={before * 1000:>9.1f}ms fast={after * 1000:>8.1f}ms "
+                f"speedup={before / after:>5.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--offers", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    main(sizes=args.sizes, offers_per_product=args.offers, repeat=args.repeat)
@@ -0,0 +1,73 @@
+"""
+Load test for per-request database sessions.
+
+Runs an increasing number of concurrent clients against the app in-process and
+reports the throughput reached at every concurrency level. With one session
+per request the throughput should grow with the number of clients until the
+connection pool (`POSTGRES_POOL_SIZE` + `POSTGRES_MAX_OVERFLOW`) is saturated.
+
+    ENVIRONMENT=testing UPSTREAM_FAKE=true REFRESH_ENABLED=false uv run python -m benchmarks.sessions
+"""
+
+import argparse
+import asyncio
+import time
+from uuid import uuid4
+
+import httpx
+
+from api.config import settings
+from api.main import app, lifespan
+
+
+async def _client_loop(client: httpx.AsyncClient, path: str, deadline: float) -> int:
+    requests = 0
+
+    while time.monotonic() < deadline:
+        response = await client.get(path)
+        response.raise_for_status()
+        requests += 1
+
+    return requests
+
+
+async def main(levels: list[int], duration: float) -> None:
+    transport = httpx.ASGITransport(app=app)
+    base_url = f"http://bench{settings.api_prefix}"
+
+    async with (
+        lifespan(app),
+        httpx.AsyncClient(transport=transport, base_url=base_url) as client,
+    ):
+        product_id = uuid4()
+        response = await client.post(
+            "/products",
+            json={"id": str(product_id), "name": "Bench", "description": "load"},
+        )
+        response.raise_for_status()
+
+        try:
+            for concurrency in levels:
+                deadline = time.monotonic() + duration
+                counts = await asyncio.gather(
+                    *(
+                        _client_loop(client, f"/products/{product_id}", deadline)
+                        for _ in range(concurrency)
+                    )
+                )
+                print(
+                    f"clients={concurrency:>3} "
+                    f"requests={sum(counts):>6} "
+                    f"rps={sum(counts) / duration:>8.1f}"
+                )
+        finally:
+            await client.delete(f"/products/{product_id}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    asyncio.run(main(levels=args.levels, duration=args.duration))
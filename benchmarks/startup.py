@@ -0,0 +1,69 @@
+"""
+Startup time of the web process.
+
+Compares the schema step the lifespan used to run (`alembic upgrade head` in a
+subprocess, even with nothing to upgrade) with the revision check it runs now,
+and times a full lifespan startup and shutdown.
+
+    ENVIRONMENT=testing UPSTREAM_FAKE=true REFRESH_ENABLED=false uv run python -m benchmarks.startup
+"""
+
+import argparse
+import asyncio
+import statistics
+import subprocess
+import time
+from typing import Awaitable, Callable
+
+from api import database
+from api.main import app, lifespan
+from api.migrate import ensure_schema
+
+
+async def _measure(name: str, step: Callable[[], Awaitable[None]], runs: int) -> None:
+    timings = []
+
+    for _ in range(runs):
+        started = time.perf_counter()
+        await step()
+        timings.append(time.perf_counter() - started)
+        # ? every startup begins without pooled connections
+        await database.engine.dispose()
+
+    print(
+        f"{name:<24} mean={statistics.mean(timings) * 1000:>8.1f}ms "
+        f"min={min(timings) * 1000:>8.1f}ms"
+    )
+
+
+async def _alembic_subprocess() -> None:
+    await asyncio.to_thread(
+        subprocess.run,
+        ["alembic", "upgrade", "head"],
+        check=True,
+        capture_output=True,
+    )
+
+
+async def _schema_check() -> None:
+    await ensure_schema(migrate=False)
+
+
+async def _lifespan() -> None:
+    async with lifespan(app):
+        pass
+
+
+async def main(runs: int) -> None:
+    await _measure("alembic upgrade (before)", _alembic_subprocess, runs)
+    await _measure("schema check (after)", _schema_check, runs)
+    await _measure("lifespan", _lifespan, runs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    database.engine.echo = False
+    asyncio.run(main(runs=args.runs))
@@ -6,6 +6,12 @@ from fastapi.testclient import TestClient
 
 from api.config import settings
 from api.main import app
+from api.migrate import upgrade
+
+
+@pytest.fixture(scope="session", autouse=True)
+def migrated_database() -> None:
+    upgrade()
 
 
 @pytest.fixture(scope="session")
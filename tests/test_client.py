@@ -0,0 +1,191 @@
+import asyncio
+
+from uuid import uuid4
+
+import httpx
+import pytest
+from sqlalchemy import delete
+
+from api.client import BearerAuth
+from api.database import session_factory
+from api.models import AccessTokenORM
+from api.token_store import (
+    FileTokenStore,
+    MemoryTokenStore,
+    PostgresTokenStore,
+    StoredToken,
+    TokenStore,
+)
+
+
+def test_bearer_auth_single_flight_refresh():
+    auth_calls = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal auth_calls
+
+        if request.url.path == "/auth":
+            auth_calls += 1
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, json={"access_token": f"token-{auth_calls}"})
+
+        # the first token is rejected as if it expired while requests were in flight
+        if request.headers["Bearer"] != f"token-{auth_calls}" or auth_calls < 2:
+            return httpx.Response(401)
+
+        return httpx.Response(200, json=[])
+
+    async def run() -> list[httpx.Response]:
+        auth = BearerAuth(base_url="http://upstream", refresh_token="refresh")
+        async with httpx.AsyncClient(
+            auth=auth,
+            base_url="http://upstream",
+            transport=httpx.MockTransport(handler),
+        ) as client:
+            return await asyncio.gather(
+                *(client.get("/products/1/offers") for _ in range(20))
+            )
+
+    responses = asyncio.run(run())
+
+    assert all(response.status_code == 200 for response in responses)
+    assert auth_calls == 2
+
+
+def test_bearer_auth_refreshes_ahead_of_expiry():
+    auth_calls = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal auth_calls
+
+        if request.url.path == "/auth":
+            auth_calls += 1
+            return httpx.Response(200, json={"access_token": f"token-{auth_calls}"})
+
+        return httpx.Response(200, json=[])
+
+    async def run() -> None:
+        auth = BearerAuth(
+            base_url="http://upstream",
+            refresh_token="refresh",
+            token_ttl=60.0,
+            refresh_margin=60.0,
+        )
+        async with httpx.AsyncClient(
+            auth=auth,
+            base_url="http://upstream",
+            transport=httpx.MockTransport(handler),
+        ) as client:
+            for _ in range(3):
+                response = await client.get("/products/1/offers")
+                assert response.status_code == 200
+
+    asyncio.run(run())
+
+    assert auth_calls == 3
+
+
+class Upstream:
+    """Upstream that only accepts the last access token it issued"""
+
+    def __init__(self) -> None:
+        self.auth_calls = 0
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/auth":
+            self.auth_calls += 1
+            await asyncio.sleep(0.01)
+            return httpx.Response(
+                200, json={"access_token": f"token-{self.auth_calls}"}
+            )
+
+        if request.headers["Bearer"] != f"token-{self.auth_calls}":
+            return httpx.Response(401)
+
+        return httpx.Response(200, json=[])
+
+    def expire(self) -> None:
+        self.auth_calls += 1
+
+
+async def _share_token_store(upstream: Upstream, stores: list[TokenStore]) -> None:
+    """Sends concurrent requests from one client per store, as separate processes would."""
+
+    clients = [
+        httpx.AsyncClient(
+            auth=BearerAuth(base_url="http://upstream", refresh_token="r", store=store),
+            base_url="http://upstream",
+            transport=httpx.MockTransport(upstream.handler),
+        )
+        for store in stores
+    ]
+
+    async def send() -> None:
+        responses = await asyncio.gather(
+            *(client.get("/products/1/offers") for client in clients for _ in range(5))
+        )
+        assert all(response.status_code == 200 for response in responses)
+
+    await send()
+    assert upstream.auth_calls == 1
+
+    upstream.expire()
+    await send()
+    assert upstream.auth_calls == 3
+
+    for client in clients:
+        await client.aclose()
+
+
+def test_file_token_store_shared(tmp_path):
+    upstream = Upstream()
+    path = tmp_path / ".token"
+
+    asyncio.run(
+        _share_token_store(upstream, [FileTokenStore(path), FileTokenStore(path)])
+    )
+
+
+def test_postgres_token_store_shared(test_client):
+    upstream = Upstream()
+    name = f"test-{uuid4()}"
+
+    async def cleanup() -> None:
+        async with session_factory() as session:
+            await session.execute(
+                delete(AccessTokenORM).where(AccessTokenORM.name == name)
+            )
+            await session.commit()
+
+    try:
+        test_client.portal.call(
+            _share_token_store,
+            upstream,
+            [PostgresTokenStore(name), PostgresTokenStore(name)],
+        )
+    finally:
+        test_client.portal.call(cleanup)
+
+
+@pytest.mark.parametrize("store_type", ["memory", "file", "postgres"])
+def test_token_store_compare_and_swap(test_client, tmp_path, store_type):
+    name = f"test-{uuid4()}"
+    store = {
+        "memory": lambda: MemoryTokenStore(),
+        "file": lambda: FileTokenStore(tmp_path / ".token"),
+        "postgres": lambda: PostgresTokenStore(name),
+    }[store_type]()
+
+    async def swap() -> None:
+        assert await store.save(StoredToken("a", 1), expected_version=0)
+        assert not await store.save(StoredToken("b", 1), expected_version=0)
+        assert await store.save(StoredToken("c", 2), expected_version=1)
+        assert await store.load() == StoredToken("c", 2)
+
+        async with session_factory() as session:
+            await session.execute(
+                delete(AccessTokenORM).where(AccessTokenORM.name == name)
+            )
+            await session.commit()
+
+    test_client.portal.call(swap)
@@ -0,0 +1,103 @@
+import asyncio
+from uuid import uuid4
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from api.client import BearerAuth
+from api.fake_upstream import FakeUpstream
+from api.resilience import CircuitBreaker, RateLimiter, ResilientTransport
+from api.token_store import MemoryTokenStore, TokenStore
+
+
+def _client(
+    upstream: FakeUpstream, store: TokenStore | None = None
+) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        auth=BearerAuth(
+            base_url="http://upstream", refresh_token="refresh", store=store
+        ),
+        base_url="http://upstream",
+        transport=ResilientTransport(
+            upstream.transport(),
+            breaker=CircuitBreaker(failure_threshold=100, reset_timeout=60),
+            limiter=RateLimiter(max_rate=1000, min_rate=1, burst=100),
+            max_retries=10,
+            backoff=0.0,
+            backoff_max=0.0,
+        ),
+    )
+
+
+def test_token_expiry():
+    upstream = FakeUpstream(refresh_token="refresh", token_ttl=0.05)
+    product_id = uuid4()
+
+    async def run() -> None:
+        async with _client(upstream) as client:
+            for _ in range(3):
+                response = await client.get(f"/products/{product_id}/offers")
+                assert response.status_code == 200
+
+            await asyncio.sleep(0.05)
+            response = await client.get(f"/products/{product_id}/offers")
+            assert response.status_code == 200
+
+    asyncio.run(run())
+    assert upstream.stats.auth_calls == 2
+    assert upstream.stats.unauthorized == 1
+
+
+def test_auth_rejected_while_token_is_valid():
+    upstream = FakeUpstream(refresh_token="refresh")
+    product_id = uuid4()
+
+    async def fetch(store: TokenStore | None) -> int:
+        async with _client(upstream, store) as client:
+            return (await client.get(f"/products/{product_id}/offers")).status_code
+
+    # ? processes sharing the token store reuse the token instead of calling /auth
+    store = MemoryTokenStore()
+    assert asyncio.run(fetch(store)) == 200
+    assert asyncio.run(fetch(store)) == 200
+
+    with pytest.raises(HTTPException):
+        asyncio.run(fetch(None))
+
+    assert upstream.stats.auth_calls == 2
+    assert upstream.stats.auth_rejected == 1
+
+
+def test_errors_are_retried():
+    upstream = FakeUpstream(refresh_token="refresh", error_rate=0.3, seed=1)
+
+    async def run() -> list[int]:
+        async with _client(upstream) as client:
+            responses = await asyncio.gather(
+                *(client.get(f"/products/{uuid4()}/offers") for _ in range(20))
+            )
+        return [response.status_code for response in responses]
+
+    assert asyncio.run(run()) == [200] * 20
+    assert upstream.stats.errors > 0
+
+
+def test_offer_churn_is_repeatable():
+    product_ids = [uuid4() for _ in range(10)]
+
+    async def fetch(upstream: FakeUpstream) -> list[list[dict]]:
+        async with _client(upstream) as client:
+            return [
+                (await client.get(f"/products/{product_id}/offers")).json()
+                for _ in range(5)
+                for product_id in product_ids
+            ]
+
+    runs = [
+        asyncio.run(fetch(FakeUpstream("refresh", churn=0.5, seed=7))) for _ in "ab"
+    ]
+    assert runs[0] == runs[1]
+
+    unchanged = asyncio.run(fetch(FakeUpstream("refresh", churn=0.0, seed=7)))
+    assert unchanged[: len(product_ids)] * 5 == unchanged
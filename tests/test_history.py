@@ -0,0 +1,123 @@
+from datetime import datetime
+from uuid import uuid4
+
+from fastapi import status
+from sqlalchemy import delete, insert, text
+
+from api.crud import replace_offers
+from api.database import session_scope
+from api.history import ensure_partitions, expire_history, rollup_history
+from api.models import OfferHistoryDailyORM, OfferHistoryORM
+from api.schemas.offer import Offer
+
+
+def test_offer_history(test_client, test_product_id):
+    offer = Offer(id=uuid4(), price=100, items_in_stock=5)
+
+    async def sync(*offers: Offer) -> None:
+        async with session_scope():
+            await replace_offers(offers={test_product_id: list(offers)})
+
+    async def cleanup() -> None:
+        async with session_scope() as session:
+            await session.execute(
+                delete(OfferHistoryORM).where(
+                    OfferHistoryORM.product_id == test_product_id
+                )
+            )
+            await session.commit()
+
+    try:
+        test_client.portal.call(sync, offer)
+        test_client.portal.call(sync, offer)
+        test_client.portal.call(sync, offer.model_copy(update={"price": 90}))
+        test_client.portal.call(sync)
+
+        response = test_client.get(f"/products/{test_product_id}/offers/history")
+        assert response.status_code == status.HTTP_200_OK
+
+        # ? only changes are stored, the unchanged second sync left no row
+        entries = response.json()
+        assert [(entry["price"], entry["items_in_stock"]) for entry in entries] == [
+            (100, 5),
+            (90, 5),
+            (90, 0),
+        ]
+        assert {entry["resolution"] for entry in entries} == {"observation"}
+
+        response = test_client.get(
+            f"/products/{test_product_id}/offers/history",
+            params={"until": entries[0]["observed_at"]},
+        )
+        assert response.json() == []
+
+        response = test_client.get(f"/products/{uuid4()}/offers/history")
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+    finally:
+        test_client.portal.call(cleanup)
+
+
+def test_offer_history_rollup(test_client, test_product_id):
+    offer_id = uuid4()
+
+    async def observe() -> None:
+        async with session_scope() as session:
+            await session.execute(
+                insert(OfferHistoryORM),
+                [
+                    {
+                        "product_id": test_product_id,
+                        "offer_id": offer_id,
+                        "observed_at": datetime(2020, 1, 15, hour),
+                        "price": price,
+                        "items_in_stock": 1,
+                    }
+                    for hour, price in ((8, 120), (12, 80), (18, 100))
+                ],
+            )
+            await session.commit()
+
+    async def run(job, now: datetime):
+        async with session_scope():
+            return await job(now=now)
+
+    async def cleanup() -> None:
+        async with session_scope() as session:
+            await session.execute(text("DROP TABLE IF EXISTS offer_history_2020_03"))
+            await session.execute(
+                delete(OfferHistoryDailyORM).where(
+                    OfferHistoryDailyORM.product_id == test_product_id
+                )
+            )
+            await session.commit()
+
+    try:
+        # ? observations of months without a partition wait in the default one
+        test_client.portal.call(observe)
+        created = test_client.portal.call(run, ensure_partitions, datetime(2020, 1, 20))
+        assert created == [
+            "offer_history_2020_01",
+            "offer_history_2020_02",
+            "offer_history_2020_03",
+        ]
+
+        dropped = test_client.portal.call(run, rollup_history, datetime(2020, 6, 1))
+        assert dropped == ["offer_history_2020_01", "offer_history_2020_02"]
+
+        response = test_client.get(
+            f"/products/{test_product_id}/offers/history",
+            params={"since": "2020-01-01T00:00:00Z", "until": "2020-02-01T00:00:00Z"},
+        )
+        (entry,) = response.json()
+        assert entry["resolution"] == "day"
+        assert entry["observed_at"].startswith("2020-01-15T00:00:00")
+        assert (entry["price"], entry["min_price"], entry["max_price"]) == (
+            100,
+            80,
+            120,
+        )
+
+        expired = test_client.portal.call(run, expire_history, datetime(2023, 1, 1))
+        assert expired >= 1
+    finally:
+        test_client.portal.call(cleanup)
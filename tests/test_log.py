@@ -0,0 +1,53 @@
+from io import StringIO
+
+import orjson
+from loguru import logger
+
+from api import log
+from api.config import settings
+from api.log import LogRateLimit, configure_logging
+
+
+def test_request_id(test_client):
+    response = test_client.get("/health", headers={"X-Request-ID": "abc123"})
+    assert response.headers["X-Request-ID"] == "abc123"
+
+    response = test_client.get("/health")
+    assert len(response.headers["X-Request-ID"]) == 32
+
+
+def test_json_logging(test_client):
+    stream = StringIO()
+    configure_logging(settings.model_copy(update={"log_format": "json"}), stream)
+
+    try:
+        test_client.get("/health", headers={"X-Request-ID": "abc123"})
+        test_client.portal.call(logger.complete)
+    finally:
+        configure_logging()
+
+    records = [orjson.loads(line) for line in stream.getvalue().splitlines()]
+    (access,) = [record for record in records if record["logger"] == "api.middleware"]
+    assert access["request_id"] == "abc123"
+    assert access["status"] == 204
+    assert access["path"] == f"{settings.api_prefix}/health"
+
+
+def test_rate_limit(monkeypatch):
+    now = 0.0
+    monkeypatch.setattr(log, "monotonic", lambda: now)
+    rate_limit = LogRateLimit(rate=1.0, burst=2)
+
+    def record() -> dict:
+        return {"name": "api.utils", "level": logger.level("INFO"), "extra": {}}
+
+    assert [rate_limit(record()) for _ in range(5)] == [True, True, False, False, False]
+
+    # ? other loggers and levels have buckets of their own
+    assert rate_limit({**record(), "level": logger.level("ERROR")})
+
+    now = 1.0
+    allowed = record()
+    assert rate_limit(allowed)
+    assert allowed["extra"]["suppressed"] == 3
+    assert not rate_limit(record())
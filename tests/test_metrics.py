@@ -0,0 +1,72 @@
+import asyncio
+from uuid import uuid4
+
+import httpx
+from fastapi import status
+from prometheus_client import REGISTRY
+
+from api import client
+
+
+def test_metrics(test_client):
+    response = test_client.get("/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    assert "offer_refresh_skipped_products_total" in response.text
+
+
+def test_upstream_metrics():
+    labels = {"method": "GET", "endpoint": "/products/{id}/offers", "status": "200"}
+    before = REGISTRY.get_sample_value(
+        "upstream_request_duration_seconds_count", labels
+    )
+    wait_before = REGISTRY.get_sample_value(
+        "upstream_pool_wait_seconds_count", {"endpoint": labels["endpoint"]}
+    )
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        # MockTransport has no pool, report the connection event it would
+        await request.extensions["trace"]("http2.send_request_headers.started", {})
+        return httpx.Response(200, json=[])
+
+    async def run() -> None:
+        async with httpx.AsyncClient(
+            transport=httpx.MockTransport(handler),
+            event_hooks={
+                "request": [client._observe_request],
+                "response": [client._observe_response],
+            },
+        ) as http_client:
+            await http_client.get(f"http://upstream/products/{uuid4()}/offers")
+
+    asyncio.run(run())
+
+    after = REGISTRY.get_sample_value("upstream_request_duration_seconds_count", labels)
+    wait_after = REGISTRY.get_sample_value(
+        "upstream_pool_wait_seconds_count", {"endpoint": labels["endpoint"]}
+    )
+    assert after == (before or 0) + 1
+    assert wait_after == (wait_before or 0) + 1
+
+
+def test_http_and_database_metrics(test_client, test_product_id):
+    labels = {"method": "GET", "route": "/products/{product_id}", "status": "200"}
+    before = REGISTRY.get_sample_value("http_request_duration_seconds_count", labels)
+    selects_before = REGISTRY.get_sample_value(
+        "db_query_duration_seconds_count", {"statement": "SELECT"}
+    )
+
+    response = test_client.get(f"/products/{test_product_id}")
+    assert response.status_code == status.HTTP_200_OK
+
+    after = REGISTRY.get_sample_value("http_request_duration_seconds_count", labels)
+    selects_after = REGISTRY.get_sample_value(
+        "db_query_duration_seconds_count", {"statement": "SELECT"}
+    )
+    assert after == (before or 0) + 1
+    assert selects_after == (selects_before or 0) + 1
+
+    # ? the id is not part of any label
+    metrics = test_client.get("/metrics").text
+    assert str(test_product_id) not in metrics
+    assert 'db_pool_connections{state="size"}' in metrics
+    assert "offer_refresh_lag_seconds" in metrics
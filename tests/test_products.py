@@ -1,6 +1,20 @@
+import asyncio
+import json
+import time
 from uuid import uuid4
 
-from fastapi import status
+import httpx
+import pytest
+from fastapi import HTTPException, status
+from sqlalchemy import update
+
+from api.cache import ResponseCache
+from api.crud import replace_offers
+from api.database import session_scope
+from api.models import ProductORM
+from api.schemas.offer import Offer
+from api.schemas.product import ProductCreateIn
+from api.utils import register_product
 
 
 def test_read_catalogue(test_client):
@@ -41,6 +55,38 @@ def test_create_product_duplicate(test_client, test_product_id):
     assert response.status_code == status.HTTP_409_CONFLICT
 
 
+def test_register_product_conflict():
+    taken = 2
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal taken
+
+        if taken:
+            taken -= 1
+            return httpx.Response(409)
+
+        return httpx.Response(201, json=json.loads(request.content))
+
+    async def register(product: ProductCreateIn) -> ProductCreateIn:
+        async with httpx.AsyncClient(
+            base_url="http://upstream", transport=httpx.MockTransport(handler)
+        ) as client:
+            return await register_product(product=product, client=client)
+
+    product = ProductCreateIn(id=uuid4(), name="Tablet", description="12.9")
+
+    # ? a taken id is retried under a fresh one, the given product is left as is
+    registered = asyncio.run(register(product))
+    assert registered.id != product.id
+    assert registered.name == product.name
+
+    taken = 10
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(register(product))
+    assert error.value.status_code == status.HTTP_409_CONFLICT
+    assert taken == 7
+
+
 def test_create_product_invalid_query(test_client):
     product_id = 1
     request_body = {
@@ -130,7 +176,238 @@ def test_delete_product_nonexistent(test_client):
     assert response_body["detail"] == "Product not found"
 
 
+def test_delete_product_with_offers(test_client, test_product_id):
+    async def sync():
+        async with session_scope():
+            await replace_offers(
+                offers={test_product_id: [Offer(id=uuid4(), price=1, items_in_stock=1)]}
+            )
+
+    test_client.portal.call(sync)
+    response = test_client.delete(f"/products/{test_product_id}")
+    assert response.status_code == status.HTTP_200_OK
+    response = test_client.get(f"/products/{test_product_id}/offers")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_read_offers_nonexistent(test_client):
+    response = test_client.get(f"/products/{uuid4()}/offers")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert response.json()["detail"] == "Product not found"
+
+
 def test_delete_product_invalid_query(test_client):
     product_id = 1
     response = test_client.delete(f"/products/{product_id}")
     assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_read_catalogue_not_modified(test_client):
+    response = test_client.get("/products/catalogue")
+    etag = response.headers["ETag"]
+
+    response = test_client.get("/products/catalogue", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+def test_read_catalogue_invalidated(test_client, test_product_id):
+    params = {"name_prefix": "Tablet", "limit": 1000}
+    response = test_client.get("/products/catalogue", params=params)
+    etag = response.headers["ETag"]
+    assert str(test_product_id) in {product["id"] for product in response.json()}
+
+    test_client.delete(f"/products/{test_product_id}")
+
+    response = test_client.get(
+        "/products/catalogue", params=params, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["ETag"] != etag
+    assert str(test_product_id) not in {product["id"] for product in response.json()}
+
+
+def test_read_catalogue_invalidated_by_other_process(test_client, test_product_id):
+    params = {"name_prefix": "Tablet", "limit": 1000}
+    etag = test_client.get("/products/catalogue", params=params).headers["ETag"]
+
+    async def rename() -> None:
+        # ? written past crud, only the notification can invalidate the cache
+        async with session_scope() as session:
+            await session.execute(
+                update(ProductORM)
+                .where(ProductORM.id == test_product_id)
+                .values(name="Tablet renamed")
+            )
+            await session.commit()
+
+    test_client.portal.call(rename)
+
+    for _ in range(50):
+        response = test_client.get("/products/catalogue", params=params)
+        if response.headers["ETag"] != etag:
+            break
+        time.sleep(0.02)
+
+    products = {product["id"]: product for product in response.json()}
+    assert products[str(test_product_id)]["name"] == "Tablet renamed"
+
+
+def test_read_products_paginated(test_client):
+    name = f"Page {uuid4().hex[:8]}"
+    product_ids = [str(uuid4()) for _ in range(3)]
+    for product_id in product_ids:
+        test_client.post(
+            "/products",
+            json={"id": product_id, "name": name, "description": "paginated"},
+        )
+
+    try:
+        response = test_client.get(
+            "/products", params={"name_prefix": name, "limit": 2}
+        )
+        first_page = [product["id"] for product in response.json()]
+        assert response.status_code == status.HTTP_200_OK
+        assert len(first_page) == 2
+
+        response = test_client.get(
+            "/products",
+            params={
+                "name_prefix": name,
+                "limit": 2,
+                "cursor": response.headers["X-Next-Cursor"],
+            },
+        )
+        second_page = [product["id"] for product in response.json()]
+        assert len(second_page) == 1
+        assert "X-Next-Cursor" not in response.headers
+        assert sorted(first_page + second_page) == sorted(product_ids)
+    finally:
+        for product_id in product_ids:
+            test_client.delete(f"/products/{product_id}")
+
+
+def test_read_products_in_stock(test_client, test_product_id):
+    response = test_client.get(
+        "/products", params={"name_prefix": "Tablet", "in_stock": True}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert str(test_product_id) not in {product["id"] for product in response.json()}
+
+
+def test_catalogue_cache_builds_keys_independently():
+    cache = ResponseCache(ttl=60.0, max_entries=16)
+    builds = []
+
+    async def build_slowly():
+        builds.append("slow")
+        await asyncio.sleep(0.5)
+        return b"slow", {}
+
+    async def build_quickly():
+        builds.append("quick")
+        return b"quick", {}
+
+    async def run():
+        slow = [
+            asyncio.create_task(cache.get_or_build("slow", build_slowly))
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0)
+        # a miss of another key does not wait for the slow build
+        quick = await asyncio.wait_for(cache.get_or_build("quick", build_quickly), 0.1)
+        return quick, await asyncio.gather(*slow)
+
+    quick, slow = asyncio.run(run())
+
+    assert quick.body == b"quick"
+    assert {entry.body for entry in slow} == {b"slow"}
+    # concurrent misses of the same key are built once
+    assert builds == ["slow", "quick"]
+
+
+def test_read_catalogue_view(test_client, test_product_id):
+    cheap, dear = uuid4(), uuid4()
+
+    async def sync():
+        async with session_scope():
+            await replace_offers(
+                offers={
+                    test_product_id: [
+                        Offer(id=dear, price=300, items_in_stock=2),
+                        Offer(id=cheap, price=100, items_in_stock=1),
+                    ]
+                }
+            )
+
+    test_client.portal.call(sync)
+
+    def catalogue(**params):
+        params = {"name_prefix": "Tablet", "limit": 1000, **params}
+        response = test_client.get("/products/catalogue", params=params)
+        assert response.status_code == status.HTTP_200_OK
+        return {product["id"]: product for product in response.json()}
+
+    product = catalogue()[str(test_product_id)]
+    assert [offer["id"] for offer in product["offers"]] == [str(cheap), str(dear)]
+    assert product["offers"][0] == {"id": str(cheap), "price": 100, "items_in_stock": 1}
+
+    assert str(test_product_id) in catalogue(price_min=250)
+    assert str(test_product_id) in catalogue(price_max=150, in_stock=True)
+    # ? both bounds must hold for one offer, not just for the lowest and highest
+    assert str(test_product_id) not in catalogue(price_min=150, price_max=250)
+
+
+def test_read_products_invalid_cursor(test_client):
+    response = test_client.get("/products", params={"cursor": "invalid"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_export_products_ndjson(test_client, test_product_id):
+    response = test_client.get("/products/export")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert str(test_product_id) in {product["id"] for product in lines}
+
+
+def test_export_products_json(test_client, test_product_id):
+    response = test_client.get("/products/export", params={"format": "json"})
+    assert response.status_code == status.HTTP_200_OK
+    assert str(test_product_id) in {product["id"] for product in response.json()}
+
+
+def test_batch_products(test_client, test_product_id):
+    new_id = uuid4()
+    response = test_client.post(
+        "/products/batch",
+        json=[
+            {"id": str(new_id), "name": "Phone", "description": "6.1, 3000 mAh"},
+            {"id": str(test_product_id), "name": "Tablet", "description": "dup"},
+        ],
+    )
+    assert response.status_code == status.HTTP_207_MULTI_STATUS
+    assert [item["status"] for item in response.json()] == [201, 409]
+
+    missing_id = uuid4()
+    response = test_client.put(
+        "/products/batch",
+        json=[
+            {"id": str(new_id), "name": "iPhone", "description": "6.1"},
+            {"id": str(missing_id), "name": "iPhone", "description": "6.1"},
+        ],
+    )
+    assert [item["status"] for item in response.json()] == [200, 404]
+    assert test_client.get(f"/products/{new_id}").json()["name"] == "iPhone"
+
+    response = test_client.request(
+        "DELETE", "/products/batch", json=[str(new_id), str(missing_id)]
+    )
+    assert [item["status"] for item in response.json()] == [200, 404]
+    assert test_client.get(f"/products/{new_id}").status_code == 404
+
+
+def test_batch_products_too_large(test_client):
+    response = test_client.request(
+        "DELETE", "/products/batch", json=[str(uuid4()) for _ in range(1001)]
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+from typing import Any
+from uuid import uuid4
+
+from sqlalchemy import event
+
+from api import database
+from api.crud import read_offer_history, read_offers, replace_offers
+from api.database import session_scope
+from api.schemas.offer import Offer, OfferHistoryQuery
+
+
+def _nodes(plan: dict[str, Any]) -> list[dict[str, Any]]:
+    return [plan, *(node for child in plan.get("Plans", []) for node in _nodes(child))]
+
+
+async def _plans(run, prefixes, table) -> list[list[dict[str, Any]]]:
+    """
+    Runs `run` and returns the plan nodes of each statement starting with one
+    of `prefixes` that touched `table`.
+    """
+
+    statements = []
+
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        if statement.startswith(prefixes) and f" {table}" in statement:
+            statements.append((statement, parameters))
+
+    event.listen(database.engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        async with session_scope():
+            await run()
+    finally:
+        event.remove(database.engine.sync_engine, "before_cursor_execute", capture)
+
+    plans = []
+    async with database.engine.connect() as connection:
+        # ? the test tables are tiny, make a sequential scan only win if no index fits
+        await connection.exec_driver_sql("SET enable_seqscan = off")
+        for statement, parameters in statements:
+            result = await connection.exec_driver_sql(
+                f"EXPLAIN (FORMAT JSON) {statement}", parameters
+            )
+            plans.append(_nodes(result.scalar_one()[0]["Plan"]))
+        await connection.exec_driver_sql("RESET enable_seqscan")
+
+    return plans
+
+
+def test_offer_lookups_use_index(test_client, test_product_id):
+    async def refresh() -> None:
+        await replace_offers(
+            offers={test_product_id: [Offer(id=uuid4(), price=1, items_in_stock=1)]}
+        )
+        await read_offers(product_id=test_product_id)
+
+    # ? the DELETE of removed offers is a CTE of the history INSERT
+    plans = test_client.portal.call(_plans, refresh, ("SELECT", "WITH"), "offer")
+    plans = [
+        nodes
+        for nodes in plans
+        if any(node.get("Relation Name") == "offer" for node in nodes)
+    ]
+    assert len(plans) == 2
+
+    for nodes in plans:
+        scans = {
+            node["Node Type"] for node in nodes if node.get("Relation Name") == "offer"
+        }
+        # ? a bitmap scan names its index on the Bitmap Index Scan below it
+        indexes = {node.get("Index Name") for node in nodes}
+        assert "Seq Scan" not in scans
+        assert "ix_offer_product_id_price" in indexes
+
+    # ? covering, the offers of a product are read without touching the heap
+    read_scans = {node["Node Type"] for node in plans[1]}
+    assert "Index Only Scan" in read_scans
+
+
+def test_offer_history_uses_index(test_client, test_product_id):
+    query = OfferHistoryQuery(
+        since=datetime(2020, 1, 1), until=datetime.now() + timedelta(days=1)
+    )
+
+    async def read() -> None:
+        await read_offer_history(product_id=test_product_id, query=query)
+
+    (nodes,) = test_client.portal.call(_plans, read, ("SELECT",), "offer_history")
+    scans = {
+        node["Node Type"]
+        for node in nodes
+        if node.get("Relation Name", "").startswith("offer_history")
+    }
+    assert scans
+    assert "Seq Scan" not in scans
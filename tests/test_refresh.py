@@ -0,0 +1,238 @@
+import asyncio
+import contextlib
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import select
+
+from api import utils
+from api.config import settings
+from api.crud import replace_offers
+from api.database import session_scope
+from api.models import OfferORM
+from api.scheduler import RefreshScheduler
+from api.schemas.offer import Offer, OfferSyncResult
+
+
+def _scheduler() -> RefreshScheduler:
+    return RefreshScheduler(
+        min_interval=1.0,
+        max_interval=100.0,
+        read_half_life=3600.0,
+        hot_reads=10.0,
+        volatility_alpha=0.5,
+    )
+
+
+def test_refresh_offers_bounded_concurrency(monkeypatch):
+    in_flight = 0
+    peak = 0
+
+    async def fetch_product_offers(product_id):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return []
+
+    async def replace_offers(offers, fingerprints):
+        return OfferSyncResult()
+
+    monkeypatch.setattr(utils, "fetch_product_offers", fetch_product_offers)
+    monkeypatch.setattr(utils, "replace_offers", replace_offers)
+    monkeypatch.setattr(utils, "_host_semaphores", {})
+
+    product_ids = [uuid4() for _ in range(50)]
+    stats = asyncio.run(utils.refresh_offers(product_ids=product_ids))
+
+    assert stats.products == len(product_ids)
+    assert stats.refreshed == len(product_ids)
+    assert stats.failed == 0
+    assert peak <= min(settings.refetch_concurrency, settings.refetch_host_concurrency)
+
+
+def test_refresh_offers_isolates_failures(monkeypatch):
+    failing_id = uuid4()
+
+    async def fetch_product_offers(product_id):
+        if product_id == failing_id:
+            raise utils.HTTPException(status_code=503)
+        return []
+
+    async def replace_offers(offers, fingerprints):
+        return OfferSyncResult()
+
+    monkeypatch.setattr(utils, "fetch_product_offers", fetch_product_offers)
+    monkeypatch.setattr(utils, "replace_offers", replace_offers)
+    monkeypatch.setattr(utils, "_host_semaphores", {})
+
+    product_ids = [uuid4(), failing_id, uuid4()]
+    stats = asyncio.run(utils.refresh_offers(product_ids=product_ids))
+
+    assert stats.refreshed == 2
+    assert stats.failed == 1
+
+
+def test_refresh_offers_skips_unchanged(monkeypatch):
+    unchanged_id, changed_id = uuid4(), uuid4()
+    offers = [Offer(id=uuid4(), price=100, items_in_stock=1)]
+    written = {}
+
+    async def fetch_product_offers(product_id):
+        return offers
+
+    async def replace_offers(offers, fingerprints):
+        written.update(fingerprints)
+        return OfferSyncResult()
+
+    monkeypatch.setattr(utils, "fetch_product_offers", fetch_product_offers)
+    monkeypatch.setattr(utils, "replace_offers", replace_offers)
+    monkeypatch.setattr(utils, "_host_semaphores", {})
+    monkeypatch.setattr(
+        utils, "_offer_fingerprints", {unchanged_id: utils.offers_fingerprint(offers)}
+    )
+
+    stats = asyncio.run(utils.refresh_offers(product_ids=[unchanged_id, changed_id]))
+
+    assert stats.skipped == 1
+    assert stats.refreshed == 1
+    assert written.keys() == {changed_id}
+
+
+def test_refresh_offers_notifies_catalogue_once(monkeypatch):
+    notified = 0
+
+    async def fetch_product_offers(product_id):
+        return [Offer(id=uuid4(), price=100, items_in_stock=1)]
+
+    async def replace_offers(offers, fingerprints):
+        return OfferSyncResult(inserted=len(offers))
+
+    async def notify_catalogue():
+        nonlocal notified
+        notified += 1
+
+    monkeypatch.setattr(utils, "fetch_product_offers", fetch_product_offers)
+    monkeypatch.setattr(utils, "replace_offers", replace_offers)
+    monkeypatch.setattr(utils, "notify_catalogue", notify_catalogue)
+    monkeypatch.setattr(utils, "_host_semaphores", {})
+    monkeypatch.setattr(settings, "offer_sync_batch_size", 1)
+
+    stats = asyncio.run(utils.refresh_offers(product_ids=[uuid4() for _ in range(5)]))
+
+    assert stats.inserted == 5
+    # one invalidation per cycle, not per batch
+    assert notified == 1
+
+
+def test_refresh_offers_counts_unfinished(monkeypatch):
+    stalled = uuid4()
+
+    async def fetch_product_offers(product_id):
+        if product_id == stalled:
+            await asyncio.sleep(10)
+        return [Offer(id=uuid4(), price=100, items_in_stock=1)]
+
+    async def replace_offers(offers, fingerprints):
+        return OfferSyncResult()
+
+    monkeypatch.setattr(utils, "fetch_product_offers", fetch_product_offers)
+    monkeypatch.setattr(utils, "replace_offers", replace_offers)
+    monkeypatch.setattr(utils, "_host_semaphores", {})
+    monkeypatch.setattr(settings, "refetch_concurrency", 1)
+    monkeypatch.setattr(settings, "refetch_cycle_timeout", 0.1)
+
+    product_ids = [uuid4(), stalled, uuid4(), uuid4()]
+    stats = asyncio.run(utils.refresh_offers(product_ids=product_ids))
+
+    assert stats.refreshed == 1
+    # the stalled fetch and the two products still queued behind it
+    assert stats.unfinished == 3
+
+
+def test_replace_offers_bulk_sync(test_client, test_product_id):
+    async def sync(offers):
+        async with session_scope():
+            return await replace_offers(offers={test_product_id: offers})
+
+    async def fetched_at(offer_id):
+        async with session_scope() as session:
+            return await session.scalar(
+                select(OfferORM.fetched_at).where(OfferORM.id == offer_id)
+            )
+
+    kept, changed, dropped = uuid4(), uuid4(), uuid4()
+    result = test_client.portal.call(
+        sync,
+        [
+            Offer(id=kept, price=100, items_in_stock=1),
+            Offer(id=changed, price=200, items_in_stock=2),
+            Offer(id=dropped, price=300, items_in_stock=3),
+        ],
+    )
+    assert result == OfferSyncResult(inserted=3)
+    kept_fetched_at = test_client.portal.call(fetched_at, kept)
+
+    result = test_client.portal.call(
+        sync,
+        [
+            Offer(id=kept, price=100, items_in_stock=1),
+            Offer(id=changed, price=150, items_in_stock=2),
+            Offer(id=dropped, price=300, items_in_stock=0),
+        ],
+    )
+    assert result == OfferSyncResult(updated=1, removed=1)
+    # an unchanged offer is not rewritten
+    assert test_client.portal.call(fetched_at, kept) == kept_fetched_at
+
+    response = test_client.get(f"/products/{test_product_id}/offers")
+    offers = {offer["id"]: offer for offer in response.json()}
+    assert offers.keys() == {str(kept), str(changed)}
+    assert offers[str(changed)]["price"] == 150
+
+
+def test_fetch_loop_survives_failed_cycle(monkeypatch):
+    cycles = []
+
+    class Stop(Exception): ...
+
+    async def read_offer_fingerprints():
+        if not cycles:
+            cycles.append("failed")
+            raise RuntimeError("database is down")
+        return [(uuid4(), None)]
+
+    async def refresh_offers(product_ids):
+        cycles.append("refreshed")
+
+    async def heartbeat_replica(replica_id, ttl):
+        return [replica_id]
+
+    async def read_product_reads(half_life):
+        return []
+
+    async def maintain_offer_history() -> None: ...
+
+    sleeps = 0
+
+    async def sleep(delay):
+        nonlocal sleeps
+        sleeps += 1
+        # bounded, so a loop that stopped making progress fails instead of hanging
+        if len(cycles) == 2 or sleeps > 10:
+            raise Stop
+
+    monkeypatch.setattr(utils, "session_scope", contextlib.nullcontext)
+    monkeypatch.setattr(utils, "read_offer_fingerprints", read_offer_fingerprints)
+    monkeypatch.setattr(utils, "heartbeat_replica", heartbeat_replica)
+    monkeypatch.setattr(utils, "read_product_reads", read_product_reads)
+    monkeypatch.setattr(utils, "refresh_offers", refresh_offers)
+    monkeypatch.setattr(utils, "maintain_offer_history", maintain_offer_history)
+    monkeypatch.setattr(utils, "sleep", sleep)
+    monkeypatch.setattr(utils, "refresh_scheduler", _scheduler())
+
+    with pytest.raises(Stop):
+        asyncio.run(utils.fetch_loop())
+
+    assert cycles == ["failed", "refreshed"]
@@ -0,0 +1,103 @@
+import asyncio
+
+import httpx
+import pytest
+
+from api.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RateLimiter,
+    ResilientTransport,
+    retry_after,
+)
+
+
+def _client(handler, breaker=None, limiter=None, max_retries=3) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url="http://upstream",
+        transport=ResilientTransport(
+            httpx.MockTransport(handler),
+            breaker=breaker or CircuitBreaker(failure_threshold=100, reset_timeout=60),
+            limiter=limiter or RateLimiter(max_rate=1000, min_rate=1, burst=100),
+            max_retries=max_retries,
+            backoff=0.0,
+            backoff_max=0.0,
+        ),
+    )
+
+
+def test_retries_honour_retry_after():
+    statuses = [429, 503, 200]
+    limiter = RateLimiter(max_rate=1000, min_rate=1, burst=100)
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(statuses.pop(0), headers={"Retry-After": "0"})
+
+    async def run() -> httpx.Response:
+        async with _client(handler, limiter=limiter) as client:
+            return await client.get("/products/1/offers")
+
+    response = asyncio.run(run())
+
+    assert response.status_code == 200
+    assert statuses == []
+    assert limiter.rate < limiter.max_rate
+
+
+def test_non_idempotent_requests_are_not_resent_after_processing():
+    calls = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        return httpx.Response(502)
+
+    async def run() -> httpx.Response:
+        async with _client(handler) as client:
+            return await client.post("/products/register", json={})
+
+    assert asyncio.run(run()).status_code == 502
+    assert calls == 1
+
+
+def test_circuit_breaker_fails_fast_and_recovers():
+    calls = 0
+    failing = True
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.05)
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        return httpx.Response(500 if failing else 200)
+
+    async def run() -> None:
+        nonlocal failing
+
+        async with _client(handler, breaker=breaker, max_retries=0) as client:
+            for _ in range(3):
+                await client.get("/products/1/offers")
+
+            with pytest.raises(CircuitOpenError):
+                await client.get("/products/1/offers")
+            assert calls == 3
+
+            failing = False
+            await asyncio.sleep(0.05)
+            response = await client.get("/products/1/offers")
+            assert response.status_code == 200
+            assert not breaker.is_open
+
+    asyncio.run(run())
+
+
+def test_retry_after_parsing():
+    assert retry_after(httpx.Response(429, headers={"Retry-After": "2"})) == 2.0
+    assert (
+        retry_after(
+            httpx.Response(
+                429, headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}
+            )
+        )
+        == 0.0
+    )
+    assert retry_after(httpx.Response(429)) is None
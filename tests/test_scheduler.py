@@ -0,0 +1,79 @@
+import time
+from uuid import uuid4
+
+from api.scheduler import RefreshScheduler
+
+
+def _scheduler() -> RefreshScheduler:
+    return RefreshScheduler(
+        min_interval=1.0,
+        max_interval=100.0,
+        read_half_life=3600.0,
+        hot_reads=10.0,
+        volatility_alpha=0.5,
+    )
+
+
+def test_new_products_are_due_immediately():
+    scheduler = _scheduler()
+    product_ids = {uuid4(), uuid4()}
+
+    scheduler.sync(product_ids)
+
+    assert set(scheduler.due()) == product_ids
+    assert scheduler.due() == []
+
+
+def test_removed_products_are_forgotten():
+    scheduler = _scheduler()
+    kept, removed = uuid4(), uuid4()
+
+    scheduler.sync([kept, removed])
+    scheduler.sync([kept])
+
+    assert scheduler.due() == [kept]
+    assert len(scheduler) == 1
+
+
+def test_hot_and_volatile_products_refresh_more_often():
+    scheduler = _scheduler()
+    cold, hot, volatile = uuid4(), uuid4(), uuid4()
+    scheduler.sync([cold, hot, volatile])
+    scheduler.due()
+
+    scheduler.sync_reads([(hot, 50.0)])
+
+    for _ in range(5):
+        scheduler.record_refresh(cold, changed=False)
+        scheduler.record_refresh(volatile, changed=True)
+
+    assert scheduler.interval(cold) == scheduler.max_interval
+    assert scheduler.interval(hot) < scheduler.max_interval / 10
+    assert scheduler.interval(volatile) < scheduler.max_interval / 10
+    assert scheduler.min_interval <= scheduler.interval(hot)
+    assert scheduler.min_interval <= scheduler.interval(volatile)
+
+
+def test_reads_move_refresh_earlier():
+    scheduler = _scheduler()
+    product_id = uuid4()
+    scheduler.sync([product_id])
+    scheduler.due()
+    due_at = scheduler.next_due()
+
+    scheduler.sync_reads([(product_id, 50.0)])
+
+    assert scheduler.next_due() < due_at
+
+
+def test_shared_reads_make_products_hotter():
+    scheduler = _scheduler()
+    hot, cold, unowned = uuid4(), uuid4(), uuid4()
+    scheduler.sync([hot, cold])
+    scheduler.due()
+
+    scheduler.sync_reads([(hot, 100.0), (unowned, 100.0)])
+
+    assert scheduler.interval(hot) < scheduler.interval(cold)
+    assert scheduler.next_due() < time.monotonic() + scheduler.interval(cold)
+    assert unowned not in scheduler
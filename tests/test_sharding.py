@@ -0,0 +1,120 @@
+import asyncio
+import contextlib
+from uuid import uuid4
+
+from api import utils
+from api.crud import remove_replica
+from api.database import session_scope
+from api.scheduler import RefreshScheduler, read_counter
+from api.sharding import owned_products, owner
+from api.utils import flush_reads, sync_schedule
+
+
+def _scheduler() -> RefreshScheduler:
+    return RefreshScheduler(
+        min_interval=1.0,
+        max_interval=100.0,
+        read_half_life=3600.0,
+        hot_reads=10.0,
+        volatility_alpha=0.5,
+    )
+
+
+def test_owned_products_partition():
+    product_ids = [uuid4() for _ in range(3000)]
+    replicas = ["a", "b", "c"]
+
+    owned = {
+        replica: set(owned_products(product_ids, replicas, replica))
+        for replica in replicas
+    }
+
+    assert set.union(*owned.values()) == set(product_ids)
+    assert sum(len(products) for products in owned.values()) == len(product_ids)
+    assert all(800 < len(products) < 1200 for products in owned.values())
+
+    # only the products of the replica that left move
+    remaining = {
+        replica: set(owned_products(product_ids, ["a", "b"], replica))
+        for replica in ["a", "b"]
+    }
+    assert owned["a"] <= remaining["a"]
+    assert owned["b"] <= remaining["b"]
+
+
+def test_sync_schedule_shards_across_workers(test_client, test_product_id):
+    workers = {f"test-{uuid4()}": _scheduler() for _ in range(3)}
+
+    async def sync_all() -> None:
+        for replica, scheduler in workers.items():
+            await sync_schedule(scheduler=scheduler, replica=replica)
+
+    async def remove_all() -> None:
+        for replica in workers:
+            async with session_scope():
+                await remove_replica(replica_id=replica)
+
+    try:
+        # the second round sees every worker's heartbeat
+        test_client.portal.call(sync_all)
+        test_client.portal.call(sync_all)
+    finally:
+        test_client.portal.call(remove_all)
+
+    scheduled = [set(scheduler) for scheduler in workers.values()]
+    assert sum(len(product_ids) for product_ids in scheduled) == len(
+        set.union(*scheduled)
+    )
+    assert test_product_id in set.union(*scheduled)
+
+
+def test_reads_reach_the_owner(test_client, test_product_id):
+    workers = {f"test-{uuid4()}": _scheduler() for _ in range(3)}
+
+    async def sync_all() -> None:
+        for replica, scheduler in workers.items():
+            await sync_schedule(scheduler=scheduler, replica=replica)
+
+    async def remove_all() -> None:
+        for replica in workers:
+            async with session_scope():
+                await remove_replica(replica_id=replica)
+
+    try:
+        test_client.portal.call(sync_all)
+        test_client.portal.call(sync_all)
+
+        # ? whichever process served them, the reads end up with the owner
+        for _ in range(5):
+            read_counter.record(test_product_id)
+        test_client.portal.call(flush_reads)
+        test_client.portal.call(sync_all)
+    finally:
+        test_client.portal.call(remove_all)
+
+    scheduler = workers[owner(test_product_id, workers)]
+    assert scheduler.priority(test_product_id) > 0.2
+
+
+def test_cancelled_flush_keeps_reads(monkeypatch):
+    product_id = uuid4()
+
+    async def record_product_reads(reads, half_life):
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(utils, "session_scope", contextlib.nullcontext)
+    monkeypatch.setattr(utils, "record_product_reads", record_product_reads)
+
+    async def cancel_flush() -> None:
+        read_counter.drain()
+        read_counter.record(product_id)
+        flush = asyncio.create_task(flush_reads())
+        await asyncio.sleep(0)
+        flush.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await flush
+
+    asyncio.run(cancel_flush())
+
+    # ? left for the flush on shutdown
+    assert read_counter.drain() == {product_id: 1}
@@ -0,0 +1,84 @@
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+from api import utils, worker
+
+
+def test_fetch_loop_returns_once_stopped(monkeypatch):
+    syncs = 0
+
+    async def sync_schedule(scheduler, replica):
+        nonlocal syncs
+        syncs += 1
+
+    async def maintain_offer_history() -> None: ...
+
+    monkeypatch.setattr(utils, "sync_schedule", sync_schedule)
+    monkeypatch.setattr(utils, "maintain_offer_history", maintain_offer_history)
+
+    async def run() -> None:
+        stop = asyncio.Event()
+        loop = asyncio.create_task(utils.fetch_loop(stop=stop))
+        await asyncio.sleep(0.01)
+        stop.set()
+        await asyncio.wait_for(loop, timeout=1)
+
+    asyncio.run(run())
+
+    assert syncs == 1
+
+
+def test_worker_health(monkeypatch):
+    async def get(path: str) -> httpx.Response:
+        server = await asyncio.start_server(worker._handle_health, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+
+        async with server, httpx.AsyncClient() as client:
+            return await client.get(f"http://127.0.0.1:{port}{path}")
+
+    monkeypatch.setattr(worker.refresh_scheduler, "synced_at", None)
+    assert asyncio.run(get("/health")).status_code == 503
+
+    monkeypatch.setattr(worker.refresh_scheduler, "synced_at", time.monotonic())
+    assert asyncio.run(get("/health")).status_code == 200
+
+    response = asyncio.run(get("/metrics"))
+    assert response.status_code == 200
+    assert "offer_refresh_skipped_products_total" in response.text
+
+
+def test_worker_graceful_shutdown():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    process = subprocess.Popen(
+        [sys.executable, "-m", "api.worker"],
+        env={**os.environ, "WORKER_HEALTH_PORT": str(port)},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+    try:
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            time.sleep(0.1)
+        else:
+            raise AssertionError("worker did not become healthy")
+
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=30) == 0
+    finally:
+        process.kill()